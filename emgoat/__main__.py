@@ -5,13 +5,20 @@ import sys
 import argparse
 
 import emgoat
-from emgoat.cluster.lsf import Cluster as LSFCluster
-from emgoat.cluster.slurm import Cluster as SlurmCluster
 
 here = os.path.abspath(os.path.dirname(__file__))
 
 
 if __name__ == '__main__':
+    # the quick check does not load the cluster code at all, see check.py
+    if len(sys.argv) > 1 and sys.argv[1] == 'check':
+        from emgoat.check import main
+        sys.exit(main(sys.argv[2:]))
+
+    from emgoat.cluster.lsf import Cluster as LSFCluster
+    from emgoat.cluster.slurm import Cluster as SlurmCluster
+    from emgoat.cluster.server import SnapshotServer
+
     p = argparse.ArgumentParser(prog='emgoat')
 
     # parameters for the action 
@@ -19,6 +26,14 @@ if __name__ == '__main__':
                    help='Generating json format of lsf cluster usage data')
     p.add_argument('--generate_slurm_cluster_usage_data', action='store_true',
                    help='Generating json format of slurm cluster usage data')
+    p.add_argument('--serve', choices=['lsf', 'slurm'],
+                   help='Serving the cluster usage data of lsf/slurm cluster through HTTP')
+    p.add_argument('--host', default='127.0.0.1',
+                   help='The address for the HTTP server to listen (default: %(default)s)')
+    p.add_argument('--port', type=int, default=8080,
+                   help='The port for the HTTP server to listen (default: %(default)s)')
+    p.add_argument('--refresh_interval', type=int, default=300,
+                   help='The interval in seconds to refresh the served data (default: %(default)s)')
 
     # form the args
     args = p.parse_args()
@@ -32,6 +47,16 @@ if __name__ == '__main__':
     if args.generate_slurm_cluster_usage_data:
         SlurmCluster().generate_json_results()
 
+    # serving the cluster data, this runs until it's interrupted
+    if args.serve:
+        cluster = LSFCluster() if args.serve == 'lsf' else SlurmCluster()
+        server = SnapshotServer(cluster, host=args.host, port=args.port,
+                                refresh_interval=args.refresh_interval)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.stop()
+
     """
     Fenglai: currently disable the code below
     p.add_argument("template")
@@ -0,0 +1,118 @@
+"""
+Quick check whether a job could start now on the cluster
+
+the cluster lane scripts ask this before they submit, so it must be fast: building the Cluster
+object runs the scheduler commands and takes seconds. Instead the availability index is written
+next to the json result with each refresh (see emgoat/cluster/availability.py), and the check
+only reads this small json file; this module only uses the standard library so that importing
+it does not load numpy and the cluster code.
+
+python -m emgoat check --gpus 4 --cpus 16 --mem 64 --gpu-type a100
+
+the index is for the buckets of the requests, the gpus are exact and the cpus/memory are in
+power of two buckets; the request is rounded up to its bucket, so the available slots are for
+a job at least as big as the request (never more than what's really there). The pending jobs
+are the ones in the same bucket, of any gpu type
+"""
+import argparse
+import bisect
+import json
+import os
+import sys
+
+#
+# the format version of the index file
+#
+AVAILABILITY_INDEX_VERSION = 1
+
+
+def availability_file_name(json_result):
+    """the availability index file for the json result, like /data/results_availability.json"""
+    return os.path.splitext(json_result)[0] + "_availability.json"
+
+
+def _bucket(buckets, value):
+    """the position of the smallest bucket >= value, None if the value is bigger than all"""
+    pos = bisect.bisect_left(buckets, value)
+    return pos if pos < len(buckets) else None
+
+
+def lookup_availability(index, gpus, cpus, mem_gb, gpu_type=None):
+    """
+    look up the request in the availability index (the dict loaded from the index file)
+
+    :return: dict with the request, the buckets it's rounded to, the available slots and the
+             number of pending jobs in the same bucket
+    """
+    result = {"gpus": gpus, "cpus": cpus, "mem_in_gb": mem_gb, "gpu_type": gpu_type or "any",
+              "available_slots": 0, "pending_jobs": 0}
+    g = gpus if gpus in index["gpus"] else None
+    c = _bucket(index["cpus"], max(cpus, 1))
+    m = _bucket(index["mem_in_gb"], max(mem_gb, 1))
+    if g is None or c is None or m is None:
+        return result
+    g = index["gpus"].index(g)
+    pos = (g * len(index["cpus"]) + c) * len(index["mem_in_gb"]) + m
+    result["cpus_bucket"] = index["cpus"][c]
+    result["mem_in_gb_bucket"] = index["mem_in_gb"][m]
+    if gpu_type is None or gpu_type.lower() == "any":
+        slots = index["slots"]["any"]
+    else:
+        slots = {k.lower(): v for k, v in index["slots"].items()}.get(gpu_type.lower())
+    result["available_slots"] = slots[pos] if slots is not None else 0
+    result["pending_jobs"] = index["pending"][pos]
+    return result
+
+
+def read_availability_index(file_name):
+    """read the index file written by the refresh"""
+    with open(file_name) as f:
+        index = json.load(f)
+    if index.get("version") != AVAILABILITY_INDEX_VERSION:
+        raise RuntimeError("the availability index {} is not in the version {}".format(
+            file_name, AVAILABILITY_INDEX_VERSION))
+    return index
+
+
+def _default_index_file(cluster):
+    from emgoat.config import config
+    if cluster == "lsf":
+        return availability_file_name(config['lsf']['json_gpu_result_path'])
+    return availability_file_name(config['slurm']['json_result_path'])
+
+
+def main(argv=None):
+    """
+    the check command, the exit code is 0 if the job could start now, 1 if not and 2 if the
+    index could not be read
+    """
+    p = argparse.ArgumentParser(prog='emgoat check',
+                                description='Check whether a job could start now on the cluster')
+    p.add_argument('--gpus', type=int, default=0, help='The number of gpus of the job')
+    p.add_argument('--cpus', type=int, default=1, help='The number of cpus of the job')
+    p.add_argument('--mem', type=int, default=1, help='The memory of the job in GB')
+    p.add_argument('--gpu-type', default=None, help='The gpu type, any gpu type by default')
+    p.add_argument('--cluster', choices=['lsf', 'slurm'], default='lsf',
+                   help='The cluster to check, the index is next to its json result (default: %(default)s)')
+    p.add_argument('--index', default=None, help='The availability index file, instead of the one of the cluster')
+    p.add_argument('--json', action='store_true', help='Print the result in json')
+    args = p.parse_args(argv)
+
+    file_name = args.index or _default_index_file(args.cluster)
+    try:
+        index = read_availability_index(file_name)
+    except (OSError, ValueError, RuntimeError) as e:
+        print("failed to read the availability index: {}".format(e), file=sys.stderr)
+        return 2
+
+    result = lookup_availability(index, args.gpus, args.cpus, args.mem, args.gpu_type)
+    if args.json:
+        print(json.dumps(result))
+    else:
+        print("{0} gpu {1} cpu {2} GB memory (gpu type {3}): {4} slots available now, {5} similar jobs pending".format(
+            args.gpus, args.cpus, args.mem, result["gpu_type"], result["available_slots"], result["pending_jobs"]))
+    return 0 if result["available_slots"] > 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
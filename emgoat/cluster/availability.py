@@ -0,0 +1,75 @@
+"""
+The availability index for the quick check (see emgoat/check.py)
+
+the index is the number of free slots for each request bucket (gpus, cpus, memory) on each gpu
+type, plus the number of pending jobs in each bucket. It's a small json file next to the json
+result, like emgoat_lsf_gpu_results_availability.json:
+
+{"version": 1, "gpus": [0, 1, ..., 8], "cpus": [1, 2, 4, ..., 128], "mem_in_gb": [1, 2, ..., 1024],
+ "slots": {"any": [...], "A100": [...]}, "pending": [...]}
+
+the gpus are 0 up to the most gpus on a node, the cpus/memory are the powers of two up to the
+biggest node. The lists are flattened in the order of (gpus, cpus, mem_in_gb), the slots are
+computed by slots.py for each bucket as a request shape. The pending job is counted in the
+bucket of its request rounded up (the grouped array elements are counted one by one)
+"""
+import numpy as np
+from emgoat.util import write_json_stream
+from emgoat.check import AVAILABILITY_INDEX_VERSION, availability_file_name
+from .tables import NodeTable, JobTable, JOB_STATE_PD_CODE
+from .slots import SlotShape, compute_slots
+
+
+def _power_buckets(largest):
+    """the powers of two from 1 up to the first one >= largest"""
+    buckets = [1]
+    while buckets[-1] < largest:
+        buckets.append(buckets[-1] * 2)
+    return buckets
+
+
+def compute_availability_index(nodes, jobs):
+    """
+    compute the availability index (see the file comments) for the nodes and jobs
+
+    :param nodes: NodeTable or list of Node
+    :param jobs: JobTable or list of Job
+    :return: the index as dict
+    """
+    nodes = NodeTable.coerce(nodes)
+    jobs = JobTable.coerce(jobs)
+    gpus = list(range(0, int(nodes.ngpus.max(initial=0)) + 1))
+    cpus = _power_buckets(int(nodes.ncpus.max(initial=1)))
+    mem = _power_buckets(int(nodes.mem.max(initial=1)))
+
+    shapes = [SlotShape(g, c, m, None) for g in gpus for c in cpus for m in mem]
+    result = compute_slots(nodes, shapes)
+    slots = {"any": result.totals.tolist()}
+    for gpu_type, values in result.by_gpu_type.items():
+        if gpu_type != "none":
+            slots[gpu_type] = values.tolist()
+
+    # the pending jobs in the bucket of their requests, the jobs bigger than the biggest
+    # bucket are not counted
+    pending = np.zeros(len(shapes), dtype=np.int64)
+    rows = jobs.general_state == JOB_STATE_PD_CODE
+    g = jobs.gpu[rows]
+    c = np.searchsorted(cpus, np.maximum(jobs.cpu[rows], 1), side="left")
+    m = np.searchsorted(mem, np.maximum(jobs.mem[rows], 1), side="left")
+    inside = (g >= 0) & (g < len(gpus)) & (c < len(cpus)) & (m < len(mem))
+    positions = (g[inside] * len(cpus) + c[inside]) * len(mem) + m[inside]
+    np.add.at(pending, positions, jobs.array_counts[rows][inside])
+
+    return {"version": AVAILABILITY_INDEX_VERSION, "gpus": gpus, "cpus": cpus, "mem_in_gb": mem,
+            "slots": slots, "pending": pending.tolist()}
+
+
+def write_availability_index(json_result, nodes, jobs):
+    """
+    write the availability index next to the json result (see availability_file_name)
+
+    :return: the file name
+    """
+    file_name = availability_file_name(json_result)
+    write_json_stream(file_name, list(compute_availability_index(nodes, jobs).items()))
+    return file_name
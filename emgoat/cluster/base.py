@@ -1,10 +1,26 @@
 #
 # in the class of cluster, and it's derived class; all of the time format we use the iso format
 #
+import os
 from abc import ABC, abstractmethod
 from emgoat.util import JOB_STATUS_PD, VERY_BIG_NUMBER, NOT_AVAILABLE
-from emgoat.util import whether_node_is_off
+from emgoat.util import datetime_to_epoch, epoch_to_datetime
+from emgoat.util import ACCOUNTS, HOSTS, STATES, GPU_TYPES
+from emgoat.util import write_json_stream, write_ndjson, ndjson_file_name, compress_hostlist
+from .tables import NodeTable, JobTable, JOB_STATE_PD_CODE
+from .slots import SlotShape, compute_slots
+from .export import export_tables
+from .metrics import write_metrics
+from .query import JobIndex, NodeIndex, QueryResult
+from .views import compute_views, write_views, DEFAULT_TOP_PENDING_JOBS
+from .delta import DeltaTracker, read_previous_result, delta_file_name, DEFAULT_FULL_SNAPSHOT_EVERY
+from .shards import write_shards
+from .availability import write_availability_index
+from .history import history_writer, make_history_snapshot
+from .capacity import compute_capacity_timeline, estimate_start, DEFAULT_SNAPSHOT_WINDOWS
+from .incremental import SectionState, node_table_digest, job_table_digest, value_digest
 from datetime import datetime
+import numpy as np
 
 
 class Cluster(ABC):
@@ -14,13 +30,21 @@ class Cluster(ABC):
     with specific cluster flavors (e.g., LSF, SLURM, etc.)
     """
     _name = None  # Should be defined in subclasses
+    _config = None  # the Config of the cluster section, defined in subclasses
+    generation = 0  # the snapshot generation, it's increased by each refresh of the data
+    _snapshot_windows = DEFAULT_SNAPSHOT_WINDOWS  # the windows of the capacity timeline, see capacity.py
 
     class Node:
         """
         Structure to store basic information about cluster nodes.
 
         All of the information are complete when passing into this constructor
+
+        the class is slotted, so that the large node list does not carry a per-instance dict; the name,
+        gpu type and status are kept as codes of the shared string tables (see strtable.py)
         """
+        __slots__ = ("_name", "_gpu_type", "_status", "ngpus", "ncpus", "total_mem_in_gb",
+                     "njobs", "gpus_in_use", "cores_in_use", "memory_in_use")
 
         def __init__(self, name, gpu_type, status, ngpus, ngpus_used, ncpus, ncpus_used, total_mem_in_gb,
                      mem_used, njobs, with_usage_data):
@@ -36,9 +60,9 @@ class Cluster(ABC):
 
             sometimes because the default data can be < 0, therefore we check whether the data is > 0
             """
-            self.name = name
-            self.gpu_type = gpu_type
-            self.status = status
+            self._name = HOSTS.encode(name)
+            self._gpu_type = GPU_TYPES.encode(gpu_type)
+            self._status = STATES.encode(status)
             if ngpus > 0:
                 self.ngpus = ngpus
             else:
@@ -66,6 +90,18 @@ class Cluster(ABC):
                 if mem_used > 0:
                     self.memory_in_use = mem_used
 
+        @property
+        def name(self):
+            return HOSTS.decode(self._name)
+
+        @property
+        def gpu_type(self):
+            return GPU_TYPES.decode(self._gpu_type)
+
+        @property
+        def status(self):
+            return STATES.decode(self._status)
+
         def update_jobs_infor(self, gpus_in_use, cores_in_use):
             """
             update the corresponding usage data from one job
@@ -143,15 +179,22 @@ class Cluster(ABC):
         Structure to store jobs information. 
 
         make the type annotations to the input data members
+
+        the class is slotted and the submit/start time are kept as epoch integers, the
+        datetime objects are only created when the submit_time/start_time is accessed. The
+        states, account name and compute nodes are kept as codes of the shared string tables
         """
+        __slots__ = ("jobid", "job_name", "_submit_ts", "_state", "_general_state", "pending_time",
+                     "job_remaining_time", "_start_ts", "used_time", "cpu_used", "gpu_used",
+                     "memory_used", "_compute_nodes", "_account", "array_count", "array_indices")
 
         def __init__(self, jobid: str, job_name: str,
-                submit_time: datetime, state: str, general_state: str,
+                submit_time: datetime | int, state: str, general_state: str,
                 pending_time: int, job_remaining_time: int,
-                start_time: datetime, used_time: int, 
+                start_time: datetime | int | None, used_time: int,
                 cpu_used: int, gpu_used: int, memory_used: int,
-                compute_nodes: list[str], 
-                account_name: str):
+                compute_nodes: list[str],
+                account_name: str, array_count: int = 1, array_indices: str | None = None):
             """
             the job ID is from LSF/slurm etc. However for easy handling we just treat it as a string
 
@@ -164,29 +207,72 @@ class Cluster(ABC):
 
             job remaining time: how much time the job is used (wall time), in unit of minutes
 
-            start time: the job starting time (dateTime)
+            submit/start time: the job submit/starting time, either datetime or epoch seconds (int); the start
+            time is None if the job is not started yet
 
             memory used: how much memory used in unit of GB
 
             cpu/gpu used: how many cores/gpus used for the job
 
             compute nodes are the nodes that the job are submitted onto, it's a list of string
+
+            array count/indices are for the grouped pending array elements, the number of elements
+            and their index ranges like 1-100 (see util/jobarrays.py); the other jobs are 1/None
             """
 
             self.jobid = jobid
             self.job_name = job_name
-            self.submit_time = submit_time
-            self.state = state
-            self.general_state = general_state
+            self._submit_ts = datetime_to_epoch(submit_time)
+            self._state = STATES.encode(state)
+            self._general_state = STATES.encode(general_state)
             self.pending_time = pending_time
             self.job_remaining_time = job_remaining_time
-            self.start_time = start_time
+            self._start_ts = datetime_to_epoch(start_time)
             self.used_time = used_time
             self.cpu_used = cpu_used
             self.gpu_used = gpu_used
             self.memory_used = memory_used
-            self.compute_nodes = compute_nodes
-            self.account_name = account_name
+            self._compute_nodes = HOSTS.encode_many(compute_nodes)
+            self._account = ACCOUNTS.encode(account_name)
+            self.array_count = array_count
+            self.array_indices = array_indices
+
+        @property
+        def state(self):
+            return STATES.decode(self._state)
+
+        @property
+        def general_state(self):
+            return STATES.decode(self._general_state)
+
+        @property
+        def account_name(self):
+            return ACCOUNTS.decode(self._account)
+
+        @property
+        def compute_nodes(self):
+            """the compute nodes as tuple of node names"""
+            return tuple(HOSTS.decode_many(self._compute_nodes))
+
+        @property
+        def submit_time(self):
+            """the submit time as datetime, converted from the epoch seconds on access"""
+            return epoch_to_datetime(self._submit_ts)
+
+        @property
+        def start_time(self):
+            """the start time as datetime, None if the job is not started yet"""
+            return epoch_to_datetime(self._start_ts)
+
+        @property
+        def submit_timestamp(self):
+            """the submit time in epoch seconds"""
+            return self._submit_ts
+
+        @property
+        def start_timestamp(self):
+            """the start time in epoch seconds, None if the job is not started yet"""
+            return self._start_ts
 
         def __str__(self):
             if self.job_remaining_time == VERY_BIG_NUMBER:
@@ -203,11 +289,13 @@ class Cluster(ABC):
                     f"memory_request(GB): {self.memory_used}\n compute_nodes: {self.compute_nodes}\n "
                     f"account_name: {self.account_name}\n")
 
-        def to_dict(self):
+        def to_dict(self, compress_nodes=False):
             """
             this function is to transform the data into a dict
 
-            remember the input datetime is always in isoformat
+            remember the input datetime is always in isoformat; if compress_nodes is true the
+            compute nodes are written as the host list expression like gpu[01-04] (see
+            util/hostlist.py)
             """
             if self.job_remaining_time == VERY_BIG_NUMBER:
                 time_left = "None"
@@ -216,19 +304,19 @@ class Cluster(ABC):
 
             # double check the starrt time, it could be None
             start_time_str = NOT_AVAILABLE
-            if self.start_time is not None:
+            if self._start_ts is not None:
                 start_time_str = self.start_time.isoformat()
 
             # make compute list into one string
-            if len(self.compute_nodes) == 1:
-                compute_nodes = self.compute_nodes[0]
-            elif len(self.compute_nodes) > 1:
-                compute_nodes = " ".join(self.compute_nodes)
+            if len(self._compute_nodes) > 0 and compress_nodes:
+                compute_nodes = compress_hostlist(HOSTS.decode_many(self._compute_nodes))
+            elif len(self._compute_nodes) > 0:
+                compute_nodes = " ".join(HOSTS.decode_many(self._compute_nodes))
             else:
                 compute_nodes = " "
 
-            # the dict
-            return {"account_name": self.account_name, "jobID": self.jobid, "job_name": self.job_name,
+            # the dict, the grouped array elements have their count and indices at the end
+            result = {"account_name": self.account_name, "jobID": self.jobid, "job_name": self.job_name,
                     "submit_time": self.submit_time.isoformat(),
                     "state": self.state, "general_state": self.general_state,
                     "pending_time_in_minutes": self.pending_time,
@@ -239,23 +327,39 @@ class Cluster(ABC):
                     "gpu_used": self.gpu_used,
                     "memory_request_in_GB": self.memory_used,
                     "compute_nodes_list": compute_nodes}
+            if self.array_indices is not None:
+                result["array_count"] = self.array_count
+                result["array_indices"] = self.array_indices
+            return result
 
     class Account:
         """
         define the account class associated with the jobs
+
+        the account name and the nodes are kept as codes of the shared string tables
         """
+        __slots__ = ("_account", "n_running_jobs", "n_pending_jobs", "ngpus", "ncpus", "_nodes")
 
         def __init__(self, name):
             """
             initialization
             :param name: the account name
             """
-            self.account_name = name
+            self._account = ACCOUNTS.encode(name)
             self.n_running_jobs = 0
             self.n_pending_jobs = 0
             self.ngpus = 0
             self.ncpus = 0
-            self.nodes_list = []
+            self._nodes = []
+
+        @property
+        def account_name(self):
+            return ACCOUNTS.decode(self._account)
+
+        @property
+        def nodes_list(self):
+            """the names of the nodes used by the account"""
+            return HOSTS.decode_many(self._nodes)
 
         def __str__(self):
             nodes_name_list = " ".join(self.nodes_list)
@@ -270,14 +374,22 @@ class Cluster(ABC):
             """
             depending on the job status, let's update the values
             """
-            if job_status == JOB_STATUS_PD:
-                self.n_pending_jobs += 1
+            self.update_values_by_code(ncores_used, ngpus_used, job_status == JOB_STATUS_PD,
+                                       HOSTS.encode(node_name))
+
+        def update_values_by_code(self, ncores_used, ngpus_used, is_pending, node_code, count=1):
+            """
+            same as update_values, the node is given as the code in the HOSTS string table;
+            count is the number of the grouped pending array elements
+            """
+            if is_pending:
+                self.n_pending_jobs += count
             else:
                 self.n_running_jobs += 1
                 self.ngpus += ngpus_used
                 self.ncpus += ncores_used
-                if node_name not in self.nodes_list:
-                    self.nodes_list.append(node_name)
+                if node_code not in self._nodes:
+                    self._nodes.append(node_code)
 
         def has_any_jobs(self):
             """
@@ -285,9 +397,14 @@ class Cluster(ABC):
             """
             return self.n_running_jobs + self.n_pending_jobs > 0
 
-        def to_dict(self):
-            """this function is to transform the object into dict"""
-            nodes_name_list = " ".join(self.nodes_list)
+        def to_dict(self, compress_nodes=False):
+            """
+            this function is to transform the object into dict, see Job.to_dict for compress_nodes
+            """
+            if compress_nodes:
+                nodes_name_list = compress_hostlist(self.nodes_list)
+            else:
+                nodes_name_list = " ".join(self.nodes_list)
             return {"account_name":self.account_name,
                     "n_running_jobs":self.n_running_jobs,
                     "n_pending_jobs":self.n_pending_jobs,
@@ -300,53 +417,45 @@ class Cluster(ABC):
         This is the summary of the current cluster usage, including the overview for the gpu usage
         """
 
-        def __init__(self, nodes_list, job_list):
+        def __init__(self, nodes_list, job_list, slot_shapes=None):
             """
             initialize the data for cluster summary
-            """
 
-            # initialize all of data
-            self.n_total_jobs = 0
-            self.n_running_jobs = 0
-            self.n_pending_jobs = 0
-            self.n_total_gpus = 0
-            self.n_used_gpus = 0
-            self.n_total_cores = 0
-            self.n_used_cores = 0
-            self.n_total_mem_in_gb = 0
-            self.n_used_mem_in_gb = 0
+            the input nodes/jobs could be the list of Node/Job objects, or the NodeTable/JobTable;
+            the summary is done with the vectorized reductions over the table columns
+
+            slot_shapes is the list of SlotShape (see slots.py), if it's given the available slots
+            considering the gpus, cpus and memory together are computed for each shape
+            """
+            nodes = NodeTable.coerce(nodes_list)
+            jobs = JobTable.coerce(job_list)
 
             # all of job information
-            for job in job_list:
-                if job.general_state == JOB_STATUS_PD:
-                    self.n_pending_jobs += 1
-                else:
-                    self.n_running_jobs += 1
-                self.n_total_jobs += 1
+            self.n_total_jobs = jobs.job_count()
+            self.n_pending_jobs = jobs.job_count(jobs.general_state == JOB_STATE_PD_CODE)
+            self.n_running_jobs = self.n_total_jobs - self.n_pending_jobs
 
             # resources summary
-            for node in nodes_list:
-                # let's exclude the off nodes
-                if whether_node_is_off(node.status):
-                    continue
-                self.n_total_gpus += node.ngpus
-                self.n_total_cores += node.ncpus
-                self.n_total_mem_in_gb += node.total_mem_in_gb
-                self.n_used_gpus += node.gpus_in_use
-                self.n_used_cores += node.cores_in_use
-                self.n_used_mem_in_gb += node.memory_in_use
+            # let's exclude the off nodes
+            on = ~nodes.off_mask()
+            self.n_total_gpus = int(nodes.ngpus[on].sum())
+            self.n_total_cores = int(nodes.ncpus[on].sum())
+            self.n_total_mem_in_gb = int(nodes.mem[on].sum())
+            self.n_used_gpus = int(nodes.gpus_used[on].sum())
+            self.n_used_cores = int(nodes.cpus_used[on].sum())
+            self.n_used_mem_in_gb = int(nodes.mem_used[on].sum())
 
             # generates the overview
+            gpus_remain = nodes.free_gpus()
             self.gpus_overview = {1: 0, 2: 0, 4: 0, 6: 0, 8: 0}
             for gpu_select in self.gpus_overview:
-                available_slots = 0
-                for node in nodes_list:
-                    gpus_remain = node.get_gpus_unused()
-                    if gpus_remain >= gpu_select:
-                        available_slots += int(gpus_remain / gpu_select)
+                slots = np.where(gpus_remain >= gpu_select, gpus_remain // gpu_select, 0)
+                self.gpus_overview[gpu_select] = int(slots.sum())
 
-                # update the result
-                self.gpus_overview[gpu_select] = available_slots
+            # the slots for the multi-resource request shapes
+            self.slots = None
+            if slot_shapes:
+                self.slots = compute_slots(nodes, slot_shapes)
 
         def __str__(self):
 
@@ -366,7 +475,7 @@ class Cluster(ABC):
                     f"total number of used cores={self.n_used_cores}, \n"
                     f"total capacity of memory in gb={self.n_total_mem_in_gb}, \n"
                     f"total capacity of used memory in gb={self.n_used_mem_in_gb}, \n" +
-                    overview)
+                    overview + (str(self.slots) if self.slots is not None else ""))
 
         def to_dict(self):
             """this function is to transform the data into dict"""
@@ -388,6 +497,10 @@ class Cluster(ABC):
                     "all_available_memory_in_gb":self.n_total_mem_in_gb,
                     "total_used_memory_in_gb":self.n_used_mem_in_gb})
 
+            # the slots for the request shapes
+            if self.slots is not None:
+                result["available_slots"] = self.slots.to_dict()
+
             # return
             return result
 
@@ -442,29 +555,297 @@ class Cluster(ABC):
     def form_accounts_infor(self, jobs_list):
         """
         forming the account list based on the job list data
+
+        the input could be the list of Job, or the JobTable
         """
+        jobs = JobTable.coerce(jobs_list)
+
+        # the account is created in the order of its first job
+        accounts = {}
+        for pos in range(len(jobs)):
+            code = int(jobs.account_codes[pos])
+            acc = accounts.get(code)
+            if acc is None:
+                acc = accounts[code] = self.Account(ACCOUNTS.decode(code))
+
+            # the pending job is counted once (with all of its grouped array elements), it has
+            # no compute nodes; the running job updates the account on each compute node
+            ncores_used = int(jobs.cpu[pos])
+            ngpus_used = int(jobs.gpu[pos])
+            if jobs.general_state[pos] == JOB_STATE_PD_CODE:
+                acc.update_values_by_code(ncores_used, ngpus_used, True, None, int(jobs.array_counts[pos]))
+                continue
+            for node in jobs.node_codes[pos]:
+                acc.update_values_by_code(ncores_used, ngpus_used, False, node)
+
+        # finally return
+        return list(accounts.values())
 
-        # firstly form the account list with account name
-        account_name_list = []
-        for x in jobs_list:
-            if x.account_name not in account_name_list:
-                account_name_list.append(x.account_name)
+    def query_tables(self):
+        """
+        the (NodeTable, JobTable) for the queries, in the same order of get_nodes_info and
+        get_jobs_info; the backends override it to give their tables directly
+        """
+        return NodeTable.coerce(self.get_nodes_info()), JobTable.coerce(self.get_jobs_info())
 
-        # now forms the account list with empty values
-        account_list = [self.Account(x) for x in account_name_list]
+    def _query_indexes(self):
+        """
+        the (NodeIndex, JobIndex) for the current generation, they are built on the first query
+        after each refresh
+        """
+        cached = getattr(self, "_query_cache", None)
+        if cached is None or cached[0] != self.generation:
+            nodes, jobs = self.query_tables()
+            cached = self._query_cache = (self.generation, NodeIndex(nodes), JobIndex(jobs, nodes))
+        return cached[1], cached[2]
 
-        # now loop over the job list
-        for acc in account_list:
-            for job in jobs_list:
-                if job.account_name == acc.account_name:
-                    ncores_used = job.cpu_used
-                    ngpus_used = job.gpu_used
-                    job_status = job.general_state
-                    nodes_name = job.compute_nodes
-                    for node in nodes_name:
-                        acc.update_values(ncores_used, ngpus_used, job_status, node)
+    def query_jobs(self, account=None, state=None, node=None, min_gpus=None, submitted_after=None, gpu_type=None):
+        """
+        return the jobs matching all of the given filters as QueryResult (see query.py), the Job
+        objects are taken from get_jobs_info only when they are accessed; the account, state, node
+        and gpu type could also be a list of values, any of them matches
+
+        :param account: the account name, case-insensitive
+        :param state: the job state (like PEND) or the general state (pending, running etc.)
+        :param node: the node name, the job runs on it
+        :param min_gpus: the jobs requesting at least this number of gpus
+        :param submitted_after: the jobs submitted after the time (datetime, iso string or epoch seconds)
+        :param gpu_type: the gpu type of the compute nodes, case-insensitive
+        """
+        rows = self._query_indexes()[1].query(account, state, node, min_gpus, submitted_after, gpu_type)
+        return QueryResult(rows, self.get_jobs_info)
 
-        # finally return
-        return account_list
+    def query_nodes(self, gpu_type=None, status=None, min_free_gpus=None, min_free_mem=None, name=None):
+        """
+        return the nodes matching all of the given filters as QueryResult (see query.py), the Node
+        objects are taken from get_nodes_info only when they are accessed; the gpu type, status and
+        name could also be a list of values, any of them matches
+
+        :param gpu_type: the gpu type, case-insensitive
+        :param status: the node status, or the node group good/drained/off
+        :param min_free_gpus: the nodes with at least this number of free gpus
+        :param min_free_mem: the nodes with at least this memory (in GB) free
+        :param name: the node name, case-insensitive
+        """
+        rows = self._query_indexes()[0].query(gpu_type, status, min_free_gpus, min_free_mem, name)
+        return QueryResult(rows, self.get_nodes_info)
 
+    def capacity_timeline(self, now=None):
+        """
+        the projected free resources on the nodes for the windows of the snapshots config section
+        (see capacity.py), for the same tables as the queries; the default timeline is built once
+        for each generation
+
+        :param now: the epoch seconds of the beginning of the timeline, default is the time the job
+                    records were parsed
+        :return: CapacityTimeline
+        """
+        if now is not None:
+            return compute_capacity_timeline(*self.query_tables(), self._snapshot_windows, now)
+        cached = getattr(self, "_timeline_cache", None)
+        if cached is None or cached[0] != self.generation:
+            timeline = compute_capacity_timeline(*self.query_tables(), self._snapshot_windows)
+            cached = self._timeline_cache = (self.generation, timeline)
+        return cached[1]
+
+    def estimate_start(self, requirements):
+        """
+        estimate when a job could start, from the capacity timeline and the similar pending jobs
+        (see estimate_start in capacity.py); the estimates are kept for the generation, so the
+        repeated questions are answered from the cache
+
+        :param requirements: the JobRequirements, the memory is not limiting if total_memory is not given
+        :return: StartEstimate
+        """
+        shape = SlotShape(requirements.ngpus or 0, requirements.ncpus or 0, requirements.total_memory or 0,
+                          requirements.gpu_type)
+        timeline = self.capacity_timeline()
+        cached = getattr(self, "_estimate_cache", None)
+        if cached is None or cached[0] is not timeline:
+            cached = self._estimate_cache = (timeline, {})
+        estimate = cached[1].get(shape)
+        if estimate is None:
+            estimate = cached[1][shape] = estimate_start(timeline, self.query_tables()[1], shape)
+        return estimate
+
+    def write_json_results(self, json_result, nodes, jobs, accounts, summary, extra_fields=(), jobs_ndjson=False,
+                           tables=None):
+        """
+        write the result json file, the summary is written first then the nodes, accounts and
+        jobs are encoded one by one into the file (see util/jsonstream.py); the output is the
+        compact json encoding of {"summary": ..., "nodes": [...], "accounts": [...], "jobs": [...]}
+
+        if json_delta is true in the cluster config section, the result starts with the sequence
+        number and the delta file against the previous result is written too (see delta.py)
+
+        if json_compress_hostlists is true in the cluster config section, the compute nodes of the
+        jobs and accounts are written as the host list expressions like gpu[01-16,20]
+
+        if json_incremental is true in the cluster config section and the tables are given, only
+        the changed sections are encoded and nothing is written if no section is changed (see
+        incremental.py)
+
+        :param extra_fields: list of (key, value) written after the summary
+        :param jobs_ndjson: if true the jobs are written into the NDJSON file (one job per line)
+                            next to the result file, and the result file does not have the jobs
+        :param tables: the (NodeTable, JobTable) of the nodes and jobs
+        :return: whether the result is written, it's false if nothing is changed
+        """
+        jobs_file = ndjson_file_name(json_result, "jobs") if jobs_ndjson else None
+        compress = self._config is not None and self._config.get_bool('json_compress_hostlists', False)
+        summary_dict = summary.to_dict()
+        acc_records = (x.to_dict(compress) for x in accounts if x.has_any_jobs())
+
+        # compare the sections with the previous result
+        state = None
+        if tables is not None and self._config is not None and self._config.get_bool('json_incremental', False):
+            state = SectionState(json_result)
+            acc_records = list(acc_records)
+            state.set_digest("summary", value_digest(summary_dict))
+            for key, value in extra_fields:
+                state.set_digest(key, value_digest(value))
+            state.set_digest("nodes", node_table_digest(tables[0]))
+            state.set_digest("accounts", value_digest(acc_records))
+            state.set_digest("jobs", job_table_digest(tables[1]) + ("-ndjson" if jobs_ndjson else "")
+                             + ("-hostlist" if compress else ""))
+            if state.unchanged():
+                return False
+
+        tracker = None
+        if self._config is not None and self._config.get_bool('json_delta', False):
+            every = int(self._config.get('delta_full_snapshot_every', DEFAULT_FULL_SNAPSHOT_EVERY))
+            tracker = DeltaTracker(read_previous_result(json_result, jobs_file), every)
+
+        # the unchanged nodes/jobs are taken from the previous result, except for the full delta
+        # which needs all of records; the unchanged NDJSON jobs file is kept as it is
+        nodes_records = (x.to_dict() for x in nodes)
+        jobs_records = (x.to_dict(compress) for x in jobs)
+        reuse = state is not None and (tracker is None or not tracker.full)
+        nodes_fragment = state.previous_fragment("nodes") if reuse else None
+        jobs_fragment = state.previous_fragment("jobs") if reuse and not jobs_ndjson else None
+        jobs_kept = jobs_fragment is not None or (reuse and jobs_ndjson and not state.changed("jobs")
+                                                  and os.path.exists(jobs_file))
+
+        fields = []
+        if tracker is not None:
+            tracker.track_summary(summary_dict)
+            if nodes_fragment is None:
+                nodes_records = tracker.track("nodes", nodes_records)
+            else:
+                tracker.skip("nodes")
+            acc_records = tracker.track("accounts", acc_records)
+            if jobs_kept:
+                tracker.skip("jobs")
+            else:
+                jobs_records = tracker.track("jobs", jobs_records)
+            fields.append(("sequence", tracker.sequence))
+
+        fields.append(("summary", summary_dict))
+        fields.extend(extra_fields)
+        fields.append(("nodes", nodes_records if nodes_fragment is None else nodes_fragment))
+        fields.append(("accounts", acc_records))
+        if not jobs_ndjson:
+            fields.append(("jobs", jobs_records if jobs_fragment is None else jobs_fragment))
+        elif not jobs_kept:
+            write_ndjson(jobs_file, jobs_records)
+        offsets = {}
+        write_json_stream(json_result, fields, offsets)
+        if state is not None:
+            state.save(offsets)
+
+        # the delta is written after the result, so the result is there when the client sees the delta
+        if tracker is not None:
+            write_json_stream(delta_file_name(json_result), tracker.delta_fields())
+        return True
+
+    def export_results(self, prefix, nodes, jobs, accounts):
+        """
+        write the nodes, jobs and accounts tables in the columnar format given by export_format
+        in the cluster config section (see export.py), nothing is done if it's not set. As in the
+        json result only the accounts with jobs are written
+
+        :param prefix: the file name prefix, the tables are written into <prefix>_nodes.<ext> etc.
+        :return: the list of written file names
+        """
+        export_format = self._config.get('export_format', '').strip().lower()
+        if not export_format:
+            return []
+        return export_tables(prefix, export_format, nodes, jobs, [x for x in accounts if x.has_any_jobs()])
+
+    def write_view_files(self, json_result, nodes, jobs, accounts):
+        """
+        write the small views (see views.py) next to the json result if json_views is true in the
+        cluster config section; the nodes/jobs are the tables used for the result
 
+        :return: the list of written file names
+        """
+        if not self._config.get_bool('json_views', False):
+            return []
+        top_pending = int(self._config.get('view_top_pending_jobs', DEFAULT_TOP_PENDING_JOBS))
+        return write_views(json_result, compute_views(nodes, jobs, accounts, self.Job, top_pending))
+
+    def write_job_shards(self, json_result, jobs):
+        """
+        write the jobs into the per-account and per-node shard files next to the json result if
+        json_shards is true in the cluster config section (see shards.py), the compute nodes are
+        compressed like in the json result if json_compress_hostlists is true
+
+        :return: the list of the shard files written
+        """
+        if not self._config.get_bool('json_shards', False):
+            return []
+        return write_shards(json_result, jobs, self._config.get_bool('json_compress_hostlists', False))
+
+    def write_availability_file(self, json_result, nodes, jobs):
+        """
+        write the availability index for the quick check (see availability.py) next to the json
+        result if json_availability is true in the cluster config section; the nodes/jobs are the
+        tables used for the result
+
+        :return: the file name, None if it's not written
+        """
+        if not self._config.get_bool('json_availability', False):
+            return None
+        return write_availability_index(json_result, nodes, jobs)
+
+    def record_history(self, scope, summary, nodes, jobs, accounts):
+        """
+        append the snapshot into the history database given by history_db in the cluster config
+        section (see history.py), nothing is done if it's not set. The snapshot is written by the
+        background writer, so this returns right away; history_raw_days and history_hourly_days
+        are the retention of the raw and hourly tiers (see rollup.py)
+
+        :param scope: the lsf queue, or empty for the whole cluster
+        :param nodes: the NodeTable of the snapshot
+        :param jobs: the JobTable of the snapshot
+        :return: whether the snapshot is submitted
+        """
+        path = self._config.get('history_db', '').strip()
+        if not path:
+            return False
+        raw_days = self._config.get('history_raw_days', '').strip()
+        hourly_days = self._config.get('history_hourly_days', '').strip()
+        writer = history_writer(path, float(raw_days) if raw_days else None,
+                                float(hourly_days) if hourly_days else None)
+        writer.submit(make_history_snapshot(self._name, scope, summary.to_dict(), nodes, jobs, accounts))
+        return True
+
+    def metric_groups(self):
+        """
+        the groups for the metrics (see metrics.py), each is (labels, summary, nodes, accounts); the
+        default is the whole cluster
+        """
+        return [([], self.get_cluster_summary_info(), self.get_nodes_info(), self.get_accounts_info())]
+
+    def write_metrics_file(self):
+        """
+        write the OpenMetrics text into metrics_file given in the cluster config section, nothing
+        is done if it's not set
+
+        :return: the file name, or None
+        """
+        file_name = self._config.get('metrics_file', '').strip()
+        if not file_name:
+            return None
+        write_metrics(file_name, self)
+        return file_name
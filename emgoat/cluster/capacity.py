@@ -0,0 +1,308 @@
+"""
+Future capacity of the cluster, projected from the running jobs
+
+the running jobs give their remaining time, so we know when each job will end and release its
+gpus, cpus and memory. The timeline cuts the future into number_job_snapshots windows of
+job_snapshots_time_interval minutes from now, and for each window gives the free resources on
+each node after the jobs ending before the end of the window released their resources. Here now
+is the time the job records were parsed (their remaining time is counted from it), the records
+in the data file could be up to jobs_data_update_time old:
+
+window 0    [now, now + interval)               - the jobs ending in window 0 are released
+window 1    [now + interval, now + 2*interval)  - the jobs ending in window 0 and 1 are released
+...
+
+this is done as a sweep over the job end times: the end times are sorted once, the window
+boundaries cut the sorted jobs into the windows, the per node releases are added into the
+(windows x nodes) delta arrays and the cumulative sum over the windows gives the free resources.
+The jobs without the remaining time (VERY_BIG_NUMBER) never end in the timeline, and the jobs
+already over their time end in window 0. The pending jobs are not placed, the timeline is only
+what's freed by the running jobs.
+
+estimate_start uses the timeline for the start time of a new job: the earliest window with more
+slots for the job than the similar pending jobs (the ones asking for the same or less resources,
+they would take the slots first), with a note on how much the estimate could be trusted
+
+the windows are read from the config, in the snapshots section:
+
+[snapshots]
+job_snapshots_time_interval = 60
+number_job_snapshots = 36
+"""
+import copy
+import time
+from collections import namedtuple
+import numpy as np
+from emgoat.util import VERY_BIG_NUMBER, GPU_TYPES, epoch_to_datetime
+from .tables import NodeTable, JobTable, JOB_STATE_PD_CODE
+from .slots import node_slots
+
+#
+# the windows of the timeline, the interval is in minutes
+#
+SnapshotWindows = namedtuple("SnapshotWindows", ["interval", "count"])
+
+#
+# the windows if the config does not have the snapshots section
+#
+DEFAULT_SNAPSHOT_WINDOWS = SnapshotWindows(60, 36)
+
+
+def load_snapshot_windows(config):
+    """
+    read the windows from the config (ConfigParser), the default windows are returned if the
+    config does not have the snapshots section
+    """
+    if not config.has_section('snapshots'):
+        return DEFAULT_SNAPSHOT_WINDOWS
+    section = config['snapshots']
+    try:
+        interval = int(section.get('job_snapshots_time_interval', DEFAULT_SNAPSHOT_WINDOWS.interval))
+        count = int(section.get('number_job_snapshots', DEFAULT_SNAPSHOT_WINDOWS.count))
+    except ValueError:
+        raise RuntimeError("The job_snapshots_time_interval and number_job_snapshots should be integer")
+    if interval <= 0 or count <= 0:
+        raise RuntimeError("The job snapshots interval and number should be positive: {} {}".format(interval, count))
+    return SnapshotWindows(interval, count)
+
+
+class CapacityTimeline:
+    """
+    the projected free resources on each node for each window (see the file comments)
+
+    starts is the epoch seconds of the beginning of each window, and free_gpus, free_cpus,
+    free_mem (GB) and njobs are the (windows x nodes) int64 arrays in the row order of nodes;
+    n_open_jobs is the number of running jobs without the remaining time
+    """
+
+    def __init__(self, nodes, starts, interval, free_gpus, free_cpus, free_mem, njobs, n_open_jobs=0):
+        self.nodes = nodes
+        self.starts = starts
+        self.interval = interval
+        self.free_gpus = free_gpus
+        self.free_cpus = free_cpus
+        self.free_mem = free_mem
+        self.njobs = njobs
+        self.n_open_jobs = n_open_jobs
+
+    def __len__(self):
+        return len(self.starts)
+
+    @property
+    def ends(self):
+        """the epoch seconds of the end of each window"""
+        return self.starts + self.interval * 60
+
+    def window_nodes(self, window):
+        """the NodeTable with the projected usage of the window, the node data are shared"""
+        result = copy.copy(self.nodes)
+        result.gpus_used = self.nodes.ngpus - self.free_gpus[window]
+        result.cpus_used = self.nodes.ncpus - self.free_cpus[window]
+        result.mem_used = self.nodes.mem - self.free_mem[window]
+        result.njobs = self.njobs[window]
+        return result
+
+    def slots(self, shapes, usable=None):
+        """
+        the (windows x shapes) number of slots for the shapes in each window (see slots.py),
+        usable is the mask of the nodes to consider, default is the nodes good for new jobs
+        """
+        if usable is None:
+            usable = self.nodes.good_for_newjobs_mask()
+        result = np.zeros((len(self), len(shapes)), dtype=np.int64)
+        for w in range(len(self)):
+            result[w] = node_slots(self.window_nodes(w), shapes, usable).sum(axis=1)
+        return result
+
+    def to_dict(self):
+        """the cluster wide free resources of each window, the off nodes are not counted"""
+        on = ~self.nodes.off_mask()
+        return [{"start_time": int(self.starts[w]), "free_gpus": int(self.free_gpus[w][on].sum()),
+                 "free_cpus": int(self.free_cpus[w][on].sum()), "free_mem_in_gb": int(self.free_mem[w][on].sum()),
+                 "njobs": int(self.njobs[w][on].sum())}
+                for w in range(len(self))]
+
+
+def _job_releases(nodes, jobs, rows):
+    """
+    the per node releases of the jobs in rows, as (positions in rows, node rows, gpus, cpus,
+    mem); the resources of a job are evenly distributed over its compute nodes like in
+    NodeTable.add_job_usage
+    """
+    host_rows = nodes.host_rows()
+    index = ([], [], [], [], [])
+    for i, pos in enumerate(rows):
+        codes = jobs.node_codes[pos]
+        nnodes = len(codes)
+        if nnodes == 0:
+            continue
+        values = (int(jobs.gpu[pos] / nnodes), int(jobs.cpu[pos] / nnodes), int(jobs.mem[pos] / nnodes))
+        for code in dict.fromkeys(codes):
+            row = host_rows[code] if code < len(host_rows) else -1
+            if row >= 0:
+                index[0].append(i)
+                index[1].append(row)
+                for column, v in zip(index[2:], values):
+                    column.append(v)
+    return tuple(np.asarray(x, dtype=np.int64) for x in index)
+
+
+def compute_capacity_timeline(nodes, jobs, windows=DEFAULT_SNAPSHOT_WINDOWS, now=None):
+    """
+    project the free resources for each window (see the file comments)
+
+    :param nodes: NodeTable or list of Node, with the current usage
+    :param jobs: JobTable or list of Job
+    :param windows: the SnapshotWindows
+    :param now: the epoch seconds of the beginning of the timeline, default is the reference time
+                of the jobs (the remaining time is counted from it, see JobTable), or the current
+                time (to the minute) if it's not known
+    :return: CapacityTimeline
+    """
+    nodes = NodeTable.coerce(nodes)
+    jobs = JobTable.coerce(jobs)
+    if now is None:
+        now = jobs.reference_ts if jobs.reference_ts is not None else int(time.time()) // 60 * 60
+    seconds = windows.interval * 60
+    starts = now + seconds * np.arange(windows.count, dtype=np.int64)
+
+    # the end time of the running jobs with the remaining time, sorted once
+    remaining = np.fromiter((VERY_BIG_NUMBER if x is None else int(x) for x in jobs.job_remaining_time),
+                            dtype=np.int64, count=len(jobs))
+    running = jobs.general_state != JOB_STATE_PD_CODE
+    n_open_jobs = jobs.job_count(running & (remaining >= VERY_BIG_NUMBER))
+    rows = np.flatnonzero(running & (remaining < VERY_BIG_NUMBER))
+    ends = now + np.maximum(remaining[rows], 0) * 60
+    order = np.argsort(ends, kind="stable")
+    rows = rows[order]
+
+    # the window of each job is the number of the window ends before or at the job end, so a
+    # job ending right at the end of a window is in the next one; the jobs ending after the
+    # last window are dropped
+    cuts = np.searchsorted(ends[order], starts + seconds, side="left")
+    rows = rows[:cuts[-1]]
+    job_windows = np.repeat(np.arange(windows.count, dtype=np.int64), np.diff(cuts, prepend=0))
+
+    # the releases on the first row of each node name, then copied to the other rows
+    # with the same name (see NodeTable.index)
+    n = len(nodes)
+    positions, node_rows, gpus, cpus, mem = _job_releases(nodes, jobs, rows)
+    released = []
+    for values in (gpus, cpus, mem, np.ones(len(positions), dtype=np.int64)):
+        delta = np.zeros((windows.count, n), dtype=np.int64)
+        np.add.at(delta, (job_windows[positions], node_rows), values)
+        released.append(nodes._spread_to_rows(np.cumsum(delta, axis=0)))
+
+    # the free resources never go over the node capacity
+    free_gpus = np.minimum(nodes.free_gpus() + released[0], nodes.ngpus)
+    free_cpus = np.minimum(nodes.free_cpus() + released[1], nodes.ncpus)
+    free_mem = np.minimum(nodes.free_mem() + released[2], nodes.mem)
+    njobs = np.maximum(nodes.njobs - released[3], 0)
+    return CapacityTimeline(nodes, starts, windows.interval, free_gpus, free_cpus, free_mem, njobs, n_open_jobs)
+
+
+class StartEstimate:
+    """
+    the estimated start of a job (see estimate_start)
+
+    window is the earliest window with enough slots and start_time is its beginning (epoch
+    seconds), both are None if no window has enough slots; available_slots is the slots for the
+    job in that window (in the last window if none), competing_jobs is the number of similar
+    pending jobs. confidence is high, medium, low or none, and note tells why
+    """
+
+    def __init__(self, shape, window, start_time, available_slots, competing_jobs, confidence, note):
+        self.shape = shape
+        self.window = window
+        self.start_time = start_time
+        self.available_slots = available_slots
+        self.competing_jobs = competing_jobs
+        self.confidence = confidence
+        self.note = note
+
+    def __str__(self):
+        start = "not in the timeline" if self.start_time is None else epoch_to_datetime(self.start_time).isoformat()
+        return ("for {0} gpu {1} cpu {2} GB memory (gpu type {3}) the estimated start is {4}, {5} slots for "
+                "{6} similar pending jobs, confidence {7}: {8}\n").format(
+            self.shape.ngpus, self.shape.ncpus, self.shape.mem_gb, self.shape.gpu_type or "any", start,
+            self.available_slots, self.competing_jobs, self.confidence, self.note)
+
+    def to_dict(self):
+        return {"ngpus": self.shape.ngpus, "ncpus": self.shape.ncpus, "mem_in_gb": self.shape.mem_gb,
+                "gpu_type": self.shape.gpu_type or "any", "window": self.window,
+                "start_time": None if self.start_time is None else epoch_to_datetime(self.start_time).isoformat(),
+                "available_slots": self.available_slots, "competing_jobs": self.competing_jobs,
+                "confidence": self.confidence, "note": self.note}
+
+
+def count_competing_jobs(jobs, shape):
+    """
+    the number of pending jobs asking for the same or less resources than the shape, a gpu job
+    only competes with the gpu jobs and a cpu job with the cpu jobs. The cpus/memory of 0 in the
+    shape are not limiting (like in node_slots), so they don't filter the jobs either
+
+    with the gpu type in the shape, only the jobs asking for that type (case-insensitive) or for
+    no type compete, the jobs without type could take the same nodes
+    """
+    jobs = JobTable.coerce(jobs)
+    rows = jobs.general_state == JOB_STATE_PD_CODE
+    if shape.ncpus > 0:
+        rows &= jobs.cpu <= shape.ncpus
+    if shape.mem_gb > 0:
+        rows &= jobs.mem <= shape.mem_gb
+    if shape.ngpus > 0:
+        rows &= (jobs.gpu > 0) & (jobs.gpu <= shape.ngpus)
+        if shape.gpu_type:
+            types = ("none", shape.gpu_type.lower())
+            codes = [i for i, x in enumerate(GPU_TYPES.strings()) if x.lower() in types]
+            rows &= np.isin(jobs.gpu_type_codes, codes)
+    else:
+        rows &= jobs.gpu == 0
+    return jobs.job_count(rows)
+
+
+def estimate_start(timeline, jobs, shape, usable=None):
+    """
+    estimate the start of a job with the request shape (SlotShape), it's the earliest window
+    where the slots for the job are more than the competing pending jobs (see the file comments)
+
+    :param timeline: the CapacityTimeline
+    :param jobs: the JobTable or list of Job of the timeline, for the pending jobs
+    :param usable: the mask of the nodes to consider, default is the nodes good for new jobs
+    :return: StartEstimate
+    """
+    if usable is None:
+        usable = timeline.nodes.good_for_newjobs_mask()
+    competing = count_competing_jobs(jobs, shape)
+    slots = timeline.slots([shape], usable)[:, 0]
+    enough = np.flatnonzero(slots > competing)
+    hours = len(timeline) * timeline.interval / 60
+
+    if len(enough) == 0:
+        # the empty nodes tell whether the job could ever fit
+        empty = copy.copy(timeline.nodes)
+        empty.gpus_used = np.zeros(len(empty), dtype=np.int64)
+        empty.cpus_used = np.zeros(len(empty), dtype=np.int64)
+        empty.mem_used = np.zeros(len(empty), dtype=np.int64)
+        if node_slots(empty, [shape], usable).sum() == 0:
+            return StartEstimate(shape, None, None, 0, competing, "none",
+                                 "no usable node is big enough for the job")
+        return StartEstimate(shape, None, None, int(slots[-1]), competing, "low",
+                             "not enough slots in the next {0:g} hours, the slots are freed later by the running "
+                             "jobs ending after the timeline or without time limit".format(hours))
+
+    window = int(enough[0])
+    if window == 0 and competing == 0:
+        confidence, note = "high", "the slots are free in the first window and no similar job is pending"
+    elif window == 0:
+        confidence, note = "medium", "the slots are free in the first window, but {} similar jobs are pending and " \
+                                     "the scheduler may start them first".format(competing)
+    else:
+        confidence = "medium" if timeline.n_open_jobs == 0 else "low"
+        note = "the slots are freed by the running jobs at their time limit, they often end earlier"
+        if competing:
+            note += "; {} similar jobs are pending".format(competing)
+        if timeline.n_open_jobs:
+            note += "; {} running jobs have no time limit".format(timeline.n_open_jobs)
+    return StartEstimate(shape, window, int(timeline.starts[window]), int(slots[window]), competing, confidence,
+                         note)
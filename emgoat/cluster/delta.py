@@ -0,0 +1,144 @@
+"""
+Delta of the json result against the previous snapshot
+
+each time the json result is written, the delta file <result>_delta.json is written too. It has
+the sequence number of the snapshot and, for the nodes/accounts/jobs, the records added, removed
+(only the keys) and changed since the previous snapshot; the records are keyed by node_name,
+account_name and jobID. The summary block only has the changed summary fields. For example:
+
+{"sequence":12,"base_sequence":11,"full":false,"time":"2025-07-29T11:30:00",
+ "summary":{"n_pending_jobs":3},
+ "nodes":{"added":[],"removed":[],"changed":[{...}]},
+ "accounts":{...},
+ "jobs":{"added":[{...}],"removed":["1234"],"changed":[]}}
+
+the json result has the same sequence number, so a client loads the full result once and then
+applies the delta with base_sequence equal to its sequence. Every delta_full_snapshot_every
+snapshots (or if there's no previous snapshot) the delta is full: full is true and all of records
+are in added, the client should drop its data before applying it.
+
+the times in minutes of the jobs change on every refresh, they are not considered when checking
+whether the job is changed (the client could advance them with the time of the delta); the full
+deltas bring them up to date
+"""
+import json
+import os
+from datetime import datetime
+from emgoat.util import read_json_data_file
+
+#
+# the key field of the records in each section
+#
+SECTION_KEYS = {"nodes": "node_name", "accounts": "account_name", "jobs": "jobID"}
+
+#
+# the job fields that are not considered for the changes
+#
+VOLATILE_FIELDS = {"pending_time_in_minutes", "job_remaining_time_in_minutes", "used_time_in_minutes"}
+
+#
+# the default cadence of the full delta
+#
+DEFAULT_FULL_SNAPSHOT_EVERY = 12
+
+
+def delta_file_name(json_result):
+    """the delta file name for the json result, like /data/results_delta.json"""
+    return os.path.splitext(json_result)[0] + "_delta.json"
+
+
+def read_previous_result(json_result, jobs_file=None):
+    """
+    read the previous json result for computing the delta, None is returned if it's not there
+    or it can not be read. If the jobs are in the NDJSON file, jobs_file is the file name
+    """
+    if not os.path.exists(json_result):
+        return None
+    try:
+        result = read_json_data_file(json_result)
+        if jobs_file is not None:
+            with open(jobs_file) as f:
+                result["jobs"] = [json.loads(x) for x in f if x.strip()]
+    except (OSError, ValueError, RuntimeError):
+        return None
+    return result
+
+
+def _record_changed(previous, current):
+    """whether the record is changed, the volatile fields are not considered"""
+    if previous.keys() != current.keys():
+        return True
+    return any(previous[k] != v for k, v in current.items() if k not in VOLATILE_FIELDS)
+
+
+class DeltaTracker:
+    """
+    compute the delta while the records of the new snapshot are written
+
+    the records pass through track(), so the new snapshot does not need to be kept in memory,
+    only the previous records which are not seen yet and the added/changed records are kept
+    """
+
+    def __init__(self, previous, full_snapshot_every=DEFAULT_FULL_SNAPSHOT_EVERY):
+        """
+        :param previous: the previous json result (dict), or None
+        :param full_snapshot_every: the cadence of the full delta, in number of snapshots
+        """
+        previous_sequence = previous.get("sequence", 0) if previous else 0
+        self.sequence = previous_sequence + 1
+        self.full = previous_sequence == 0 or self.sequence % max(full_snapshot_every, 1) == 0
+        self._previous_summary = previous.get("summary", {}) if previous and not self.full else {}
+        self._previous = {}
+        self._added = {}
+        self._changed = {}
+        for section, key in SECTION_KEYS.items():
+            records = previous.get(section, []) if previous and not self.full else []
+            self._previous[section] = {x[key]: x for x in records}
+            self._added[section] = []
+            self._changed[section] = []
+        self._summary = {}
+        self._tracked = []
+
+    def track(self, section, records):
+        """
+        yield the input records of the section, and record the added/changed ones
+        """
+        key = SECTION_KEYS[section]
+        previous = self._previous[section]
+        added = self._added[section]
+        changed = self._changed[section]
+        self._tracked.append(section)
+        for record in records:
+            old = previous.pop(record[key], None)
+            if old is None:
+                added.append(record)
+            elif _record_changed(old, record):
+                changed.append(record)
+            yield record
+
+    def skip(self, section):
+        """the section is same as in the previous snapshot, so nothing is added, removed or changed"""
+        self._previous[section] = {}
+        self._tracked.append(section)
+
+    def track_summary(self, summary):
+        """record the changed summary fields"""
+        if self.full:
+            self._summary = dict(summary)
+        else:
+            self._summary = {k: v for k, v in summary.items() if self._previous_summary.get(k) != v}
+
+    def delta_fields(self):
+        """
+        the fields of the delta file, see write_json_stream
+        """
+        fields = [("sequence", self.sequence),
+                  ("base_sequence", None if self.full else self.sequence - 1),
+                  ("full", self.full),
+                  ("time", datetime.now().isoformat()),
+                  ("summary", self._summary)]
+        for section in self._tracked:
+            fields.append((section, {"added": self._added[section],
+                                     "removed": list(self._previous[section]),
+                                     "changed": self._changed[section]}))
+        return fields
@@ -0,0 +1,213 @@
+"""
+Columnar exports of the node, job and account tables
+
+the json results are good for the web page, but for the analysis in pandas the typed columns are
+much faster to load. Here the tables are written as Apache Arrow IPC file or Parquet (pyarrow is
+needed for both), or CSV as fallback.
+
+the columns are typed: the resources and the times in minutes are integers, the submit/start time
+are timestamps (UTC) and the missing data is null (empty in CSV) instead of the "None"/"N/A"
+strings in the json results. The grouped pending job arrays (see util/jobarrays.py) are one row
+with the number of elements in array_count (1 for the other jobs), so the job counts are the sum
+of array_count
+
+the format is selected in the lsf/slurm section of the config:
+
+export_format = parquet
+
+the value is one of parquet, arrow or csv; empty value means no export. Each file is written into
+a temporary file first and then renamed, so the readers never see a half written file
+"""
+import csv
+import os
+from collections import namedtuple
+from datetime import datetime, timezone
+import numpy as np
+from emgoat.util import VERY_BIG_NUMBER, PARTITIONS
+from .tables import NodeTable, JobTable, MISSING_TIME
+
+#
+# the export formats and the file extension for each
+#
+EXPORT_FORMATS = {"parquet": "parquet", "arrow": "arrow", "csv": "csv"}
+
+#
+# one column of the exported table, kind is one of int, timestamp or string; mask marks the
+# null values (None for no null)
+#
+ExportColumn = namedtuple("ExportColumn", ["name", "kind", "values", "mask"])
+
+
+def _int_minutes(values):
+    """the times in minutes as int64 column, the very big number (time not known) is null"""
+    values = np.fromiter((int(x) for x in values), dtype=np.int64, count=len(values))
+    return values, values >= VERY_BIG_NUMBER
+
+
+def _partition_strings(bits):
+    """the partition names of each row joined by space"""
+    names = {}
+    result = []
+    for x in bits.tolist():
+        if x not in names:
+            names[x] = " ".join(PARTITIONS.decode(i) for i in range(len(PARTITIONS)) if x >> i & 1)
+        result.append(names[x])
+    return result
+
+
+def node_columns(nodes):
+    """
+    the exported columns for the nodes, the input is NodeTable or list of Node
+    """
+    nodes = NodeTable.coerce(nodes)
+    return [
+        ExportColumn("node_name", "string", nodes.names, None),
+        ExportColumn("gpu_type", "string", nodes.gpu_types, None),
+        ExportColumn("status", "string", nodes.statuses, None),
+        ExportColumn("total_gpus", "int", nodes.ngpus, None),
+        ExportColumn("total_cpus", "int", nodes.ncpus, None),
+        ExportColumn("total_mem_in_gb", "int", nodes.mem, None),
+        ExportColumn("ngpus_in_use", "int", nodes.gpus_used, None),
+        ExportColumn("ncpus_in_use", "int", nodes.cpus_used, None),
+        ExportColumn("memory_in_use", "int", nodes.mem_used, None),
+        ExportColumn("available_gpus", "int", nodes.free_gpus(), None),
+        ExportColumn("available_cpus", "int", nodes.free_cpus(), None),
+        ExportColumn("available_memory", "int", nodes.free_mem(), None),
+        ExportColumn("njobs", "int", nodes.njobs, None),
+        ExportColumn("partitions", "string", _partition_strings(nodes.partition_bits), None),
+    ]
+
+
+def job_columns(jobs):
+    """
+    the exported columns for the jobs, the input is JobTable or list of Job
+    """
+    jobs = JobTable.coerce(jobs)
+    pending_time, pending_null = _int_minutes(jobs.pending_time)
+    remaining_time, remaining_null = _int_minutes(jobs.job_remaining_time)
+    used_time, used_null = _int_minutes(jobs.used_time)
+    return [
+        ExportColumn("account_name", "string", jobs.accounts, None),
+        ExportColumn("jobID", "string", [str(x) for x in jobs.jobids], None),
+        ExportColumn("job_name", "string", jobs.job_names, None),
+        ExportColumn("submit_time", "timestamp", jobs.submit_ts, jobs.submit_ts == MISSING_TIME),
+        ExportColumn("state", "string", jobs.states, None),
+        ExportColumn("general_state", "string", [jobs.general_state_str(i) for i in range(len(jobs))], None),
+        ExportColumn("pending_time_in_minutes", "int", pending_time, pending_null),
+        ExportColumn("job_remaining_time_in_minutes", "int", remaining_time, remaining_null),
+        ExportColumn("start_time", "timestamp", jobs.start_ts, jobs.start_ts == MISSING_TIME),
+        ExportColumn("used_time_in_minutes", "int", used_time, used_null),
+        ExportColumn("cpu_used", "int", jobs.cpu, None),
+        ExportColumn("gpu_used", "int", jobs.gpu, None),
+        ExportColumn("memory_request_in_GB", "int", jobs.mem, None),
+        ExportColumn("compute_nodes_list", "string", [" ".join(x) for x in jobs.compute_nodes], None),
+        ExportColumn("partitions", "string", _partition_strings(jobs.partition_bits), None),
+        ExportColumn("array_count", "int", jobs.array_counts, None),
+        ExportColumn("array_indices", "string", jobs.array_indices,
+                     np.fromiter((x is None for x in jobs.array_indices), dtype=bool, count=len(jobs))),
+    ]
+
+
+def account_columns(accounts):
+    """
+    the exported columns for the accounts, the input is the list of Account
+    """
+    return [
+        ExportColumn("account_name", "string", [x.account_name for x in accounts], None),
+        ExportColumn("n_running_jobs", "int", np.array([x.n_running_jobs for x in accounts], dtype=np.int64), None),
+        ExportColumn("n_pending_jobs", "int", np.array([x.n_pending_jobs for x in accounts], dtype=np.int64), None),
+        ExportColumn("n_gpus_used", "int", np.array([x.ngpus for x in accounts], dtype=np.int64), None),
+        ExportColumn("n_cpus_used", "int", np.array([x.ncpus for x in accounts], dtype=np.int64), None),
+        ExportColumn("compute_nodes_list", "string", [" ".join(x.nodes_list) for x in accounts], None),
+    ]
+
+
+def _arrow_table(columns):
+    """build the pyarrow table from the columns"""
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise RuntimeError("pyarrow is needed for exporting the tables in parquet/arrow format, "
+                           "please install it or use the csv format")
+
+    arrays = []
+    for c in columns:
+        if c.kind == "int":
+            arrays.append(pa.array(np.asarray(c.values, dtype=np.int64), type=pa.int64(), mask=c.mask))
+        elif c.kind == "timestamp":
+            arrays.append(pa.array(np.asarray(c.values, dtype=np.int64), type=pa.timestamp("s", tz="UTC"),
+                                   mask=c.mask))
+        else:
+            arrays.append(pa.array(c.values, type=pa.string()))
+    return pa.Table.from_arrays(arrays, names=[c.name for c in columns])
+
+
+def _csv_value(column, i):
+    """the value of the column at row i for the csv file, null is empty"""
+    if column.mask is not None and column.mask[i]:
+        return ""
+    value = column.values[i]
+    if column.kind == "timestamp":
+        return datetime.fromtimestamp(int(value), tz=timezone.utc).isoformat()
+    if column.kind == "int":
+        return int(value)
+    return value
+
+
+def _write_file(file_name, columns, export_format):
+    """write the columns into the file in the given format"""
+    if export_format == "parquet":
+        table = _arrow_table(columns)
+        import pyarrow.parquet as pq
+        pq.write_table(table, file_name)
+    elif export_format == "arrow":
+        table = _arrow_table(columns)
+        import pyarrow as pa
+        with pa.OSFile(file_name, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+    else:
+        nrows = len(columns[0].values) if columns else 0
+        with open(file_name, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow([c.name for c in columns])
+            for i in range(nrows):
+                writer.writerow([_csv_value(c, i) for c in columns])
+
+
+def write_columns(file_name, columns, export_format):
+    """
+    write the columns into the file in the given format (see EXPORT_FORMATS), through the
+    temporary file file_name.tmp which is renamed to the file at the end
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise RuntimeError("Invalid export format: {0}, it should be one of {1}".format(
+            export_format, " ".join(EXPORT_FORMATS)))
+    tmp_name = file_name + ".tmp"
+    try:
+        _write_file(tmp_name, columns, export_format)
+    except BaseException:
+        if os.path.exists(tmp_name):
+            os.remove(tmp_name)
+        raise
+    os.replace(tmp_name, file_name)
+
+
+def export_tables(prefix, export_format, nodes, jobs, accounts):
+    """
+    write the nodes, jobs and accounts into <prefix>_nodes.<ext>, <prefix>_jobs.<ext> and
+    <prefix>_accounts.<ext>
+
+    :return: the list of written file names
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise RuntimeError("Invalid export format: {0}, it should be one of {1}".format(
+            export_format, " ".join(EXPORT_FORMATS)))
+    ext = EXPORT_FORMATS[export_format]
+    files = []
+    for name, columns in [("nodes", node_columns(nodes)), ("jobs", job_columns(jobs)),
+                          ("accounts", account_columns(accounts))]:
+        file_name = "{0}_{1}.{2}".format(prefix, name, ext)
+        write_columns(file_name, columns, export_format)
+        files.append(file_name)
+    return files
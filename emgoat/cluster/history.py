@@ -0,0 +1,413 @@
+"""
+History of the cluster snapshots in a local SQLite database
+
+every refresh overwrites the data files and the json results, so for the capacity planning each
+snapshot is also appended into the database given by history_db in the lsf/slurm section of the
+config. The tables are:
+
+snapshots   - one row for each snapshot: id, time (epoch seconds), cluster (lsf/slurm) and scope
+              (the lsf queue, empty for the whole slurm cluster)
+summary     - the numeric fields of the summary, one row for each (snapshot, field)
+nodes       - the nodes with their usage
+jobs        - the running/pending jobs, the compute nodes are space separated
+accounts    - the usage of each account with jobs
+
+each row has the time of its snapshot, so that the time range queries do not need the join; the
+indexes are on (time, account) and jobid of the jobs, (time, node) of the nodes and the ones for
+the time series queries (see HistoryStore).
+
+the writes must not slow down the refresh, so the snapshot is only put into the queue of the
+HistoryWriter and its thread writes all of rows of a snapshot in one transaction. The queue is
+flushed when the process exits. The same thread also moves the old snapshots into the hourly and
+daily tiers from time to time (see rollup.py), the queries take the old data from these tiers
+"""
+import atexit
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from collections import namedtuple
+from .tables import MISSING_TIME
+from .rollup import ROLLUP_TIERS, HISTORY_TIERS, create_rollup_tables, rollup_state, rollup_fields, rollup_series
+from .rollup import compact
+
+#
+# the default seconds between two compactions of the history
+#
+DEFAULT_COMPACT_INTERVAL = 3600
+
+#
+# one snapshot for the history, summary is the dict of Summary.to_dict(); nodes/jobs are the
+# NodeTable/JobTable and accounts is the list of Account
+#
+HistorySnapshot = namedtuple("HistorySnapshot", ["time", "cluster", "scope", "summary", "nodes", "jobs", "accounts"])
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (id INTEGER PRIMARY KEY, time INTEGER NOT NULL, cluster TEXT NOT NULL,
+                                      scope TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS snapshots_time ON snapshots (cluster, scope, time);
+CREATE TABLE IF NOT EXISTS summary (snapshot_id INTEGER NOT NULL, time INTEGER NOT NULL, field TEXT NOT NULL,
+                                    value REAL);
+CREATE INDEX IF NOT EXISTS summary_field_time ON summary (field, time);
+CREATE INDEX IF NOT EXISTS summary_time ON summary (time);
+CREATE TABLE IF NOT EXISTS nodes (snapshot_id INTEGER NOT NULL, time INTEGER NOT NULL, node TEXT NOT NULL,
+                                  gpu_type TEXT, status TEXT, ngpus INTEGER, gpus_used INTEGER, ncpus INTEGER,
+                                  cpus_used INTEGER, mem INTEGER, mem_used INTEGER, njobs INTEGER);
+CREATE INDEX IF NOT EXISTS nodes_time_node ON nodes (time, node);
+CREATE INDEX IF NOT EXISTS nodes_node_time ON nodes (node, time);
+CREATE TABLE IF NOT EXISTS jobs (snapshot_id INTEGER NOT NULL, time INTEGER NOT NULL, jobid TEXT NOT NULL,
+                                 account TEXT, state TEXT, general_state TEXT, cpu INTEGER, gpu INTEGER,
+                                 mem INTEGER, submit_time INTEGER, start_time INTEGER, compute_nodes TEXT,
+                                 array_count INTEGER);
+CREATE INDEX IF NOT EXISTS jobs_time_account ON jobs (time, account);
+CREATE INDEX IF NOT EXISTS jobs_jobid ON jobs (jobid);
+CREATE TABLE IF NOT EXISTS accounts (snapshot_id INTEGER NOT NULL, time INTEGER NOT NULL, account TEXT NOT NULL,
+                                     n_running_jobs INTEGER, n_pending_jobs INTEGER, ngpus INTEGER, ncpus INTEGER);
+CREATE INDEX IF NOT EXISTS accounts_account_time ON accounts (account, time);
+CREATE INDEX IF NOT EXISTS accounts_time ON accounts (time);
+"""
+
+#
+# the fields for the time series of the accounts, nodes and gpu types
+#
+ACCOUNT_FIELDS = rollup_fields("accounts")
+NODE_FIELDS = rollup_fields("nodes")
+GPU_TYPE_FIELDS = rollup_fields("gpu_types")
+
+
+def _summary_rows(summary):
+    """the (field, value) of the numeric fields in the summary dict"""
+    return [(k, v) for k, v in summary.items() if isinstance(v, (int, float)) and not isinstance(v, bool)]
+
+
+def _node_rows(nodes):
+    return zip(nodes.names, nodes.gpu_types, nodes.statuses, nodes.ngpus.tolist(), nodes.gpus_used.tolist(),
+               nodes.ncpus.tolist(), nodes.cpus_used.tolist(), nodes.mem.tolist(), nodes.mem_used.tolist(),
+               nodes.njobs.tolist())
+
+
+def _job_rows(jobs):
+    start = [None if x == MISSING_TIME else x for x in jobs.start_ts.tolist()]
+    general_state = [jobs.general_state_str(i) for i in range(len(jobs))]
+    return zip(jobs.jobids, jobs.accounts, jobs.states, general_state, jobs.cpu.tolist(), jobs.gpu.tolist(),
+               jobs.mem.tolist(), jobs.submit_ts.tolist(), start, [" ".join(x) for x in jobs.compute_nodes],
+               jobs.array_counts.tolist())
+
+
+def _time_range(start, end):
+    """the sql condition and the parameters for the time range, both ends are inclusive"""
+    conditions = []
+    params = []
+    if start is not None:
+        conditions.append(" AND time >= ?")
+        params.append(int(start))
+    if end is not None:
+        conditions.append(" AND time <= ?")
+        params.append(int(end))
+    return "".join(conditions), params
+
+
+class HistoryStore:
+    """
+    the history database, it's used by the writer thread for adding the snapshots and by the
+    caller for the queries; each thread should have its own HistoryStore (the sqlite connection
+    can not be shared by threads)
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(_SCHEMA)
+        create_rollup_tables(self.conn)
+
+    def close(self):
+        self.conn.close()
+
+    def add_snapshot(self, snapshot):
+        """
+        write all of rows of the snapshot in one transaction
+
+        :return: the id of the snapshot
+        """
+        t = int(snapshot.time)
+        with self.conn:
+            cursor = self.conn.execute("INSERT INTO snapshots (time, cluster, scope) VALUES (?, ?, ?)",
+                                       (t, snapshot.cluster, snapshot.scope))
+            sid = cursor.lastrowid
+            self.conn.executemany("INSERT INTO summary VALUES (?, ?, ?, ?)",
+                                  ((sid, t) + x for x in _summary_rows(snapshot.summary)))
+            self.conn.executemany("INSERT INTO nodes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                  ((sid, t) + x for x in _node_rows(snapshot.nodes)))
+            self.conn.executemany("INSERT INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                  ((sid, t) + x for x in _job_rows(snapshot.jobs)))
+            self.conn.executemany("INSERT INTO accounts VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                  ((sid, t, x.account_name, x.n_running_jobs, x.n_pending_jobs, x.ngpus, x.ncpus)
+                                   for x in snapshot.accounts if x.has_any_jobs()))
+        return sid
+
+    def _snapshot_filter(self, cluster, scope):
+        """the sql condition on the snapshot of the row, for the cluster and scope"""
+        conditions = []
+        params = []
+        if cluster is not None:
+            conditions.append("cluster = ?")
+            params.append(cluster)
+        if scope is not None:
+            conditions.append("scope = ?")
+            params.append(scope)
+        if not conditions:
+            return "", []
+        return " AND snapshot_id IN (SELECT id FROM snapshots WHERE " + " AND ".join(conditions) + ")", params
+
+    def snapshots(self, cluster=None, scope=None, start=None, end=None):
+        """the list of (id, time, cluster, scope) of the snapshots in the time range"""
+        sql = "SELECT id, time, cluster, scope FROM snapshots WHERE 1"
+        params = []
+        if cluster is not None:
+            sql += " AND cluster = ?"
+            params.append(cluster)
+        if scope is not None:
+            sql += " AND scope = ?"
+            params.append(scope)
+        condition, time_params = _time_range(start, end)
+        return self.conn.execute(sql + condition + " ORDER BY time, id", params + time_params).fetchall()
+
+    def summary_fields(self):
+        """the names of the summary fields in the history"""
+        sql = " UNION ".join(["SELECT field FROM summary"] +
+                             ["SELECT field FROM {}_summary".format(x) for x in ROLLUP_TIERS])
+        return [x[0] for x in self.conn.execute(sql + " ORDER BY field")]
+
+    def compact(self, raw_days, hourly_days, now=None):
+        """move the old snapshots into the hourly and daily tiers, see rollup.py"""
+        return compact(self.conn, raw_days, hourly_days, now)
+
+    def _segments(self, tier, start, end):
+        """
+        split the time range into the parts of each tier, the raw data is from raw_until and
+        the hourly from hourly_until (see rollup.py); if the tier is given only it's used
+        """
+        if tier is not None:
+            if tier not in HISTORY_TIERS:
+                raise RuntimeError("unknown history tier {}, it should be one of {}".format(tier, HISTORY_TIERS))
+            return [(tier, start, end)]
+        raw_until, hourly_until = rollup_state(self.conn)
+        segments = []
+        for t, lo, hi in (("daily", None, hourly_until - 1), ("hourly", hourly_until, raw_until - 1),
+                          ("raw", raw_until, None)):
+            lo = start if lo is None else (lo if start is None else max(lo, start))
+            hi = end if hi is None else (hi if end is None else min(hi, end))
+            if t != "raw" and hi is not None and hi < 0:
+                continue
+            if lo is None or hi is None or lo <= hi:
+                segments.append((t, lo, hi))
+        return segments
+
+    def _series(self, name, key, field, raw_sql, cluster, scope, start, end, tier, agg):
+        """
+        the time series from the tiers covering the time range, raw_sql is the query of (time, value)
+        on the raw tables with the parameter of the key
+        """
+        if field not in rollup_fields(name):
+            raise RuntimeError("unknown {} field {}, it should be one of {}".format(name, field, rollup_fields(name)))
+        result = []
+        for t, lo, hi in self._segments(tier, start, end):
+            if t != "raw":
+                result.extend(rollup_series(self.conn, t, name, key, field, agg, cluster, scope, lo, hi))
+                continue
+            condition, params = _time_range(lo, hi)
+            snapshot_condition, snapshot_params = self._snapshot_filter(cluster, scope)
+            sql = raw_sql.format(condition=condition + snapshot_condition)
+            result.extend(self.conn.execute(sql, [key] + params + snapshot_params).fetchall())
+        return result
+
+    def summary_series(self, field, cluster=None, scope=None, start=None, end=None, tier=None, agg="mean"):
+        """
+        the time series of the summary field, like n_pending_jobs or total_used_gpus
+
+        the old part of the range is taken from the hourly/daily tiers (see rollup.py), where the
+        value is the mean or max (agg) over the snapshots of the bucket; tier could be given to
+        take the data from only one tier (raw, hourly or daily)
+
+        :return: the list of (time, value)
+        """
+        sql = "SELECT time, value FROM summary WHERE field = ?{condition} ORDER BY time"
+        return self._series("summary", field, "value", sql, cluster, scope, start, end, tier, agg)
+
+    def account_series(self, account, field="ngpus", cluster=None, scope=None, start=None, end=None, tier=None,
+                       agg="mean"):
+        """
+        the time series of the account usage, the field is one of ACCOUNT_FIELDS; the raw snapshots
+        where the account has no jobs are not in the result. See summary_series for the tiers
+
+        :return: the list of (time, value)
+        """
+        sql = "SELECT time, " + field + " FROM accounts WHERE account = ?{condition} ORDER BY time"
+        return self._series("accounts", account, field, sql, cluster, scope, start, end, tier, agg)
+
+    def node_series(self, node, field="gpus_used", cluster=None, scope=None, start=None, end=None, tier=None,
+                    agg="mean"):
+        """
+        the time series of the node, the field is one of NODE_FIELDS; see summary_series for the tiers
+
+        :return: the list of (time, value)
+        """
+        sql = "SELECT time, " + field + " FROM nodes WHERE node = ?{condition} ORDER BY time"
+        return self._series("nodes", node, field, sql, cluster, scope, start, end, tier, agg)
+
+    def gpu_type_series(self, gpu_type, field="gpus_used", cluster=None, scope=None, start=None, end=None,
+                        tier=None, agg="mean"):
+        """
+        the time series of the nodes of the gpu type together, the field is one of GPU_TYPE_FIELDS;
+        see summary_series for the tiers
+
+        :return: the list of (time, value)
+        """
+        value = "COUNT(*)" if field == "nnodes" else "SUM(" + field + ")"
+        sql = ("SELECT time, " + value + " FROM nodes WHERE gpu_type = ?{condition} "
+               "GROUP BY snapshot_id ORDER BY time")
+        return self._series("gpu_types", gpu_type, field, sql, cluster, scope, start, end, tier, agg)
+
+    def job_history(self, jobid):
+        """the list of (time, state, compute_nodes) of the job over the snapshots"""
+        return self.conn.execute("SELECT time, state, compute_nodes FROM jobs WHERE jobid = ? ORDER BY time",
+                                 (str(jobid),)).fetchall()
+
+
+class HistoryWriter:
+    """
+    write the snapshots into the history database in the background thread
+
+    writer = HistoryWriter("/data/history.db")
+    writer.submit(snapshot)
+    ...
+    writer.close()
+
+    if the database could not be opened (like a bad path or a locked database), the failure is
+    counted in errors and reported, the queued snapshots are dropped and the thread stops; the
+    next submit starts a new thread which tries to open the database again
+    """
+
+    def __init__(self, path, raw_days=None, hourly_days=None, compact_interval=DEFAULT_COMPACT_INTERVAL):
+        """
+        :param raw_days/hourly_days: the retention of the raw and hourly tiers (see rollup.py), the
+                                     snapshots are not compacted if raw_days is None
+        :param compact_interval: the seconds between two compactions
+        """
+        self.path = path
+        self.raw_days = raw_days
+        self.hourly_days = hourly_days
+        self.compact_interval = compact_interval
+        self._last_compact = None
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.errors = 0
+
+    def submit(self, snapshot):
+        """
+        put the snapshot into the queue, the thread (with its own queue) is started for the first
+        snapshot, or again after the last thread failed to open the database
+        """
+        with self._lock:
+            if self._thread is None:
+                self._queue = queue.Queue()
+                self._thread = threading.Thread(target=self._run, args=(self._queue,), daemon=True)
+                self._thread.start()
+            self._queue.put(snapshot)
+
+    def _run(self, snapshots):
+        try:
+            store = HistoryStore(self.path)
+        except Exception as e:
+            # drop the queued snapshots so that flush does not wait for them, the next
+            # submit starts a new thread
+            with self._lock:
+                self.errors += 1
+                if self._queue is snapshots:
+                    self._thread = None
+                dropped = 0
+                while True:
+                    try:
+                        dropped += snapshots.get_nowait() is not None
+                    except queue.Empty:
+                        break
+                    snapshots.task_done()
+            print("failed to open the history database {}: {}, {} snapshots are dropped".format(
+                self.path, e, dropped), file=sys.stderr)
+            return
+
+        try:
+            while True:
+                snapshot = snapshots.get()
+                try:
+                    if snapshot is None:
+                        return
+                    store.add_snapshot(snapshot)
+                    self._compact(store)
+                except Exception as e:
+                    # the history should not break the refresh, the error is only reported
+                    self.errors += 1
+                    print("failed to write the snapshot into {}: {}".format(self.path, e), file=sys.stderr)
+                finally:
+                    snapshots.task_done()
+        finally:
+            store.close()
+
+    def _compact(self, store):
+        """compact the history if the retention is set and the last compaction is long enough ago"""
+        if self.raw_days is None:
+            return
+        now = time.time()
+        if self._last_compact is not None and now - self._last_compact < self.compact_interval:
+            return
+        self._last_compact = now
+        store.compact(self.raw_days, self.hourly_days if self.hourly_days is not None else self.raw_days)
+
+    def flush(self):
+        """wait until all of the submitted snapshots are written"""
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self):
+        """write the rest of snapshots and stop the thread"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+            if thread is not None:
+                self._queue.put(None)
+        if thread is not None:
+            thread.join()
+
+
+#
+# the writers for each database, shared by the clusters in the process
+#
+_WRITERS = {}
+_WRITERS_LOCK = threading.Lock()
+
+
+def history_writer(path, raw_days=None, hourly_days=None):
+    """the shared HistoryWriter for the database, the retention is updated if it's given"""
+    with _WRITERS_LOCK:
+        writer = _WRITERS.get(path)
+        if writer is None:
+            writer = _WRITERS[path] = HistoryWriter(path)
+        if raw_days is not None:
+            writer.raw_days = raw_days
+            writer.hourly_days = hourly_days
+        return writer
+
+
+@atexit.register
+def close_history_writers():
+    """write the rest of the snapshots before the process exits"""
+    with _WRITERS_LOCK:
+        writers = list(_WRITERS.values())
+    for writer in writers:
+        writer.close()
+
+
+def make_history_snapshot(cluster, scope, summary, nodes, jobs, accounts):
+    """the HistorySnapshot taken now, see HistorySnapshot for the input"""
+    return HistorySnapshot(int(time.time()), cluster, scope, summary, nodes, jobs, accounts)
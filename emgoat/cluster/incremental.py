@@ -0,0 +1,139 @@
+"""
+Incremental regeneration of the json result
+
+the nodes and jobs data files have their own update time, so between two refreshes the most of
+the sections of the result are the same as the previous result. Here we keep the content hash of
+each section (summary, nodes, accounts, jobs and the extra fields like the partitions) of each
+result file in the state file next to it, like emgoat_slurm_results_sections.json:
+
+{"size": 12345, "mtime_ns": ..., "sections": {"nodes": {"digest": "...", "start": 10, "end": 900}, ...}}
+
+start/end is the position of the encoded section in the result file. When the result is written
+again:
+
+- if the hash of every section is same, nothing is written at all, so the mtime of the result
+  is still the time when the data was changed
+- otherwise the changed sections are encoded again, and the unchanged nodes/jobs are copied from
+  the previous result as they are
+
+the hash of the nodes and jobs are computed from the columns of the tables, which is much cheaper
+than encoding the records. The state is only used if the result file is still the one we wrote
+(same size and mtime), otherwise everything is encoded again
+"""
+import hashlib
+import json
+import os
+import numpy as np
+from emgoat.util import RawJson
+
+def state_file_name(json_result):
+    """the state file name for the json result, like /data/results_sections.json"""
+    return os.path.splitext(json_result)[0] + "_sections.json"
+
+
+def _update(h, value):
+    """update the hash with the numpy column or the python list/tuple"""
+    if isinstance(value, np.ndarray):
+        h.update(str(value.dtype).encode())
+        h.update(np.ascontiguousarray(value).tobytes())
+    else:
+        h.update(repr(value).encode())
+    h.update(b"|")
+
+
+def node_table_digest(nodes):
+    """
+    the content hash of the NodeTable, the string columns are hashed with the strings since
+    the codes are different in each run
+    """
+    h = hashlib.sha1()
+    for value in (nodes.names, nodes.gpu_types, nodes.statuses, nodes.ngpus, nodes.ncpus, nodes.mem,
+                  nodes.gpus_used, nodes.cpus_used, nodes.mem_used, nodes.njobs):
+        _update(h, value)
+    return h.hexdigest()
+
+
+def job_table_digest(jobs):
+    """the content hash of the JobTable, see node_table_digest"""
+    h = hashlib.sha1()
+    for value in (jobs.jobids, jobs.job_names, jobs.states, jobs.general_state, jobs.accounts, jobs.cpu,
+                  jobs.gpu, jobs.mem, jobs.submit_ts, jobs.start_ts, jobs.pending_time, jobs.job_remaining_time,
+                  jobs.used_time, jobs.compute_nodes, jobs.array_counts, jobs.array_indices):
+        _update(h, value)
+    return h.hexdigest()
+
+
+def value_digest(value):
+    """the content hash of the json value, like the summary dict"""
+    return hashlib.sha1(json.dumps(value, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+
+class SectionState:
+    """
+    the section hashes and positions of the previous result, and the ones for the new result
+    """
+
+    def __init__(self, json_result):
+        self.json_result = json_result
+        self.file_name = state_file_name(json_result)
+        self.previous = self._read_previous()
+        self.digests = {}
+
+    def _read_previous(self):
+        """the sections of the previous result, empty if the result is not the one we wrote"""
+        try:
+            with open(self.file_name) as f:
+                state = json.load(f)
+            stat = os.stat(self.json_result)
+        except (OSError, ValueError):
+            return {}
+        if state.get("size") != stat.st_size or state.get("mtime_ns") != stat.st_mtime_ns:
+            return {}
+        return state.get("sections", {})
+
+    def set_digest(self, section, digest):
+        self.digests[section] = digest
+
+    def changed(self, section):
+        """whether the section is changed since the previous result"""
+        previous = self.previous.get(section)
+        return previous is None or previous.get("digest") != self.digests.get(section)
+
+    def unchanged(self):
+        """whether all of sections are same with the previous result"""
+        return set(self.previous) == set(self.digests) and not any(self.changed(x) for x in self.digests)
+
+    def previous_fragment(self, section):
+        """
+        the encoded section from the previous result as RawJson, None if the section is changed
+        or it's not in the result file
+        """
+        previous = self.previous.get(section)
+        if self.changed(section) or "start" not in previous:
+            return None
+        start, end = previous["start"], previous["end"]
+        try:
+            with open(self.json_result, "rb") as f:
+                f.seek(start)
+                data = f.read(end - start)
+        except OSError:
+            return None
+        if len(data) != end - start:
+            return None
+        return RawJson(data.decode("utf-8"))
+
+    def save(self, offsets):
+        """
+        write the state for the result just written, offsets is the positions of the sections
+        in the result (see write_json_stream)
+        """
+        stat = os.stat(self.json_result)
+        sections = {}
+        for section, digest in self.digests.items():
+            sections[section] = {"digest": digest}
+            if section in offsets:
+                sections[section]["start"], sections[section]["end"] = offsets[section]
+        tmp_name = self.file_name + ".tmp"
+        with open(tmp_name, "w") as f:
+            json.dump({"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sections": sections}, f)
+        os.replace(tmp_name, self.file_name)
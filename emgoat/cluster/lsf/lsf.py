@@ -1,111 +1,176 @@
 
+import os
 import emgoat
-from emgoat.util import Config, get_lsf_job_mem_infor_in_mb
-from emgoat.util import NOT_AVAILABLE, JOB_STATUS_PD
+from emgoat.util import Config, get_lsf_job_mem_infor_in_mb, TIMINGS, TIMING_REFRESH
 from emgoat.cluster.lsf.lsf_jobs import *
 from emgoat.cluster.lsf.lsf_hosts import *
 from ..base import Cluster as BaseCluster
-from datetime import datetime
+from ..tables import NodeTable, JobTable
+from ..slots import load_slot_shapes
+from ..capacity import load_snapshot_windows
 
 class Cluster(BaseCluster):
     """ Cluster implementation for LSF system. """
     _name = "lsf"
     _config = Config(emgoat.config['lsf'])
-    #_job_snapshots_config = Config(emgoat.config['snapshots'])
+    _slot_shapes = load_slot_shapes(emgoat.config)
+    _snapshot_windows = load_snapshot_windows(emgoat.config)
+
+    #
+    # the data for each queue is loaded in parts, each part is loaded on the first access and kept
+    # until it's refreshed. The value is the parts that depend on it, they are dropped together
+    # when the part is refreshed
+    #
+    _QUEUE_PARTS = {
+        "job_table": ("jobs", "node_table", "accounts", "summary"),
+        "node_table": ("nodes", "summary"),
+        "jobs": (),
+        "nodes": (),
+        "accounts": (),
+        "summary": (),
+    }
 
     def get_lsf_nodes_info(self, queue):
-        if queue in self.queues:
-            pos = self.queues.index(queue)
-        else:
-            pos= -1
-
-        # return
-        if pos < 0:
-            raise RuntimeError('failed to get the queue name'.format(queue))
-        return self.nodes_list[pos]
+        return self._get_queue_part(queue, "nodes")
 
     def get_lsf_jobs_info(self, queue):
-        if queue in self.queues:
-            pos = self.queues.index(queue)
-        else:
-            pos = -1
-
-        # return
-        if pos < 0:
-            raise RuntimeError('failed to get the queue name'.format(queue))
-        return self.jobs_list[pos]
+        return self._get_queue_part(queue, "jobs")
 
     def get_lsf_accounts_info(self, queue):
-        if queue in self.queues:
-            pos = self.queues.index(queue)
-        else:
-            pos = -1
-
-        # return
-        if pos < 0:
-            raise RuntimeError('failed to get the queue name'.format(queue))
-        return self.accounts_list[pos]
+        return self._get_queue_part(queue, "accounts")
 
     def get_lsf_cluster_summary_info(self, queue):
-        if queue in self.queues:
-            pos = self.queues.index(queue)
-        else:
-            pos = -1
+        return self._get_queue_part(queue, "summary")
 
-        # return
-        if pos < 0:
-            raise RuntimeError('failed to get the queue name'.format(queue))
-        return self.summary[pos]
+    def get_lsf_node_table(self, queue):
+        return self._get_queue_part(queue, "node_table")
+
+    def get_lsf_job_table(self, queue):
+        return self._get_queue_part(queue, "job_table")
 
     def get_nodes_info(self):
-        return self.nodes_list[0]
+        return self.get_lsf_nodes_info(self.queues[0])
 
     def get_jobs_info(self):
-        return self.jobs_list[0]
+        return self.get_lsf_jobs_info(self.queues[0])
 
     def get_accounts_info(self):
-        return self.accounts_list[0]
+        return self.get_lsf_accounts_info(self.queues[0])
 
     def get_cluster_summary_info(self):
-        return self.summary[0]
+        return self.get_lsf_cluster_summary_info(self.queues[0])
+
+    #
+    # the lists below are for all of queues, accessing them loads every queue
+    #
+    @property
+    def node_tables(self):
+        return [self.get_lsf_node_table(q) for q in self.queues]
+
+    @property
+    def job_tables(self):
+        return [self.get_lsf_job_table(q) for q in self.queues]
+
+    @property
+    def nodes_list(self):
+        return [self.get_lsf_nodes_info(q) for q in self.queues]
+
+    @property
+    def jobs_list(self):
+        return [self.get_lsf_jobs_info(q) for q in self.queues]
+
+    @property
+    def accounts_list(self):
+        return [self.get_lsf_accounts_info(q) for q in self.queues]
+
+    @property
+    def summary(self):
+        return [self.get_lsf_cluster_summary_info(q) for q in self.queues]
 
     def __init__(self):
         """
         initialization of lsf cluster
+
+        nothing is collected here, the nodes/jobs etc. data for each queue are loaded
+        when they are accessed for the first time
         """
 
         # cluster type
         super().__init__()
 
-        # loop over the queues
+        # the queues, and the loaded parts for each queue
         self.queues = ["cryoem", "cryoem_cpu"]
-        self.nodes_list = []
-        self.jobs_list = []
-        self.accounts_list = []
-        self.summary = []
-        for queue in self.queues:
+        self._queue_pos = {q: i for i, q in enumerate(self.queues)}
+        self._queue_parts = [{} for _ in self.queues]
 
-            # get the nodes information
-            node_list = get_nodes_info(queue)
-            new_nodes_list = self._transform_node_list_infor(node_list)
+    def refresh(self, queue=None, parts=None):
+        """
+        drop the loaded data so that it's loaded again on the next access
 
-            # get the jobs information
-            jobs_list = set_job_info(queue)
-            new_jobs_list = self._transform_jobs_list_infor(jobs_list)
-            self.jobs_list.append(new_jobs_list)
+        :param queue: the queue to refresh, None for all of queues
+        :param parts: list of parts to refresh ("jobs", "nodes", "accounts", "summary"), None for all;
+                      the parts depending on the refreshed ones are dropped too, for example refreshing
+                      the jobs also refreshes the node usage, the accounts and the summary
 
-            # update nodes data with job data
-            self._update_node_with_job_info(new_nodes_list,new_jobs_list)
-            self._run_lsload_update_memory_usage(new_nodes_list)
-            self.nodes_list.append(new_nodes_list)
+        the data is loaded through the data files (see lsf_hosts.get_nodes_info and
+        lsf_jobs.set_job_info), so the commands only run again when the data file is outdated
+        """
+        queues = self.queues if queue is None else [queue]
+        names = list(self._QUEUE_PARTS) if parts is None else parts
+        for q in queues:
+            loaded = self._queue_parts[self._queue_position(q)]
+            for name in names:
+                # the jobs/nodes are refreshed from the tables
+                name = {"jobs": "job_table", "nodes": "node_table"}.get(name, name)
+                if name not in self._QUEUE_PARTS:
+                    raise RuntimeError("Invalid part name for refreshing the lsf data: {}".format(name))
+                self._drop_queue_part(loaded, name)
+        self.generation += 1
+
+    def _drop_queue_part(self, loaded, name):
+        loaded.pop(name, None)
+        for x in self._QUEUE_PARTS[name]:
+            self._drop_queue_part(loaded, x)
+
+    def _queue_position(self, queue):
+        pos = self._queue_pos.get(queue)
+        if pos is None:
+            raise RuntimeError('failed to get the queue name: {}'.format(queue))
+        return pos
+
+    def _get_queue_part(self, queue, name):
+        """
+        return the given part of data for the queue, it's loaded if it's not there yet
+        """
+        loaded = self._queue_parts[self._queue_position(queue)]
+        if name not in loaded:
+            with TIMINGS.timed(TIMING_REFRESH, [("cluster", self._name), ("queue", queue), ("part", name)]):
+                loaded[name] = getattr(self, "_load_" + name)(queue)
+        return loaded[name]
+
+    def _load_job_table(self, queue):
+        return JobTable.from_records(set_job_info(queue))
+
+    def _load_node_table(self, queue):
+        # update nodes data with job data, and the memory usage from lsload
+        node_table = NodeTable.from_records(get_nodes_info(queue))
+        node_table.add_job_usage(self.get_lsf_job_table(queue))
+        self._run_lsload_update_memory_usage(node_table)
+        return node_table
+
+    def _load_jobs(self, queue):
+        return self.get_lsf_job_table(queue).to_jobs(self.Job)
 
-            # set up the account list
-            self.accounts_list.append(super().form_accounts_infor(new_jobs_list))
+    def _load_nodes(self, queue):
+        return self.get_lsf_node_table(queue).to_nodes(self.Node)
 
-            # finally generate the summary based on the output results
-            self.summary.append(super().Summary(new_nodes_list, new_jobs_list))
+    def _load_accounts(self, queue):
+        return self.form_accounts_infor(self.get_lsf_job_table(queue))
 
-    def _run_lsload_update_memory_usage(self, node_list):
+    def _load_summary(self, queue):
+        return self.Summary(self.get_lsf_node_table(queue), self.get_lsf_job_table(queue), self._slot_shapes)
+
+    def _run_lsload_update_memory_usage(self, node_table):
         """
         run the lsload command to get the memory usage data. This will
         update the memory usage in the result
@@ -128,7 +193,7 @@ class Cluster(BaseCluster):
         """
     
         # get the node name list
-        node_name_list = [x.name for x in node_list]
+        node_name_list = list(node_table.names)
     
         # run the command
         arg = ['lsload'] + node_name_list
@@ -161,144 +226,60 @@ class Cluster(BaseCluster):
             memory_left = int(get_lsf_job_mem_infor_in_mb(data[-1])/1024)
             if memory_left < 0:
                 raise RuntimeError("Something wrong with the mem left with lsload on this line: {}".format(line))
-            for node_infor in node_list:
-                node_name = node_infor.name
-                if node_name.lower() == name.lower():
-                    total_mem = node_infor.total_mem_in_gb
-                    if memory_left <= total_mem:
-                        node_infor.update_memory_in_use(total_mem - memory_left)
-                    else:
-                        print("The total memory is:{0}, and the memory left is:{1}".format(total_mem, memory_left))
-                        node_infor.update_memory_in_use(total_mem)
-                    break
+            pos = node_table.index().get(name.lower())
+            if pos is not None:
+                total_mem = int(node_table.mem[pos])
+                if memory_left <= total_mem:
+                    node_table.mem_used[pos] = total_mem - memory_left
+                else:
+                    print("The total memory is:{0}, and the memory left is:{1}".format(total_mem, memory_left))
+                    node_table.mem_used[pos] = total_mem
     
-    def _update_node_with_job_info(self, nodes_list, jobs_list):
-        """
-        this function will further update the node with the job information
-        """
-        for node in nodes_list:
-
-            # get the node name
-            node_name = node.name
-
-            # get the job landing on the node
-            for job in jobs_list:
+    def query_tables(self):
+        """the queries are on the first queue, same as get_nodes_info and get_jobs_info"""
+        return self.get_lsf_node_table(self.queues[0]), self.get_lsf_job_table(self.queues[0])
 
-                # update the node data
-                nodes = job.compute_nodes
-                if node_name not in nodes:
-                    continue
-
-                # if the job is pending status, skip it
-                if job.general_state == JOB_STATUS_PD:
-                    continue
-
-                # test whether nodes is list >= 1
-                nnodes = len(nodes)
-                if nnodes == 0:
-                    print(job)
-                    raise RuntimeError("the number of nodes for the above job is 0 in update_node_with_job_info")
-
-                # update data
-                # all of data below should be good for direct compute
-                ngpus_per_node = int(job.gpu_used / nnodes)
-                ncpus_per_node = int(job.cpu_used / nnodes)
-                node.update_jobs_infor(gpus_in_use=ngpus_per_node, cores_in_use=ncpus_per_node)
-
-    def _transform_node_list_infor(self, nodes_infor):
-        """
-        This function transform the input node information list into the list of Node
-        """
-
-        # here each node is a dict, see the form_nodes_infor_list_from_node_names
-        # function in lsf_hosts.py for more information
-        # for LSF case, it does not have the usage data; so we will set it 0
-        gpu_used = 0
-        cpu_used = 0
-        mem_used = 0
-        n_jobs = 0
-        with_usage_data = False
-        nodes_list = []
-        for node in nodes_infor:
-            n = self.Node(node['name'], node['gpu_type'], node['status'], node['ngpus'], gpu_used,
-                          node['ncpus'], cpu_used, node['mem_in_gb'], mem_used, n_jobs, with_usage_data)
-            nodes_list.append(n)
-
-        # return
-        return nodes_list
-
-    def _transform_jobs_list_infor(self, jobs_infor):
-        """
-        This function transform the input jobs information list into the list of Job
-        """
-
-        # here each node is a dict, see the form_nodes_infor_list_from_node_names
-        # function in lsf_hosts.py for more information
-        jobs_list = []
-        for job in jobs_infor:
-
-            # firstly generate the datetime
-            submit = datetime.fromisoformat(job['submit_time'])
-            if job['start_time'] == NOT_AVAILABLE:
-                start_time = None
-            else:
-                start_time = datetime.fromisoformat(job['start_time'])
-
-            # transform the compute nodes into a list
-            compute_nodes_list = job['compute_nodes'].split()
-
-            # now create the job
-            j = self.Job(job['jobid'], job['job_name'], submit, job['state'], job['general_state'],
-                         job['pending_time'], job['job_remaining_time'], start_time,
-                         job['used_time'], job['cpu_used'], job['gpu_used'], job['memory_used'],
-                         compute_nodes_list, job['account_name'])
-            jobs_list.append(j)
-
-        # return
-        return jobs_list
+    def metric_groups(self):
+        """the metrics are given for each queue"""
+        return [([("queue", q)], self.get_lsf_cluster_summary_info(q), self.get_lsf_node_table(q),
+                 self.get_lsf_accounts_info(q)) for q in self.queues]
 
     def generate_json_results(self):
         """
-        this function is used to output the results into json format
+        this function is used to output the results into json format, the gpu queue
+        and the cpu queue have their own result file
         """
         # this is the json result file
         config = self._config
+        jobs_ndjson = config.get_bool('json_jobs_ndjson', False)
 
-        # generate the gpu results
-        json_result = config['json_gpu_result_path']
-        queue = "cryoem"
-
-        # set up the result structure
-        node_list = [x.to_dict() for x in self.get_lsf_nodes_info(queue)]
-        jobs_list = [x.to_dict() for x in self.get_lsf_jobs_info(queue)]
-        acc_list  = [x.to_dict() for x in self.get_lsf_accounts_info(queue) if x.has_any_jobs()]
-        summary   = self.get_lsf_cluster_summary_info(queue).to_dict()
-        result = {"summary": summary, "nodes": node_list, "accounts": acc_list, "jobs": jobs_list}
-
-        # write it into json file
-        with open(json_result, 'w') as infor:
-            json.dump(result, infor, indent=4)
-
-        # generate the cpu results
-        json_result = config['json_cpu_result_path']
-        queue = "cryoem_cpu"
-
-        # set up the result structure
-        node_list = [x.to_dict() for x in self.get_lsf_nodes_info(queue)]
-        jobs_list = [x.to_dict() for x in self.get_lsf_jobs_info(queue)]
-        acc_list  = [x.to_dict() for x in self.get_lsf_accounts_info(queue) if x.has_any_jobs()]
-        summary   = self.get_lsf_cluster_summary_info(queue).to_dict()
-        result = {"summary": summary, "nodes": node_list, "accounts": acc_list, "jobs": jobs_list}
-
-        # write it into json file
-        with open(json_result, 'w') as infor:
-            json.dump(result, infor, indent=4)
-
-
+        for queue, key in [("cryoem", 'json_gpu_result_path'), ("cryoem_cpu", 'json_cpu_result_path')]:
+            written = self.write_json_results(config[key], self.get_lsf_nodes_info(queue),
+                                              self.get_lsf_jobs_info(queue), self.get_lsf_accounts_info(queue),
+                                              self.get_lsf_cluster_summary_info(queue), jobs_ndjson=jobs_ndjson,
+                                              tables=(self.get_lsf_node_table(queue), self.get_lsf_job_table(queue)))
 
+            # the snapshot goes into the history even if nothing is changed
+            self.record_history(queue, self.get_lsf_cluster_summary_info(queue), self.get_lsf_node_table(queue),
+                                self.get_lsf_job_table(queue), self.get_lsf_accounts_info(queue))
 
+            # nothing is changed for the queue, the files next to the result are still good
+            if not written:
+                continue
 
+            # the columnar exports next to the json result, if they are set in the config
+            self.export_results(os.path.splitext(config[key])[0], self.get_lsf_node_table(queue),
+                                self.get_lsf_job_table(queue), self.get_lsf_accounts_info(queue))
 
+            # the views next to the json result
+            self.write_view_files(config[key], self.get_lsf_node_table(queue), self.get_lsf_job_table(queue),
+                                  self.get_lsf_accounts_info(queue))
 
+            # the job shards for each account and node
+            self.write_job_shards(config[key], self.get_lsf_jobs_info(queue))
 
+            # the availability index for the quick check
+            self.write_availability_file(config[key], self.get_lsf_node_table(queue), self.get_lsf_job_table(queue))
 
+        # the metrics for all of queues
+        self.write_metrics_file()
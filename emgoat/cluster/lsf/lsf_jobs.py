@@ -3,7 +3,9 @@ This file is to parse the bjobs output from lsf, this is the currently running/p
 """
 import json
 from emgoat.config import get_config
-from emgoat.util import NOT_AVAILABLE
+from emgoat.util import memory_in_gb
+from emgoat.util import TimeParser, encode_records, decode_records, JOB_RECORD_STRING_FIELDS
+from emgoat.util import Config, split_array_element, group_array_jobs
 from emgoat.util import run_command, get_job_general_status, generate_json_data_file, read_json_data_file, need_newer_data_file
 from .functions import *
 
@@ -24,17 +26,26 @@ def run_bjobs_get_alljobs(queue_name: str):
     args = args + other_args
     return run_command(args)
 
-def parse_bjobs_output_for_alljobs(output):
+def parse_bjobs_output_for_alljobs(output, time_parser=None):
     """
     parsing the output of bjobs
     :param output: the output data in json format in string
+    :param time_parser: the TimeParser for this refresh, a new one is created if it's None
     :return: a list of dict that contains the job name and user names etc. information
+
+    the submit/start time in the result are in epoch seconds, the start time is None
+    if the job is not started; reference_time is the epoch seconds of the parsing, the
+    remaining time is counted from it
     """
     global LSF_COFNIG
 
     # load in the raw output to json format output for further parsing
     data = json.loads(output)
 
+    # all of records are parsed against the same reference time
+    if time_parser is None:
+        time_parser = TimeParser()
+
     # this is the job information
     # each result is a Jobs object
     job_list = []
@@ -46,8 +57,8 @@ def parse_bjobs_output_for_alljobs(output):
         status = record['STAT']
         account_name = record['USER']
         job_name = record['JOB_NAME']
-        submit_time = get_time_data_from_lsf_output(record['SUBMIT_TIME'])
-        start_time = get_time_data_from_lsf_output(record['START_TIME'])
+        submit_time = time_parser.lsf_epoch(record['SUBMIT_TIME'])
+        start_time = time_parser.lsf_epoch(record['START_TIME'])
         pending_time = int(convert_str_to_integer(record['PEND_TIME']) / 60)
         ori_time_left = record['TIME_LEFT']
         ori_running_time = record['RUN_TIME']
@@ -69,39 +80,38 @@ def parse_bjobs_output_for_alljobs(output):
         else:
             remaining_time = convert_lsf_time_to_minutes(ori_time_left)
 
-        # memory
-        # we only handle the GB/TB cases, other cases we will issue an error
-        if ori_mem_request.lower().find("g") > 0:
-            mem = convert_str_to_integer(ori_mem_request.split()[0])
-        elif ori_mem_request.lower().find("t") > 0:
-            mem = convert_str_to_integer(ori_mem_request.split()[0]) * 1024
-        else:
+        # memory in GB, the memory limit should be always given
+        mem = memory_in_gb(ori_mem_request)
+        if mem < 0:
             raise RuntimeError("Invalid memory requested passed in: {}".format(ori_mem_request))
 
-        # the start time could be None
-        start_time_str = NOT_AVAILABLE
-        if start_time is not None:
-            start_time_str = start_time.isoformat()
-
         # now we have everything, building the dict
-        # further change the datetime into string
         job_infor = {
             'jobid': jobid,
             'job_name': job_name,
-            'submit_time': submit_time.isoformat(),
+            'submit_time': submit_time,
             'state': status,
             'general_state': get_job_general_status(status),
             'pending_time': pending_time,
             'job_remaining_time': remaining_time,
-            'start_time': start_time_str,
+            'start_time': start_time,
             'used_time': running_time,
             'cpu_used': ncpus_request,
             'gpu_used': gpu_used,
             'memory_used': mem,
-            'compute_nodes': get_hostnames_from_bjobs_output(ori_host_name),
-            'account_name': account_name
+            'compute_nodes': get_hostnames_from_bjobs_output(ori_host_name).split(),
+            'account_name': account_name,
+            'reference_time': time_parser.now_ts
         }
 
+        # the array element has the index in the job id or in the job name, like 1234[5] or
+        # name[5]; in the later case the job id is the id of the array
+        element = split_array_element(jobid)
+        if element is None and split_array_element(job_name) is not None:
+            element = (jobid, split_array_element(job_name)[1])
+        if element is not None:
+            job_infor['array_id'], job_infor['array_index'] = element
+
         # add in result
         job_list.append(job_infor)
 
@@ -124,13 +134,15 @@ def set_job_info(queue_name):
     # whether we have the file
     if not need_newer_data_file(fname, time):
         data = read_json_data_file(fname)
-        return data
+        return decode_records(data)
 
     # now let's generate the file
     output = run_bjobs_get_alljobs(queue_name)
     jobs_list = parse_bjobs_output_for_alljobs(output)
+    if Config(LSF_COFNIG['lsf']).get_bool('group_job_arrays', False):
+        jobs_list = group_array_jobs(jobs_list)
 
-    # save the data
-    generate_json_data_file(jobs_list, fname)
+    # save the data, the repeated strings are written with the string tables
+    generate_json_data_file(encode_records(jobs_list, JOB_RECORD_STRING_FIELDS), fname)
     return jobs_list
 
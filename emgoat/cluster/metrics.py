@@ -0,0 +1,195 @@
+"""
+OpenMetrics (Prometheus) text exporter for the cluster
+
+the metrics are built straight from the in-memory tables and summaries of the Cluster object (no
+json result is read back), they are:
+
+- the summary fields (jobs, gpus, cpus, memory) and the gpus overview / request shape slots,
+  for each queue (lsf) or for the whole cluster and each partition (slurm)
+- the running/pending jobs and the used gpus/cpus for each account with jobs
+- the free gpus/cpus/memory and the number of jobs for each node, and the status of each node as
+  its own info-style family (emgoat_node_status with the status label and value 1), so a drained
+  node does not start new series of the resource gauges
+- the durations of emgoat itself: the data refreshes and the scheduler commands (see
+  emgoat/util/timing.py)
+
+all of them are labelled gauges except the durations, which are summaries with _count and _sum.
+The text could be written into a file for the textfile collector of node_exporter:
+
+metrics_file = /var/lib/node_exporter/textfile/emgoat_slurm.prom
+
+in the lsf/slurm section of the config; or it's served by the HTTP server on /metrics (see
+server.py)
+"""
+from emgoat.util import TIMINGS, TIMING_COMMAND, TIMING_REFRESH, write_text_chunks
+from .tables import NodeTable
+
+#
+# the content type of the text for the HTTP response
+#
+METRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+#
+# the metric name prefix
+#
+METRICS_PREFIX = "emgoat_"
+
+#
+# the summary fields, the name and the label for each field
+#
+_SUMMARY_METRICS = [
+    ("jobs", "Number of jobs", [("n_running_jobs", "running"), ("n_pending_jobs", "pending")], "state"),
+    ("gpus", "Number of gpus on the nodes which are not off",
+     [("n_total_gpus", "total"), ("n_used_gpus", "used")], "kind"),
+    ("cpus", "Number of cpu cores on the nodes which are not off",
+     [("n_total_cores", "total"), ("n_used_cores", "used")], "kind"),
+    ("memory_gb", "Memory in GB on the nodes which are not off",
+     [("n_total_mem_in_gb", "total"), ("n_used_mem_in_gb", "used")], "kind"),
+]
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join('{0}="{1}"'.format(k, _escape(v)) for k, v in labels) + "}"
+
+
+def _value(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(int(value))
+
+
+def _family(name, kind, text, samples):
+    """
+    yield the lines of one metric family, samples is the iterable of (suffix, labels, value)
+    """
+    name = METRICS_PREFIX + name
+    yield "# HELP {0} {1}\n".format(name, text)
+    yield "# TYPE {0} {1}\n".format(name, kind)
+    for suffix, labels, value in samples:
+        yield "{0}{1}{2} {3}\n".format(name, suffix, _labels(labels), _value(value))
+
+
+def _summary_samples(groups, fields, label):
+    for labels, summary, nodes, accounts in groups:
+        for field, value in fields:
+            yield "", labels + [(label, value)], getattr(summary, field)
+
+
+def _gpu_slot_samples(groups):
+    for labels, summary, nodes, accounts in groups:
+        for ngpus, slots in summary.gpus_overview.items():
+            yield "", labels + [("gpus", ngpus)], slots
+
+
+def _shape_slot_samples(groups):
+    for labels, summary, nodes, accounts in groups:
+        if summary.slots is None:
+            continue
+        for shape, total in zip(summary.slots.shapes, summary.slots.totals):
+            shape_labels = [("ngpus", shape.ngpus), ("ncpus", shape.ncpus), ("mem_gb", shape.mem_gb),
+                            ("gpu_type", shape.gpu_type if shape.gpu_type else "any")]
+            yield "", labels + shape_labels, total
+
+
+def _account_samples(groups, getter):
+    for labels, summary, nodes, accounts in groups:
+        for account in accounts or ():
+            if account.has_any_jobs():
+                for suffix, extra, value in getter(account):
+                    yield suffix, labels + [("account", account.account_name)] + extra, value
+
+
+def _node_samples(groups, column):
+    for labels, summary, nodes, accounts in groups:
+        if nodes is None:
+            continue
+        values = column(nodes).tolist()
+        for name, gpu_type, value in zip(nodes.names, nodes.gpu_types, values):
+            yield "", labels + [("node", name), ("gpu_type", gpu_type)], value
+
+
+def _node_status_samples(groups):
+    for labels, summary, nodes, accounts in groups:
+        if nodes is None:
+            continue
+        for name, status in zip(nodes.names, nodes.statuses):
+            yield "", labels + [("node", name), ("status", status)], 1
+
+
+def _timing_families(name, text, kind, timings):
+    items = timings.items(kind)
+    yield from _family(name + "_duration_seconds", "summary", text,
+                       [x for labels, count, total, last in items
+                        for x in (("_count", list(labels), count), ("_sum", list(labels), total))])
+    yield from _family(name + "_last_duration_seconds", "gauge", text + ", the last one",
+                       [("", list(labels), last) for labels, count, total, last in items])
+
+
+def iter_metrics(cluster_name, groups, generation=0, timings=TIMINGS):
+    """
+    yield the OpenMetrics text in chunks
+
+    :param cluster_name: the cluster name for the cluster label, like lsf or slurm
+    :param groups: the list of (labels, summary, nodes, accounts); labels is the list of (name, value)
+                   for the group (like the queue), the nodes (NodeTable or list of Node) and the
+                   accounts (list of Account) could be None, then only the summary is given
+    :param generation: the snapshot generation of the cluster
+    :param timings: the Timings for the command/refresh durations
+    """
+    base = [("cluster", cluster_name)]
+    groups = [(base + list(labels), summary, None if nodes is None else NodeTable.coerce(nodes), accounts)
+              for labels, summary, nodes, accounts in groups]
+
+    yield from _family("snapshot_generation", "gauge", "The generation of the cluster data",
+                       [("", base, generation)])
+
+    # the summary
+    for name, text, fields, label in _SUMMARY_METRICS:
+        yield from _family(name, "gauge", text, _summary_samples(groups, fields, label))
+    yield from _family("gpu_slots", "gauge", "Number of available slots for the given number of gpus",
+                       _gpu_slot_samples(groups))
+    yield from _family("shape_slots", "gauge", "Number of available slots for the request shape",
+                       _shape_slot_samples(groups))
+
+    # the accounts
+    yield from _family("account_jobs", "gauge", "Number of jobs of the account", _account_samples(
+        groups, lambda x: [("", [("state", "running")], x.n_running_jobs),
+                           ("", [("state", "pending")], x.n_pending_jobs)]))
+    yield from _family("account_gpus_used", "gauge", "Number of gpus used by the account",
+                       _account_samples(groups, lambda x: [("", [], x.ngpus)]))
+    yield from _family("account_cpus_used", "gauge", "Number of cpu cores used by the account",
+                       _account_samples(groups, lambda x: [("", [], x.ncpus)]))
+
+    # the nodes
+    yield from _family("node_free_gpus", "gauge", "Number of free gpus on the node",
+                       _node_samples(groups, lambda x: x.free_gpus()))
+    yield from _family("node_free_cpus", "gauge", "Number of free cpu cores on the node",
+                       _node_samples(groups, lambda x: x.free_cpus()))
+    yield from _family("node_free_memory_gb", "gauge", "Free memory in GB on the node",
+                       _node_samples(groups, lambda x: x.free_mem()))
+    yield from _family("node_jobs", "gauge", "Number of jobs on the node",
+                       _node_samples(groups, lambda x: x.njobs))
+    yield from _family("node_status", "gauge", "The status of the node, the value is always 1",
+                       _node_status_samples(groups))
+
+    # emgoat itself
+    yield from _timing_families("refresh", "Time in seconds for loading the cluster data", TIMING_REFRESH, timings)
+    yield from _timing_families("command", "Time in seconds for running the scheduler command", TIMING_COMMAND,
+                                timings)
+    yield "# EOF\n"
+
+
+def cluster_metrics(cluster, timings=TIMINGS):
+    """yield the OpenMetrics text of the Cluster object in chunks, see iter_metrics"""
+    return iter_metrics(cluster._name, cluster.metric_groups(), cluster.generation, timings)
+
+
+def write_metrics(file_name, cluster, timings=TIMINGS):
+    """write the OpenMetrics text of the Cluster object into the file"""
+    write_text_chunks(file_name, cluster_metrics(cluster, timings))
@@ -0,0 +1,203 @@
+"""
+Indexed queries on the nodes and jobs of the cluster
+
+the indexes are built once for the node/job tables of a snapshot (the Cluster rebuilds them after
+each refresh, see Cluster.query_jobs and Cluster.query_nodes):
+
+- hash indexes from the lower case account, state, general state, node name, gpu type, status and
+  node group (good/drained/off) to the sorted row positions; the gpu type of a job is the gpu type
+  of its compute nodes
+- sorted indexes for the gpus request and the submit time of the jobs, and the free gpus and the
+  free memory of the nodes; the "at least" queries are a binary search on them, or a check of the
+  rows left by the hash indexes
+
+a query intersects the row positions of its filters, so it does not scan the tables; a filter value
+could also be a list of values, any of them matches (the union of their rows). The result
+is a QueryResult which only keeps the row positions, the Job/Node objects are taken when they are
+accessed
+"""
+from collections.abc import Sequence
+import numpy as np
+from emgoat.util import STATES, HOSTS, GPU_TYPES, ACCOUNTS, NodeGroup
+from .tables import _time_to_epoch
+
+_EMPTY_ROWS = np.zeros(0, dtype=np.int64)
+
+
+def _group_rows(codes):
+    """return the dict of code to the sorted row positions with that code"""
+    codes = np.asarray(codes)
+    if len(codes) == 0:
+        return {}
+    order = np.argsort(codes, kind="stable")
+    sorted_codes = codes[order]
+    bounds = np.flatnonzero(np.diff(sorted_codes)) + 1
+    starts = np.concatenate(([0], bounds))
+    return {int(c): rows for c, rows in zip(sorted_codes[starts].tolist(), np.split(order, bounds))}
+
+
+def _name_index(codes, table):
+    """
+    return the dict of lower case name to the sorted row positions, the codes are in the
+    given StringTable
+    """
+    index = {}
+    for code, rows in _group_rows(codes).items():
+        key = table.decode(code).lower()
+        index[key] = np.union1d(index[key], rows) if key in index else rows
+    return index
+
+
+class SortedIndex:
+    """
+    the row positions sorted by the values, for the queries of values at least some number
+
+    if the rows are already narrowed down by the other filters, the values of these rows are
+    checked directly which is cheaper than taking the range from the sorted rows
+    """
+
+    def __init__(self, values):
+        self.column = np.asarray(values)
+        self.order = np.argsort(self.column, kind="stable")
+        self.values = self.column[self.order]
+
+    def at_least(self, value, rows=None):
+        """the sorted row positions (within rows if given) with the value >= the given value"""
+        if rows is not None:
+            return rows[self.column[rows] >= value]
+        return np.sort(self.order[np.searchsorted(self.values, value, side="left"):])
+
+    def greater_than(self, value, rows=None):
+        """the sorted row positions (within rows if given) with the value > the given value"""
+        if rows is not None:
+            return rows[self.column[rows] > value]
+        return np.sort(self.order[np.searchsorted(self.values, value, side="right"):])
+
+
+class QueryResult(Sequence):
+    """
+    the result of a query, it keeps the row positions and takes the objects from the list only
+    when they are accessed; objects is the function returning the list of objects of the table
+    """
+
+    def __init__(self, rows, objects):
+        self.rows = rows
+        self._objects = objects
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, pos):
+        if isinstance(pos, slice):
+            return QueryResult(self.rows[pos], self._objects)
+        return self._objects()[int(self.rows[pos])]
+
+    def __iter__(self):
+        objects = self._objects()
+        for i in self.rows.tolist():
+            yield objects[i]
+
+    def __repr__(self):
+        return "QueryResult({} rows)".format(len(self.rows))
+
+
+def _intersect(rows, other):
+    """intersect the sorted row positions, None means all of rows"""
+    if rows is None:
+        return other
+    return np.intersect1d(rows, other, assume_unique=True)
+
+
+def _lookup(index, value):
+    """the sorted row positions for the value, or for any of the values in the list"""
+    if isinstance(value, (list, tuple, set)):
+        rows = _EMPTY_ROWS
+        for x in value:
+            rows = np.union1d(rows, index.get(str(x).lower(), _EMPTY_ROWS))
+        return rows
+    return index.get(str(value).lower(), _EMPTY_ROWS)
+
+
+class JobIndex:
+    """
+    the indexes of the JobTable, the gpu types of the jobs are taken from the NodeTable (if given)
+    """
+
+    def __init__(self, jobs, node_table=None):
+        self.size = len(jobs)
+        self.accounts = _name_index(jobs.account_codes, ACCOUNTS)
+        # the state matches either the state or the general state, the general state like
+        # pending/suspending could also be given as pending or suspending
+        self.states = _name_index(jobs.state_codes, STATES)
+        for code, rows in _group_rows(jobs.general_state).items():
+            for key in {STATES.decode(code).lower()} | set(STATES.decode(code).lower().split("/")):
+                self.states[key] = np.union1d(self.states[key], rows) if key in self.states else rows
+        node_rows = {}
+        for pos, nodes in enumerate(jobs.node_codes):
+            for code in nodes:
+                node_rows.setdefault(code, []).append(pos)
+        self.nodes = {}
+        for code, rows in node_rows.items():
+            key = HOSTS.decode(code).lower()
+            rows = np.unique(np.asarray(rows, dtype=np.int64))
+            self.nodes[key] = np.union1d(self.nodes[key], rows) if key in self.nodes else rows
+        self.gpu_types = {}
+        if node_table is not None:
+            node_types = {}
+            for name, gpu_type in zip(node_table.names, node_table.gpu_types):
+                node_types.setdefault(name.lower(), set()).add(gpu_type.lower())
+            for key, rows in self.nodes.items():
+                for gpu_type in node_types.get(key, ()):
+                    index = self.gpu_types
+                    index[gpu_type] = np.union1d(index[gpu_type], rows) if gpu_type in index else rows
+        self.gpus = SortedIndex(jobs.gpu)
+        self.submit_ts = SortedIndex(jobs.submit_ts)
+
+    def query(self, account=None, state=None, node=None, min_gpus=None, submitted_after=None, gpu_type=None):
+        """return the sorted row positions of the jobs matching all of the given filters"""
+        rows = None
+        if account is not None:
+            rows = _intersect(rows, _lookup(self.accounts, account))
+        if state is not None:
+            rows = _intersect(rows, _lookup(self.states, state))
+        if node is not None:
+            rows = _intersect(rows, _lookup(self.nodes, node))
+        if min_gpus is not None:
+            rows = self.gpus.at_least(min_gpus, rows)
+        if submitted_after is not None:
+            rows = self.submit_ts.greater_than(_time_to_epoch(submitted_after), rows)
+        if gpu_type is not None:
+            rows = _intersect(rows, _lookup(self.gpu_types, gpu_type))
+        return np.arange(self.size) if rows is None else rows
+
+
+class NodeIndex:
+    """
+    the indexes of the NodeTable
+    """
+
+    def __init__(self, nodes):
+        self.size = len(nodes)
+        self.names = _name_index(nodes.name_codes, HOSTS)
+        self.gpu_types = _name_index(nodes.gpu_type_codes, GPU_TYPES)
+        # the status matches either the status or the node group (good, drained or off)
+        self.statuses = _name_index(nodes.status_codes, STATES)
+        for value, rows in _group_rows(nodes.node_groups()).items():
+            self.statuses.setdefault(NodeGroup(value).name.lower(), rows)
+        self.free_gpus = SortedIndex(nodes.free_gpus())
+        self.free_mem = SortedIndex(nodes.free_mem())
+
+    def query(self, gpu_type=None, status=None, min_free_gpus=None, min_free_mem=None, name=None):
+        """return the sorted row positions of the nodes matching all of the given filters"""
+        rows = None
+        if name is not None:
+            rows = _intersect(rows, _lookup(self.names, name))
+        if gpu_type is not None:
+            rows = _intersect(rows, _lookup(self.gpu_types, gpu_type))
+        if status is not None:
+            rows = _intersect(rows, _lookup(self.statuses, status))
+        if min_free_gpus is not None:
+            rows = self.free_gpus.at_least(min_free_gpus, rows)
+        if min_free_mem is not None:
+            rows = self.free_mem.at_least(min_free_mem, rows)
+        return np.arange(self.size) if rows is None else rows
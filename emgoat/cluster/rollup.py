@@ -0,0 +1,189 @@
+"""
+Retention and downsampling of the snapshot history (see history.py)
+
+keeping every snapshot of every job forever does not scale, so the history has three tiers:
+
+raw     - the snapshots as they are written, kept for history_raw_days
+hourly  - the hourly aggregates, kept for history_hourly_days
+daily   - the daily aggregates beyond that, kept forever
+
+the aggregates are for the summary fields, the accounts, the nodes and the gpu types (the sum of
+the nodes of each gpu type in a snapshot). For each (bucket, cluster, scope, key) we keep the sum
+and the max of each field, and the number of snapshots of the bucket is in <tier>_samples; so the
+mean is sum / samples, where the snapshots without the key (like the account has no jobs) count
+as 0. The jobs are only kept in the raw tier.
+
+the rollup is incremental: compact() moves the raw snapshots older than the raw cutoff into the
+hourly tier and deletes them, then moves the hourly buckets older than the hourly cutoff into the
+daily tier. The sums are added to the existing buckets, so a bucket could be filled by several
+compactions. rollup_state keeps the cutoffs, the queries use them to take each part of the time
+range from the right tier (see HistoryStore)
+"""
+import time
+
+#
+# the tiers with their bucket size in seconds, from the finest
+#
+ROLLUP_TIERS = {"hourly": 3600, "daily": 86400}
+HISTORY_TIERS = ("raw",) + tuple(ROLLUP_TIERS)
+
+#
+# how the values are taken from the buckets
+#
+ROLLUP_AGGREGATES = ("mean", "max")
+
+#
+# for each rollup: the key columns, the fields and the query of the raw rows, which has the
+# columns time, cluster, scope, the keys and the fields. The raw rows are taken with the time of
+# the row before the cutoff (:cutoff), so only the old rows are read through the time index of
+# each table and the gpu types only group the old nodes
+#
+_ROLLUPS = {
+    "summary": (("field",), ("value",),
+                "SELECT s.time, s.cluster, s.scope, v.field, v.value FROM summary v "
+                "JOIN snapshots s ON s.id = v.snapshot_id WHERE v.time < :cutoff"),
+    "accounts": (("account",), ("n_running_jobs", "n_pending_jobs", "ngpus", "ncpus"),
+                 "SELECT s.time, s.cluster, s.scope, a.account, a.n_running_jobs, a.n_pending_jobs, a.ngpus, "
+                 "a.ncpus FROM accounts a JOIN snapshots s ON s.id = a.snapshot_id WHERE a.time < :cutoff"),
+    "nodes": (("node",), ("ngpus", "gpus_used", "ncpus", "cpus_used", "mem", "mem_used", "njobs"),
+              "SELECT s.time, s.cluster, s.scope, n.node, n.ngpus, n.gpus_used, n.ncpus, n.cpus_used, n.mem, "
+              "n.mem_used, n.njobs FROM nodes n JOIN snapshots s ON s.id = n.snapshot_id WHERE n.time < :cutoff"),
+    "gpu_types": (("gpu_type",), ("ngpus", "gpus_used", "nnodes"),
+                  "SELECT s.time, s.cluster, s.scope, g.gpu_type, g.ngpus, g.gpus_used, g.nnodes FROM "
+                  "(SELECT snapshot_id, gpu_type, SUM(ngpus) AS ngpus, SUM(gpus_used) AS gpus_used, "
+                  "COUNT(*) AS nnodes FROM nodes WHERE time < :cutoff GROUP BY snapshot_id, gpu_type) g "
+                  "JOIN snapshots s ON s.id = g.snapshot_id"),
+}
+
+
+def rollup_fields(name):
+    """the fields of the rollup, like the fields of the accounts"""
+    return _ROLLUPS[name][1]
+
+
+def create_rollup_tables(conn):
+    """create the tables of the rollup tiers, if they are not there"""
+    statements = ["CREATE TABLE IF NOT EXISTS rollup_state (tier TEXT PRIMARY KEY, until INTEGER NOT NULL)"]
+    for tier in ROLLUP_TIERS:
+        statements.append("CREATE TABLE IF NOT EXISTS {0}_samples (bucket INTEGER NOT NULL, cluster TEXT NOT NULL, "
+                          "scope TEXT NOT NULL, samples INTEGER NOT NULL, PRIMARY KEY (bucket, cluster, scope))"
+                          .format(tier))
+        for name, (keys, fields, _) in _ROLLUPS.items():
+            columns = ["bucket INTEGER NOT NULL", "cluster TEXT NOT NULL", "scope TEXT NOT NULL"]
+            columns += ["{} TEXT NOT NULL".format(k) for k in keys]
+            columns += ["sum_{0} REAL, max_{0} REAL".format(f) for f in fields]
+            statements.append("CREATE TABLE IF NOT EXISTS {0}_{1} ({2}, PRIMARY KEY ({3}))".format(
+                tier, name, ", ".join(columns), ", ".join(("bucket", "cluster", "scope") + keys)))
+            statements.append("CREATE INDEX IF NOT EXISTS {0}_{1}_key ON {0}_{1} ({2}, bucket)".format(
+                tier, name, keys[0]))
+    conn.executescript(";\n".join(statements) + ";")
+
+
+def rollup_state(conn):
+    """the (raw_until, hourly_until): the raw data is from raw_until, the hourly from hourly_until"""
+    state = dict(conn.execute("SELECT tier, until FROM rollup_state").fetchall())
+    return state.get("raw", 0), state.get("hourly", 0)
+
+
+def _roll(conn, name, source, from_raw, seconds, tier, cutoff):
+    """add the rows of the source older than cutoff (the :cutoff parameter) into the buckets of the tier"""
+    keys, fields, _ = _ROLLUPS[name]
+    group = ("cluster", "scope") + keys
+    if from_raw:
+        values = ["SUM({0}), MAX({0})".format(f) for f in fields]
+    else:
+        values = ["SUM(sum_{0}), MAX(max_{0})".format(f) for f in fields]
+    updates = ["sum_{0} = sum_{0} + excluded.sum_{0}, max_{0} = MAX(max_{0}, excluded.max_{0})".format(f)
+               for f in fields]
+    sql = ("INSERT INTO {tier}_{name} SELECT (time / {s}) * {s}, {group}, {values} FROM ({source}) "
+           "WHERE time < :cutoff GROUP BY 1, {group} ON CONFLICT ({conflict}) DO UPDATE SET {updates}").format(
+        tier=tier, name=name, s=seconds, group=", ".join(group), values=", ".join(values), source=source,
+        conflict=", ".join(("bucket",) + group), updates=", ".join(updates))
+    conn.execute(sql, {"cutoff": cutoff})
+
+
+def _roll_samples(conn, source, seconds, tier, cutoff):
+    conn.execute("INSERT INTO {tier}_samples SELECT (time / {s}) * {s}, cluster, scope, SUM(samples) FROM ({source}) "
+                 "WHERE time < ? GROUP BY 1, cluster, scope ON CONFLICT (bucket, cluster, scope) "
+                 "DO UPDATE SET samples = samples + excluded.samples".format(tier=tier, s=seconds, source=source),
+                 (cutoff,))
+
+
+def _set_until(conn, tier, until):
+    conn.execute("INSERT INTO rollup_state VALUES (?, ?) ON CONFLICT (tier) DO UPDATE SET "
+                 "until = MAX(until, excluded.until)", (tier, until))
+
+
+def compact(conn, raw_days, hourly_days, now=None):
+    """
+    move the raw snapshots older than raw_days into the hourly tier, and the hourly buckets
+    older than hourly_days into the daily tier (see the file comments); each step is one
+    transaction
+
+    :return: the number of (snapshots, hourly buckets) moved
+    """
+    if hourly_days < raw_days:
+        raise RuntimeError("the hourly history ({} days) should be longer than the raw history ({} days)".format(
+            hourly_days, raw_days))
+    now = int(time.time()) if now is None else int(now)
+    seconds = ROLLUP_TIERS["hourly"]
+
+    # the raw snapshots into the hourly tier
+    raw_cutoff = now - int(raw_days * 86400)
+    with conn:
+        moved = conn.execute("SELECT COUNT(*) FROM snapshots WHERE time < ?", (raw_cutoff,)).fetchone()[0]
+        if moved:
+            _roll_samples(conn, "SELECT time, cluster, scope, 1 AS samples FROM snapshots", seconds, "hourly",
+                          raw_cutoff)
+            for name, (_, _, source) in _ROLLUPS.items():
+                _roll(conn, name, source, True, seconds, "hourly", raw_cutoff)
+            # each row has the time of its snapshot, the rows are deleted through the time index
+            # of each table (there is no index on snapshot_id)
+            for table in ("summary", "nodes", "jobs", "accounts"):
+                conn.execute("DELETE FROM {} WHERE time < ?".format(table), (raw_cutoff,))
+            conn.execute("DELETE FROM snapshots WHERE time < ?", (raw_cutoff,))
+        _set_until(conn, "raw", raw_cutoff)
+
+    # the hourly buckets into the daily tier
+    hourly_cutoff = now - int(hourly_days * 86400)
+    seconds = ROLLUP_TIERS["daily"]
+    with conn:
+        buckets = conn.execute("SELECT COUNT(*) FROM hourly_samples WHERE bucket < ?", (hourly_cutoff,)).fetchone()[0]
+        if buckets:
+            _roll_samples(conn, "SELECT bucket AS time, cluster, scope, samples FROM hourly_samples", seconds,
+                          "daily", hourly_cutoff)
+            for name in _ROLLUPS:
+                _roll(conn, name, "SELECT bucket AS time, * FROM hourly_{}".format(name), False, seconds, "daily",
+                      hourly_cutoff)
+                conn.execute("DELETE FROM hourly_{} WHERE bucket < ?".format(name), (hourly_cutoff,))
+            conn.execute("DELETE FROM hourly_samples WHERE bucket < ?", (hourly_cutoff,))
+        _set_until(conn, "hourly", hourly_cutoff)
+    return moved, buckets
+
+
+def rollup_series(conn, tier, name, key, field, agg="mean", cluster=None, scope=None, start=None, end=None):
+    """
+    the time series of the field from the buckets of the tier, the time is the start of the bucket
+
+    :param name: summary, accounts, nodes or gpu_types
+    :param key: the value of the key, like the field name of the summary or the account name
+    :param agg: mean or max over the snapshots in each bucket
+    :param start/end: the range of the bucket start time, both ends are inclusive
+    :return: the list of (time, value)
+    """
+    keys, fields, _ = _ROLLUPS[name]
+    if field not in fields:
+        raise RuntimeError("unknown {} field {}, it should be one of {}".format(name, field, fields))
+    if agg not in ROLLUP_AGGREGATES:
+        raise RuntimeError("unknown aggregate {}, it should be one of {}".format(agg, ROLLUP_AGGREGATES))
+    value = "r.sum_{0} / s.samples".format(field) if agg == "mean" else "r.max_{0}".format(field)
+    sql = ("SELECT r.bucket, {value} FROM {tier}_{name} r JOIN {tier}_samples s ON s.bucket = r.bucket AND "
+           "s.cluster = r.cluster AND s.scope = r.scope WHERE r.{key} = ?").format(
+        value=value, tier=tier, name=name, key=keys[0])
+    params = [key]
+    for column, v, op in (("cluster", cluster, "="), ("scope", scope, "="), ("bucket", start, ">="),
+                          ("bucket", end, "<=")):
+        if v is not None:
+            sql += " AND r.{} {} ?".format(column, op)
+            params.append(v)
+    return conn.execute(sql + " ORDER BY r.bucket", params).fetchall()
@@ -0,0 +1,317 @@
+"""
+HTTP query service for the in-memory cluster snapshot
+
+this is an optional embedded server (python http.server, no other dependency) that serves the
+data of a Cluster object:
+
+GET /summary
+GET /nodes?node=gpu01&state=idle&gpu_type=a100&page=1&page_size=100
+GET /jobs?account=labA&state=pending&node=gpu01&gpu_type=a100&page=2
+GET /accounts?account=labA&node=gpu01
+GET /metrics
+
+/metrics is the OpenMetrics text (see metrics.py), the others are json.
+
+the filters are case-insensitive exact matches, a filter given several times matches any of the
+values. The nodes and jobs are taken from the indexed queries of the Cluster (see query_nodes and
+query_jobs), so the state of the nodes matches the status or the node group (good/drained/off);
+for the jobs the state matches either the scheduler state (like PEND) or the general state
+(pending/suspending, pending or running), node matches any of the compute nodes and gpu_type
+matches the gpu type of any of the compute nodes (so only the running jobs have it). The list
+endpoints return:
+
+{"generation": 3, "total": 120, "page": 1, "page_size": 100, "items": [...]}
+
+every response has a strong ETag made of a token of the server instance, the snapshot generation
+(see Cluster.generation) and the query; the generation starts from 0 in every process, the token
+keeps the ETags of a restarted server different from the old ones. A request with the matching
+If-None-Match gets 304 Not Modified without any body. The encoded responses are cached for the
+current generation (at most MAX_CACHED_RESPONSES of them, the least recently used ones are dropped),
+the query parameters are sorted for the cache and the ETag, so the polling clients cost almost
+nothing between two refreshes.
+
+the server could refresh the cluster data in the background (see refresh_interval). The loading of
+the data, the responses not in the cache and the refresh are serialized by the data lock so that a
+response is always from one snapshot, while the cached responses only take the cache lock and never
+wait for the scheduler commands. A failed refresh is reported and the old snapshot is served until
+the next refresh works; a request failing on loading the data gets 503
+"""
+import json
+import sys
+import threading
+import uuid
+import zlib
+from collections import OrderedDict
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+from .metrics import cluster_metrics, METRICS_CONTENT_TYPE
+
+#
+# the pagination of the list endpoints
+#
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+#
+# the number of the encoded responses kept for the current generation
+#
+MAX_CACHED_RESPONSES = 256
+
+#
+# the filters for each list endpoint; for the nodes and jobs the value is the argument of
+# query_nodes/query_jobs, for the accounts (a short list without index) it's the function to get
+# the values of the account that the filter value is matched against
+#
+_FILTERS = {
+    "nodes": {
+        "node": "name",
+        "state": "status",
+        "gpu_type": "gpu_type",
+    },
+    "jobs": {
+        "account": "account",
+        "state": "state",
+        "node": "node",
+        "gpu_type": "gpu_type",
+    },
+    "accounts": {
+        "account": lambda x: (x.account_name,),
+        "node": lambda x: x.nodes_list,
+    },
+}
+
+_ENCODER = json.JSONEncoder(separators=(",", ":"))
+_JSON_CONTENT_TYPE = "application/json"
+
+
+def _error_body(e):
+    """the json body for the failed request"""
+    return _ENCODER.encode({"error": "failed to load the cluster data: {}".format(e)}).encode("utf-8")
+
+
+def _records(cluster, name, query):
+    """the records for the endpoint matching the filters of the query"""
+    filters = _FILTERS[name]
+    if name == "nodes":
+        return cluster.query_nodes(**{filters[k]: v for k, v in query.items() if k in filters})
+    if name == "jobs":
+        return cluster.query_jobs(**{filters[k]: v for k, v in query.items() if k in filters})
+    records = [x for x in cluster.get_accounts_info() if x.has_any_jobs()]
+    for key, getter in filters.items():
+        if key in query:
+            wanted = {x.lower() for x in query[key]}
+            records = [x for x in records if any(v.lower() in wanted for v in getter(x))]
+    return records
+
+
+def _int_param(query, name, default, minimum, maximum=None):
+    """read the integer query parameter"""
+    values = query.get(name)
+    if not values:
+        return default
+    try:
+        value = int(values[0])
+    except ValueError:
+        raise RuntimeError("The query parameter {0} should be integer: {1}".format(name, values[0]))
+    if value < minimum or (maximum is not None and value > maximum):
+        raise RuntimeError("The query parameter {0} is out of range: {1}".format(name, value))
+    return value
+
+
+def query_cluster(cluster, name, query):
+    """
+    compute the response data for the endpoint
+
+    :param cluster: the Cluster object
+    :param name: the endpoint name, summary, nodes, jobs or accounts
+    :param query: the parsed query, dict of name to list of values (see urllib.parse.parse_qs)
+    :return: the response data (dict)
+    """
+    if name == "summary":
+        return cluster.get_cluster_summary_info().to_dict()
+    if name not in _FILTERS:
+        raise KeyError(name)
+
+    filters = _FILTERS[name]
+    for key in query:
+        if key not in filters and key not in ("page", "page_size"):
+            raise RuntimeError("Invalid filter {0} for {1}, it should be one of {2}".format(
+                key, name, " ".join(filters)))
+    page = _int_param(query, "page", 1, 1)
+    page_size = _int_param(query, "page_size", DEFAULT_PAGE_SIZE, 1, MAX_PAGE_SIZE)
+
+    # only the records on the page are transformed into dict
+    records = _records(cluster, name, query)
+    begin = (page - 1) * page_size
+    return {"generation": cluster.generation, "total": len(records), "page": page, "page_size": page_size,
+            "items": [x.to_dict() for x in records[begin:begin + page_size]]}
+
+
+class SnapshotServer:
+    """
+    the HTTP server for the cluster snapshot, it runs in a background thread:
+
+    server = SnapshotServer(cluster, port=8080)
+    server.start()
+    ...
+    server.stop()
+    """
+
+    def __init__(self, cluster, host="127.0.0.1", port=0, refresh_interval=None):
+        """
+        :param cluster: the Cluster object
+        :param port: the port to listen, 0 means any free port (see the port attribute)
+        :param refresh_interval: if given, the cluster is refreshed every refresh_interval seconds
+        """
+        self.cluster = cluster
+        self.refresh_interval = refresh_interval
+        self.lock = threading.Lock()
+        self._data_lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._cache_generation = None
+        self._stopped = threading.Event()
+        self._threads = []
+        self._token = uuid.uuid4().hex[:12]
+        self.refresh_errors = 0
+        self.httpd = ThreadingHTTPServer((host, port), _SnapshotRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.snapshot_server = self
+
+    @property
+    def port(self):
+        return self.httpd.server_address[1]
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return "http://{0}:{1}".format(host, port)
+
+    def _cached(self, key):
+        """return the cached response for the current generation, None if it's not cached"""
+        with self.lock:
+            generation = self.cluster.generation
+            if generation != self._cache_generation:
+                self._cache.clear()
+                self._cache_generation = generation
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+            return cached
+
+    def _store(self, key, generation, result):
+        """cache the response if the generation is still the current one"""
+        with self.lock:
+            if generation != self._cache_generation:
+                return
+            self._cache[key] = result
+            if len(self._cache) > MAX_CACHED_RESPONSES:
+                self._cache.popitem(last=False)
+
+    def response(self, path, query_string):
+        """
+        return the (status, etag, body, content_type) for the request, the json body is cached
+        for the generation. The metrics have the durations which change without a new generation,
+        so they are always built again and have no etag
+        """
+        name = path.strip("/")
+        if name == "metrics":
+            with self._data_lock:
+                try:
+                    body = "".join(cluster_metrics(self.cluster)).encode("utf-8")
+                except Exception as e:
+                    return 503, None, _error_body(e), _JSON_CONTENT_TYPE
+            return 200, None, body, METRICS_CONTENT_TYPE
+
+        # the same query with the parameters in another order is the same response
+        query = parse_qs(query_string)
+        key = (name, tuple(sorted((k, tuple(v)) for k, v in query.items())))
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+
+        with self._data_lock:
+            # another request may have done it while this one was waiting
+            cached = self._cached(key)
+            if cached is not None:
+                return cached
+            generation = self.cluster.generation
+            try:
+                data = query_cluster(self.cluster, name, query)
+                status = 200
+            except KeyError:
+                data = {"error": "unknown endpoint: {}".format(path)}
+                status = 404
+            except RuntimeError as e:
+                data = {"error": str(e)}
+                status = 400
+            except Exception as e:
+                # like the lazy loading of the data failed, the scheduler commands time out
+                return 503, None, _error_body(e), _JSON_CONTENT_TYPE
+        body = _ENCODER.encode(data).encode("utf-8")
+        etag = '"{0}-{1}-{2}-{3:08x}"'.format(self.cluster._name, self._token, generation,
+                                              zlib.crc32(repr(key).encode("utf-8")))
+        result = (status, etag, body, _JSON_CONTENT_TYPE)
+        if status == 200:
+            self._store(key, generation, result)
+        return result
+
+    def refresh(self):
+        """refresh the cluster data, the new generation is served after that"""
+        with self._data_lock:
+            self.cluster.refresh()
+
+    def _refresh_loop(self):
+        while not self._stopped.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                # the old snapshot is still served, the refresh is tried again in the next interval
+                self.refresh_errors += 1
+                print("failed to refresh the cluster data: {}".format(e), file=sys.stderr)
+
+    def start(self):
+        """start the server (and the refresh) in the background threads"""
+        self._threads = [threading.Thread(target=self.httpd.serve_forever, daemon=True)]
+        if self.refresh_interval:
+            self._threads.append(threading.Thread(target=self._refresh_loop, daemon=True))
+        for t in self._threads:
+            t.start()
+
+    def serve_forever(self):
+        """run the server in the current thread, the refresh is still in the background"""
+        if self.refresh_interval:
+            threading.Thread(target=self._refresh_loop, daemon=True).start()
+        self.httpd.serve_forever()
+
+    def stop(self):
+        self._stopped.set()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class _SnapshotRequestHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        status, etag, body, content_type = self.server.snapshot_server.response(url.path, url.query)
+
+        # the conditional get
+        if status == 200 and etag is not None:
+            match = self.headers.get("If-None-Match")
+            if match is not None and etag in [x.strip() for x in match.split(",")]:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if status == 200 and etag is not None:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # keep the output quiet, the server runs next to the cron jobs
+        pass
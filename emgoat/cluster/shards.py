@@ -0,0 +1,119 @@
+"""
+Sharded layout of the jobs in the json result
+
+the portal only shows the jobs of one lab (or one node) at a time, so with json_shards true in
+the lsf/slurm section of the config the jobs are also written into small files, one for each
+account and one for each node, in the directory next to the json result:
+
+emgoat_slurm_results_shards/manifest.json
+emgoat_slurm_results_shards/jobs/by_account/labA.json
+emgoat_slurm_results_shards/jobs/by_node/gpu01.json
+
+each shard is the json array of the job records (same as in the json result, so with
+json_compress_hostlists true the compute nodes are the host list expressions too), the pending jobs
+without compute nodes are only in the account shards. The manifest has the file name, the number
+of jobs, the size and the content hash (sha1) of each shard:
+
+{"by_account": {"labA": {"file": "jobs/by_account/labA.json", "njobs": 3, "size": 1234, "sha1": "..."}},
+ "by_node": {...}}
+
+only the shards whose content is changed are written again, and the shards not in the new
+manifest are removed. The manifest is written last, so it always points to the complete shards
+"""
+import hashlib
+import json
+import os
+import re
+from emgoat.util import write_text_chunks, write_json_stream
+
+#
+# the shard groups, and the directory of each group in the shards directory
+#
+SHARD_GROUPS = {"by_account": "jobs/by_account", "by_node": "jobs/by_node"}
+
+#
+# the characters which are kept in the shard file name, the others become _
+#
+_UNSAFE_FILE_CHARS = re.compile(r'[^A-Za-z0-9._-]')
+
+_ENCODER = json.JSONEncoder(separators=(",", ":"))
+
+
+def shards_dir_name(json_result):
+    """the shards directory for the json result, like /data/results_shards"""
+    return os.path.splitext(json_result)[0] + "_shards"
+
+
+def shard_file_name(group, name):
+    """
+    the shard file name relative to the shards directory, like jobs/by_account/labA.json; if the
+    name has the characters not kept, the short hash of the name is added so that the names like
+    "lab A" and "lab_A" do not go into the same file (like jobs/by_account/lab_A-1c2d3e4f.json)
+    """
+    safe = _UNSAFE_FILE_CHARS.sub("_", name).lstrip(".") or "_"
+    if safe != name:
+        safe += "-" + hashlib.sha1(name.encode("utf-8")).hexdigest()[:8]
+    return "{0}/{1}.json".format(SHARD_GROUPS[group], safe)
+
+
+def _read_manifest(file_name):
+    try:
+        with open(file_name) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def shard_jobs(jobs, compress_nodes=False):
+    """
+    encode each job record once and group them, return the dict of group to the dict of name to
+    the list of encoded jobs; the input is the list of Job, see Job.to_dict for compress_nodes
+    """
+    shards = {group: {} for group in SHARD_GROUPS}
+    by_account = shards["by_account"]
+    by_node = shards["by_node"]
+    for job in jobs:
+        text = _ENCODER.encode(job.to_dict(compress_nodes))
+        by_account.setdefault(job.account_name, []).append(text)
+        for node in dict.fromkeys(job.compute_nodes):
+            by_node.setdefault(node, []).append(text)
+    return shards
+
+
+def write_shards(json_result, jobs, compress_nodes=False):
+    """
+    write the changed job shards and the manifest for the json result (see the file comments),
+    compress_nodes is the json_compress_hostlists of the json result
+
+    :return: the list of the shard files written (the unchanged ones are not in the list)
+    """
+    root = shards_dir_name(json_result)
+    manifest_file = os.path.join(root, "manifest.json")
+    previous = _read_manifest(manifest_file)
+    for path in SHARD_GROUPS.values():
+        os.makedirs(os.path.join(root, path), exist_ok=True)
+
+    written = []
+    manifest = {}
+    for group, shards in shard_jobs(jobs, compress_nodes).items():
+        old = previous.get(group, {})
+        entries = manifest[group] = {}
+        for name, records in shards.items():
+            text = "[" + ",".join(records) + "]"
+            data = text.encode("utf-8")
+            entry = {"file": shard_file_name(group, name), "njobs": len(records), "size": len(data),
+                     "sha1": hashlib.sha1(data).hexdigest()}
+            entries[name] = entry
+            file_name = os.path.join(root, entry["file"])
+            if old.get(name) != entry or not os.path.exists(file_name):
+                write_text_chunks(file_name, [text])
+                written.append(file_name)
+
+    # the manifest first, then the shards which are gone are removed
+    write_json_stream(manifest_file, list(manifest.items()))
+    files = {x["file"] for entries in manifest.values() for x in entries.values()}
+    for entries in previous.values():
+        for entry in entries.values():
+            if entry["file"] not in files and os.path.exists(os.path.join(root, entry["file"])):
+                os.remove(os.path.join(root, entry["file"]))
+    return written
@@ -0,0 +1,169 @@
+"""
+Multi-resource slot calculator
+
+for a list of job request shapes (ngpus, ncpus, mem_in_gb, gpu_type) this module counts how
+many such jobs could start now on the cluster. For each node the number of slots is
+
+    min(floor(free_gpus/ngpus), floor(free_cpus/ncpus), floor(free_mem/mem_in_gb))
+
+where the resources not requested (value 0) are not limiting. The computation is done for all
+of shapes and all of nodes at once on the NodeTable columns.
+
+the shapes are read from the config, in the slots section:
+
+[slots]
+shapes = 1:8:32 2:16:64 4:32:128:A100_80G
+
+each shape is ngpus:ncpus:mem_in_gb with an optional gpu type, shapes are separated by space
+"""
+from collections import namedtuple
+import numpy as np
+from emgoat.util import GPU_TYPES
+from .tables import NodeTable
+
+#
+# one job request shape, gpu_type is None if the job can land on any gpu type
+#
+SlotShape = namedtuple("SlotShape", ["ngpus", "ncpus", "mem_gb", "gpu_type"])
+
+#
+# to keep the temporary (shapes x nodes) arrays small, the shapes are processed in blocks
+#
+SHAPES_BLOCK_SIZE = 64
+
+#
+# the slot number for a resource that is not requested by the shape
+#
+_NOT_LIMITING = np.iinfo(np.int64).max
+
+
+def parse_slot_shapes(data: str):
+    """
+    parse the shapes string (see the module doc) into a list of SlotShape
+    """
+    shapes = []
+    for field in data.split():
+        values = field.split(":")
+        if len(values) not in (3, 4):
+            raise RuntimeError("The slot shape should be in form of ngpus:ncpus:mem_in_gb[:gpu_type], "
+                               "failed for parsing: {}".format(field))
+        try:
+            ngpus, ncpus, mem = (int(x) for x in values[:3])
+        except ValueError:
+            raise RuntimeError("The gpus/cpus/memory in slot shape should be integer: {}".format(field))
+        if ngpus < 0 or ncpus < 0 or mem < 0 or ngpus + ncpus + mem == 0:
+            raise RuntimeError("The slot shape should request some resources: {}".format(field))
+        gpu_type = values[3] if len(values) == 4 and values[3].lower() != "any" else None
+        shapes.append(SlotShape(ngpus, ncpus, mem, gpu_type))
+    return shapes
+
+
+def load_slot_shapes(config):
+    """
+    read the slot shapes from the config (ConfigParser), None is returned if the
+    config does not have the slots section
+    """
+    if not config.has_section('slots'):
+        return None
+    return parse_slot_shapes(config['slots'].get('shapes', ''))
+
+
+class SlotsResult:
+    """
+    the result of the slot calculation
+
+    totals is the number of slots for each shape over the cluster, by_gpu_type maps each
+    gpu type on the nodes to the slots for each shape on the nodes of this type
+    """
+
+    def __init__(self, shapes, totals, by_gpu_type):
+        self.shapes = shapes
+        self.totals = totals
+        self.by_gpu_type = by_gpu_type
+
+    def __str__(self):
+        lines = []
+        for i, shape in enumerate(self.shapes):
+            lines.append("for {0} gpu {1} cpu {2} GB memory (gpu type {3}) the number of available slots {4}".format(
+                shape.ngpus, shape.ncpus, shape.mem_gb, shape.gpu_type or "any", int(self.totals[i])))
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self):
+        """transform the result into a list of dict, one for each shape"""
+        result = []
+        for i, shape in enumerate(self.shapes):
+            result.append({"ngpus": shape.ngpus, "ncpus": shape.ncpus, "mem_in_gb": shape.mem_gb,
+                           "gpu_type": shape.gpu_type if shape.gpu_type else "any",
+                           "available_slots": int(self.totals[i]),
+                           "available_slots_by_gpu_type": {t: int(v[i]) for t, v in self.by_gpu_type.items()}})
+        return result
+
+
+def _resource_slots(free, request):
+    """
+    the (shapes x nodes) slot numbers for one resource, free is the free resource on each node
+    and request is the request of each shape
+    """
+    requested = request > 0
+    slots = np.full((len(request), len(free)), _NOT_LIMITING, dtype=np.int64)
+    slots[requested] = free[None, :] // request[requested, None]
+    return slots
+
+
+def node_slots(nodes, shapes, usable=None):
+    """
+    compute the (shapes x nodes) array of slots for the input shapes
+
+    :param nodes: NodeTable or list of Node
+    :param shapes: list of SlotShape
+    :param usable: boolean mask of the nodes to consider, default is the nodes good for new jobs
+    """
+    nodes = NodeTable.coerce(nodes)
+    if usable is None:
+        usable = nodes.good_for_newjobs_mask()
+    for shape in shapes:
+        if shape.ngpus <= 0 and shape.ncpus <= 0 and shape.mem_gb <= 0:
+            raise RuntimeError("The slot shape should request some resources: {}".format(shape))
+
+    # the free resources, nodes not usable has nothing free
+    free_gpus = np.where(usable, np.maximum(nodes.free_gpus(), 0), 0)
+    free_cpus = np.where(usable, np.maximum(nodes.free_cpus(), 0), 0)
+    free_mem = np.where(usable, np.maximum(nodes.free_mem(), 0), 0)
+
+    # the gpu type of each node as integer code, -1 is for the type not on any node
+    # (the gpu type names are compared in lower case)
+    codes, inverse = np.unique(nodes.gpu_type_codes, return_inverse=True)
+    type_codes = {}
+    lowered = np.fromiter((type_codes.setdefault(GPU_TYPES.decode(x).lower(), len(type_codes)) for x in codes),
+                          dtype=np.int64, count=len(codes))
+    node_types = lowered[inverse.reshape(-1)]
+    shape_types = np.array([-2 if x.gpu_type is None else type_codes.get(x.gpu_type.lower(), -1)
+                            for x in shapes], dtype=np.int64)
+
+    result = np.zeros((len(shapes), len(nodes)), dtype=np.int64)
+    for begin in range(0, len(shapes), SHAPES_BLOCK_SIZE):
+        block = shapes[begin:begin + SHAPES_BLOCK_SIZE]
+        slots = _resource_slots(free_gpus, np.array([x.ngpus for x in block], dtype=np.int64))
+        np.minimum(slots, _resource_slots(free_cpus, np.array([x.ncpus for x in block], dtype=np.int64)), out=slots)
+        np.minimum(slots, _resource_slots(free_mem, np.array([x.mem_gb for x in block], dtype=np.int64)), out=slots)
+
+        # the shapes asking for a given gpu type only count on the nodes with that type
+        block_types = shape_types[begin:begin + len(block), None]
+        slots[(block_types != -2) & (block_types != node_types[None, :])] = 0
+        result[begin:begin + len(block)] = slots
+    return result
+
+
+def compute_slots(nodes, shapes, usable=None):
+    """
+    compute the slots for the input shapes, see node_slots for the input
+
+    :return: SlotsResult with the total and per gpu type slots for each shape
+    """
+    nodes = NodeTable.coerce(nodes)
+    slots = node_slots(nodes, shapes, usable)
+
+    # per gpu type breakdown, the gpu types are only a few so we sum over the node columns of each type
+    codes = nodes.gpu_type_codes
+    by_gpu_type = {GPU_TYPES.decode(x): slots[:, codes == x].sum(axis=1) for x in dict.fromkeys(codes.tolist())}
+    return SlotsResult(shapes, slots.sum(axis=1), by_gpu_type)
@@ -1,17 +1,20 @@
 
+import os
 import emgoat
-from emgoat.util import Config
-from emgoat.util import NOT_AVAILABLE
+from emgoat.util import Config, TIMINGS, TIMING_REFRESH
 from emgoat.cluster.slurm.slurm_jobs import *
 from emgoat.cluster.slurm.slurm_hosts import *
 from ..base import Cluster as BaseCluster
-from datetime import datetime
+from ..tables import NodeTable, JobTable
+from ..slots import load_slot_shapes
+from ..capacity import load_snapshot_windows
 
 class Cluster(BaseCluster):
     """ Cluster implementation for Slurm system. """
     _name = "slurm"
     _config = Config(emgoat.config['slurm'])
-    #_job_snapshots_config = Config(emgoat.config['snapshots'])
+    _slot_shapes = load_slot_shapes(emgoat.config)
+    _snapshot_windows = load_snapshot_windows(emgoat.config)
 
     def get_nodes_info(self):
         return self.nodes_list
@@ -25,6 +28,38 @@ class Cluster(BaseCluster):
     def get_cluster_summary_info(self):
         return self.summary
 
+    @property
+    def nodes_list(self):
+        """the list of Node objects, it's built from the node table on first access"""
+        if self._nodes_list is None:
+            self._nodes_list = self.node_table.to_nodes(self.Node)
+        return self._nodes_list
+
+    @property
+    def partitions(self):
+        """the names of the partitions of the nodes"""
+        return self.node_table.partition_names()
+
+    def get_partition_summary_info(self, partition):
+        """
+        the summary for the given partition, it's computed from the nodes in the partition and
+        the jobs submitted to it. The node table has each node only once, so the nodes in several
+        partitions are counted only once in the cluster summary
+        """
+        summary = self._partition_summaries.get(partition)
+        if summary is None:
+            nodes = self.node_table.take(self.node_table.partition_mask(partition))
+            jobs = self.job_table.take(self.job_table.partition_mask(partition))
+            summary = self._partition_summaries[partition] = super().Summary(nodes, jobs, self._slot_shapes)
+        return summary
+
+    @property
+    def jobs_list(self):
+        """the list of Job objects, it's built from the job table on first access"""
+        if self._jobs_list is None:
+            self._jobs_list = self.job_table.to_jobs(self.Job)
+        return self._jobs_list
+
     def __init__(self):
         """
         initialization of slurm cluster
@@ -32,80 +67,61 @@ class Cluster(BaseCluster):
 
         # cluster type
         super().__init__()
+        self._load()
 
-        # get the nodes information
-        node_list = get_nodes_info()
-        jobs_list = set_job_info()
-        self.nodes_list = self._transform_node_list_infor(node_list, jobs_list)
+    def refresh(self):
+        """
+        load the nodes/jobs data again, the commands only run again when the data files are
+        outdated (see slurm_hosts.get_nodes_info and slurm_jobs.set_job_info)
+        """
+        self._load()
+        self.generation += 1
 
-        # get the jobs information
-        self.jobs_list = self._transform_jobs_list_infor(jobs_list)
+    def _load(self):
+        """
+        collect the nodes and jobs data and build the tables, accounts and summary
+        """
+
+        # get the nodes and jobs information
+        with TIMINGS.timed(TIMING_REFRESH, [("cluster", self._name), ("part", "all")]):
+            node_list = get_nodes_info()
+            jobs_list = set_job_info()
+
+        # form the tables, the object lists are built from them only when needed
+        self.job_table = JobTable.from_records(jobs_list)
+        self.node_table = self._build_node_table(node_list, self.job_table)
+        self._nodes_list = None
+        self._jobs_list = None
+        self._partition_summaries = {}
 
         # set up the account list
-        self.accounts_list = super().form_accounts_infor(self.jobs_list)
+        self.accounts_list = super().form_accounts_infor(self.job_table)
 
         # finally generate the summary based on the output results
-        self.summary = super().Summary(self.nodes_list, self.jobs_list)
-
+        self.summary = super().Summary(self.node_table, self.job_table, self._slot_shapes)
 
-    def _transform_node_list_infor(self, nodes_infor, jobs_infor):
-        """
-        This function transform the input node information list into the list of Node
+    def _build_node_table(self, nodes_infor, job_table):
         """
+        This function transform the input node information list into the NodeTable
 
-        # set up the job infor list on each node
-        # key is the node name, value is the corresponding number of jobs on the node
-        job_infor_list = {x['name']: 0 for x in nodes_infor}
-        for node_name in job_infor_list:
-            for job in jobs_infor:
-                node_names_list = job['compute_nodes']
-                if node_names_list.find(node_name) >=0:
-                    job_infor_list[node_name] += 1
-
-        # here each node is a dict, see the form_nodes_infor_list_from_node_names
-        # function in lsf_hosts.py for more information
-        nodes_list = []
-        for node in nodes_infor:
-            name = node['name']
-            njobs = job_infor_list[name]
-            n = self.Node(name, node['gpu_type'], node['status'], node['ngpus'], node['n_used_gpus'],
-                          node['ncpus'], node['n_used_cpus'], node['mem_in_gb'], node['used_mem_in_gb'],
-                          njobs,True)
-            nodes_list.append(n)
-
-        # return
-        return nodes_list
-
-    def _transform_jobs_list_infor(self, jobs_infor):
+        slurm already gives the usage data for the node, we only need to count the jobs on each node
         """
-        This function transform the input jobs information list into the list of Job
+        node_table = NodeTable.from_records(nodes_infor, with_usage_data=True)
+        node_table.count_jobs(job_table)
+        return node_table
 
-        for slurm job output, it uses iso format of time so no time format really needed
+    def query_tables(self):
+        return self.node_table, self.job_table
+
+    def metric_groups(self):
+        """
+        the metrics are given for the whole cluster (without the partition label, a partition could
+        be named like "all"), and the summary for each partition
         """
-        # here each node is a dict, see the form_nodes_infor_list_from_node_names
-        # function in lsf_hosts.py for more information
-        jobs_list = []
-        for job in jobs_infor:
-
-            # firstly generate the datetime
-            submit = datetime.fromisoformat(job['submit_time'])
-            if job['start_time'] == NOT_AVAILABLE:
-                start_time = None
-            else:
-                start_time = datetime.fromisoformat(job['start_time'])
-
-            # transform the compute nodes into a list
-            compute_nodes_list = job['compute_nodes'].split()
-
-            # now create the job
-            j = self.Job(job['jobid'], job['job_name'], submit, job['state'], job['general_state'],
-                         job['pending_time'], job['job_remaining_time'], start_time,
-                         job['used_time'], job['cpu_used'], job['gpu_used'], job['memory_used'],
-                         compute_nodes_list, job['account_name'])
-            jobs_list.append(j)
-
-        # return
-        return jobs_list
+        groups = [([], self.summary, self.node_table, self.accounts_list)]
+        for p in self.partitions:
+            groups.append(([("partition", p)], self.get_partition_summary_info(p), None, None))
+        return groups
 
     def generate_json_results(self):
         """
@@ -115,22 +131,24 @@ class Cluster(BaseCluster):
         config = self._config
         json_result = config['json_result_path']
 
-        # set up the result structure
-        node_list = [x.to_dict() for x in self.get_nodes_info()]
-        jobs_list = [x.to_dict() for x in self.get_jobs_info()]
-        acc_list  = [x.to_dict() for x in self.get_accounts_info() if x.has_any_jobs()]
-        summary   = self.get_cluster_summary_info().to_dict()
-        result = {"summary": summary, "nodes": node_list, "accounts": acc_list, "jobs": jobs_list}
-
-        # write it into json file
-        with open(json_result, 'w') as infor:
-            json.dump(result, infor, indent=4)
-
-
-
-
-
-
-
-
-
+        # the summary for each partition is written after the cluster summary
+        partitions = {p: self.get_partition_summary_info(p).to_dict() for p in self.partitions}
+        written = self.write_json_results(json_result, self.get_nodes_info(), self.get_jobs_info(),
+                                          self.get_accounts_info(), self.get_cluster_summary_info(),
+                                          [("partitions", partitions)], config.get_bool('json_jobs_ndjson', False),
+                                          (self.node_table, self.job_table))
+
+        # the snapshot goes into the history even if nothing is changed
+        self.record_history("", self.get_cluster_summary_info(), self.node_table, self.job_table, self.accounts_list)
+
+        # the columnar exports, the views, the job shards and the availability index next to the
+        # json result, if nothing is changed in the result they are still good
+        if written:
+            self.export_results(os.path.splitext(json_result)[0], self.node_table, self.job_table,
+                                self.accounts_list)
+            self.write_view_files(json_result, self.node_table, self.job_table, self.accounts_list)
+            self.write_job_shards(json_result, self.get_jobs_info())
+            self.write_availability_file(json_result, self.node_table, self.job_table)
+
+        # the metrics file is always written since it has the timings
+        self.write_metrics_file()
@@ -1,6 +1,6 @@
 from emgoat.config import get_config
 from emgoat.util import run_command
-from .slurm_util import get_gpu_number_from_sinfo_output,get_gpu_type_from_sinfo_output
+from emgoat.util import parse_gres, gres_gpu_type
 from emgoat.util import generate_json_data_file, read_json_data_file, need_newer_data_file
 #
 # constants that from configuration
@@ -42,12 +42,17 @@ def parse_sinfo_data(infor: str):
     in this function let's parse the sinfo output and return the machine status data for 
     current time.
 
+    sinfo -N prints one line for each (node, partition), here each node is parsed only once
+    and the partitions of the node are collected into the "partitions" list of the node
+
     :param infor: raw output of sinfo command
     :returns: a dict form of result, recording the nodes/cores etc. data
     """
 
     # set up the node list, this is the result
+    # the nodes are also indexed by name for collecting the partitions
     node_list = []
+    nodes = {}
 
     # let's capture the headline, so that we know the position for the data
     # set the data position
@@ -59,6 +64,7 @@ def parse_sinfo_data(infor: str):
     used_gpu_pos  = -1
     mem_pos       = -1
     used_mem_pos  = -1
+    partition_pos = -1
     for line in infor.splitlines():
 
         # this is the headline
@@ -84,6 +90,8 @@ def parse_sinfo_data(infor: str):
                     mem_pos = p
                 elif val == "ALLOCMEM":
                     used_mem_pos = p
+                elif val == "PARTITION":
+                    partition_pos = p
 
             # once it's done break
             break
@@ -105,12 +113,19 @@ def parse_sinfo_data(infor: str):
         # now read in each line
         data_fields = [f.strip() for f in line.strip().split()]
 
+        # node name, if we already have the node, only add the partition
+        # the default partition is marked with * in sinfo
+        node_name = data_fields[nodename_pos]
+        partition = data_fields[partition_pos].rstrip("*") if partition_pos >= 0 else None
+        if node_name in nodes:
+            partitions = nodes[node_name]["partitions"]
+            if partition is not None and partition not in partitions:
+                partitions.append(partition)
+            continue
+
         # get the status and ncores
         status = data_fields[status_pos].lower()
 
-        # node name
-        node_name = data_fields[nodename_pos]
-
         # total memory in mb
         total_mem = int(int(data_fields[mem_pos])/1024)
 
@@ -126,14 +141,13 @@ def parse_sinfo_data(infor: str):
         # the first one is the used cores
         used_core_num = int(data_fields[used_cores_pos].split("/")[0])
 
-        # whether the node has gpu?
-        gpu_data = get_gpu_number_from_sinfo_output(data_fields[avail_gpu_pos])
+        # whether the node has gpu? the gres field is parsed once for the number and type
+        gres = parse_gres(data_fields[avail_gpu_pos])
+        gpu_data = gres.gpus
+        gpu_type = gres_gpu_type(gres)
 
         # how many gpu used
-        used_gpu_data = get_gpu_number_from_sinfo_output((data_fields[used_gpu_pos]))
-
-        # gpu type
-        gpu_type = get_gpu_type_from_sinfo_output(data_fields[avail_gpu_pos])
+        used_gpu_data = parse_gres(data_fields[used_gpu_pos]).gpus
 
         # now let's form the data
         if gpu_data == 0:
@@ -146,6 +160,8 @@ def parse_sinfo_data(infor: str):
                           "ngpus": gpu_data, "gpu_type": gpu_type, "n_used_gpus": used_gpu_data}
 
         # add in the data
+        node_infor["partitions"] = [partition] if partition is not None else []
+        nodes[node_name] = node_infor
         node_list.append(node_infor)
     
     # let's return
@@ -3,10 +3,11 @@ This file is to parse the squeue output from slurm, this is the currently runnin
 """
 import json
 from emgoat.config import get_config
-from emgoat.util import run_command, whether_job_is_running, whether_job_is_pending, NOT_AVAILABLE, VERY_BIG_NUMBER
-from emgoat.util import get_job_general_status, generate_json_data_file, read_json_data_file, need_newer_data_file
-from .slurm_util import parse_slurm_host_names,parse_tres_data_from_json
-from datetime import datetime
+from emgoat.util import run_command, job_state, VERY_BIG_NUMBER
+from emgoat.util import generate_json_data_file, read_json_data_file, need_newer_data_file
+from emgoat.util import TimeParser, encode_records, decode_records, JOB_RECORD_STRING_FIELDS
+from emgoat.util import Config, group_array_jobs, index_ranges_count
+from .slurm_util import parse_slurm_host_names,parse_tres_data_from_json,get_slurm_number,get_gpu_type_from_tres
 
 #
 # constants that from configuration
@@ -22,16 +23,25 @@ def run_squeue_get_alljobs():
     args = ["squeue", "--json"]
     return run_command(args)
 
-def parse_squeue_output_for_alljobs(output: str):
+def parse_squeue_output_for_alljobs(output: str, time_parser=None):
     """
     parsing the output of the above squeue command output
     :param output: the output data in squeue command in json format of string
+    :param time_parser: the TimeParser for this refresh, a new one is created if it's None
     :return: a list of dict that contains the job name and user names etc. information
+
+    the submit/start time in the result are in epoch seconds, the start time is None
+    if the job is not started; reference_time is the epoch seconds of the parsing, the
+    remaining time is counted from it
     """
 
     # load in the raw output to json format output for further parsing
     data = json.loads(output)
 
+    # all of records are computed against the same reference time
+    if time_parser is None:
+        time_parser = TimeParser()
+
     # this is the job information
     # each result is a Jobs object
     job_list = []
@@ -41,20 +51,22 @@ def parse_squeue_output_for_alljobs(output: str):
 
         # only consider the running/pending jobs
         status = record['job_state'][0]
-        if whether_job_is_running(status) or whether_job_is_pending(status):
+        state = job_state(status)
+        is_running = state.is_running
+        if is_running or state.is_pending:
 
             # load in the json data
             jobid = record['job_id']
             account_name = record['account']
             user_name = record['user_name']
             job_name = record['name']
-            submit_time_t = datetime.fromtimestamp(record['submit_time'])
+            submit_time = int(record['submit_time'])
             requested_time = int(record['time_limit'])  # this is in minutes
             tres_request = record['tres_req_str']
 
             # get the job allocation host list
             host_list = " "
-            if whether_job_is_running(status):
+            if is_running:
                 host_list = parse_slurm_host_names(record['job_resources']['nodes'])
 
             # get the resources data from tres
@@ -63,52 +75,66 @@ def parse_squeue_output_for_alljobs(output: str):
             ncpus = data[1]
             mem_in_gb = data[2]
             ngpus = data[3]
+            gpu_type = get_gpu_type_from_tres(tres_request)
 
             # double check the number of nodes with host list
-            if len(host_list.split()) != num_nodes:
+            # only the running job has the host list
+            if is_running and len(host_list.split()) != num_nodes:
                 raise RuntimeError("the number of nodes we get from tres_req_str is not equal to the number of hosts "
                                    "in the host list in job_resources")
 
             # only running job has start time
-            start_time_t = NOT_AVAILABLE
+            # the running time is counted from the start time
+            start_time = None
             running_time = 0
-            if whether_job_is_running(status):
-                start_time = datetime.fromtimestamp(record['start_time'])
-                pending_time = (start_time - submit_time_t).total_seconds()/60
-                running_time = (datetime.now() - submit_time_t).total_seconds()/60
-                start_time_t = start_time.isoformat()
+            if is_running:
+                start_time = int(record['start_time'])
+                pending_time = (start_time - submit_time)/60
+                running_time = time_parser.minutes_since(start_time)
             else:
-                pending_time = (datetime.now() - submit_time_t).total_seconds()/60
+                pending_time = time_parser.minutes_since(submit_time)
 
             # compute time left
             # if job is not started, the left time is set to a very big number
             left_time = VERY_BIG_NUMBER
-            if whether_job_is_running(status):
+            if is_running:
                 left_time = requested_time - running_time
 
-            # change the time into string
-            submit_time = submit_time_t.isoformat()
-
             # now we have everything, building the dict
-            # further change the datetime into string
             # this is to save the result into file
             job_infor = {
                 'jobid': jobid,
                 'job_name': job_name,
                 'submit_time': submit_time,
                 'state': status,
-                'general_state': get_job_general_status(status),
+                'general_state': state.general_state,
                 'pending_time': pending_time,
                 'job_remaining_time': left_time,
-                'start_time': start_time_t,
+                'start_time': start_time,
                 'used_time': running_time,
                 'cpu_used': ncpus,
                 'gpu_used': ngpus,
+                'gpu_type': gpu_type,
                 'memory_used': mem_in_gb,
-                'compute_nodes': host_list,
-                'account_name': account_name
+                'compute_nodes': host_list.split(),
+                'account_name': account_name,
+                'partitions': record['partition'].split(","),
+                'reference_time': time_parser.now_ts
             }
 
+            # the array element has its task id, the pending elements not started yet are
+            # in one record with the task string like 3-100%10
+            array_id = get_slurm_number(record.get('array_job_id'))
+            if array_id:
+                job_infor['array_id'] = str(array_id)
+                task_id = get_slurm_number(record.get('array_task_id'))
+                task_string = record.get('array_task_string') or ""
+                if task_id is not None:
+                    job_infor['array_index'] = task_id
+                elif task_string:
+                    job_infor['array_indices'] = task_string.split("%")[0]
+                    job_infor['array_count'] = index_ranges_count(task_string)
+
             # now add the job infor
             job_list.append(job_infor)
 
@@ -131,13 +157,15 @@ def set_job_info():
     # whether we have the file
     if not need_newer_data_file(fname, time):
         data = read_json_data_file(fname)
-        return data
+        return decode_records(data)
 
     # now let's generate the file
     output = run_squeue_get_alljobs()
     jobs_list = parse_squeue_output_for_alljobs(output)
+    if Config(slurm_COFNIG['slurm']).get_bool('group_job_arrays', False):
+        jobs_list = group_array_jobs(jobs_list)
 
-    # save the data
-    generate_json_data_file(jobs_list, fname)
+    # save the data, the repeated strings are written with the string tables
+    generate_json_data_file(encode_records(jobs_list, JOB_RECORD_STRING_FIELDS), fname)
     return jobs_list
 
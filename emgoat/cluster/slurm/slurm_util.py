@@ -1,134 +1,70 @@
-import re
+from emgoat.util import parse_gres, gres_gpu_type, parse_tres, expand_hostlist, GresCounts
+
+#
+# the value of the number not set in the older slurm json output
+#
+SLURM_NO_VAL = 0xfffffffe
 
 def parse_slurm_host_names(data: str):
     """
     from the input data parse the hot name list
-    the input data is like x2,x-gpu05
+    the input data is like x2,x-gpu05 or with the ranges like gpu[01-16,20],x-gpu05
+
+    the ranges are expanded (see util/hostlist.py) and the host names are joined with space
+    """
+    return " ".join(expand_hostlist(data))
 
-    We simply change the "," into space
+def get_slurm_number(value):
+    """
+    the number field in the squeue json output, it's either the number or like
+    {"set": true, "infinite": false, "number": 5} in the newer slurm; None is returned if
+    the number is not set (the older slurm gives NO_VAL for it)
     """
-    if data.find(",") >0:
-        # replace the "," with space
-        return data.replace(",", " ")
-    else:
-        return data
+    if isinstance(value, dict):
+        if not value.get("set", False) or value.get("infinite", False):
+            return None
+        value = value.get("number")
+    if value is None or int(value) >= SLURM_NO_VAL:
+        return None
+    return int(value)
 
 def get_gpu_number_from_sinfo_output(input: str):
     """
     this is the parse the input line from sinfo ouput to get the gpu number data
-    the input data could be in following forms, (null), gpu:0, gpu:a100:1(S:0) etc.
+    the input data could be in following forms, (null), gpu:0, gpu:a100:1(S:0),
+    gpu:a100:4,gpu:h100:2 etc.
 
-    for the real data, we will get rid of the string inside the braket and take the last number
-    in the string
+    the gpus of all of gpu entries are added together, see parse_gres for the typed counts
     """
-
-    # if the string has null, that means the input does not have any gpu data
-    if input.find("null") >=0:
-        return 0
-
-    # now we have the real data
-    # get rid of the data inside the braket
-    # we note that the data may only have one braket, that is ( sign; it may missing the )
-    if ":" in input:
-        if input.find("(") >= 0:
-            s0 = input.split("(")[0]
-        else:
-            s0 = input
-        s = [x for x in s0.strip().split(":")]
-
-        # always the last value is the number
-        return int(s[-1])
-    else:
-        raise RuntimeError("The input data does not have :, failed for parsing: {}".format(input))
+    return parse_gres(input).gpus
 
 def get_gpu_type_from_sinfo_output(input: str):
     """
     this is the parse the input line from sinfo ouput to get the gpu type data
     the input data could be in following forms, (null), gpu:0, gpu:a100:1(S:0) etc.
 
-    for the real data, we will get rid of the string inside the braket and take the type data
+    if the node has several gpu types, the type with most gpus is returned
     """
-
-    # if the string has null, that means the input does not have any gpu data
-    if input.find("null") >=0:
-        return "none"
-
-    # now we have the real data
-    # get rid of the data inside the braket
-    # we note that the data may only have one braket, that is ( sign; it may missing the )
-    if ":" in input:
-        if input.find("(") >= 0:
-            s0 = input.split("(")[0]
-        else:
-            s0 = input
-        s = [x for x in s0.strip().split(":")]
-
-        # the last value is always the number
-        # so we take the string before the number
-        if len(s) >= 2:
-            return s[-2]
-        else:
-            raise RuntimeError("The input data is invalid for paring the gpu type: {}".format(input))
-    else:
-        raise RuntimeError("The input data does not have :, failed for parsing: {}".format(input))
+    return gres_gpu_type(parse_gres(input))
 
 
 def parse_tres_data_from_json(data):
     """
     this function is used to parse the json data fields
 
-    the example format is like gres/gpu:rtxa6000:1 or gres/gpu:3
+    the example format is like cpu=8,mem=64G,node=1,gres/gpu:rtxa6000:1 or gres/gpu=3
 
-    we will return the number of GPU cards captured from the data field
+    we will return the number of nodes, cpus, memory in GB and GPU cards captured from the data field;
+    see parse_tres for the gpus per type
     """
-    data_tmp = data.strip().lower()
-
-    # do we have any data
-    gpus = 0
-    ncpus = 0
-    nnodes = 0
-    mem = 0
-    if "," in data_tmp:
-        data_fields = data_tmp.split(',')
-        for x in data_fields:
+    tres = parse_tres(data)
+    return tres.nnodes, tres.ncpus, tres.mem_in_gb, tres.gpus
 
-            # the data format is like gres/gpu=3 or gres/gpus:xx=3 (for gpu), or cpu=20, mem=40 etc.
-            if "=" in x:
-                value = x.split("=")[-1]
-            else:
-                print(data)
-                raise RuntimeError("The input data field does not have equal sign =, failed for parsing!\n")
 
-            # data fields
-            # for memory, usually it's like the data 320G etc.
-            if x.find("gres")>=0:
-                gpus = int(value)
-            elif x.find("cpu")>=0:
-                ncpus = int(value)
-            elif x.find("node")>=0:
-                nnodes = int(value)
-            elif x.find("mem")>=0:
-                s = value.lower()
-                if s.find("g")>=0:
-                    mem = int(re.sub(r'\D', '', value))
-                elif s.find("m") >= 0:
-                    mem = int(int(re.sub(r'\D', '', value))/1024)
-                elif s.find("t") >= 0:
-                    mem = int(re.sub(r'\D', '', value))*1024
-                else:
-                    print(data)
-                    raise RuntimeError("The input data field for memory does not have any unit "
-                                       "sign like kb, gb or tb, failed for parsing!\n")
-    else:
-        print(data)
-        raise RuntimeError("The input data field can not be parsed, it should have multiple data fields like ncpus=1,mem=10G\n")
-
-    # double check the data
-    # at least the memory/cpus/nnodes should be defined
-    if mem == 0 or nnodes == 0 or ncpus ==0:
-        print(data)
-        raise RuntimeError("The input data field should have at least memory/ncpus/n_nodes defined, "
-                           "now at least one of them is missing in the input data\n")
-
-    # return
-    return nnodes,ncpus,mem,gpus
+def get_gpu_type_from_tres(data):
+    """
+    the gpu type requested in the tres string of the job like gres/gpu:a100=2, "none" if the
+    job does not ask for a gpu type; if several types are given it's the one with most gpus
+    """
+    tres = parse_tres(data)
+    return gres_gpu_type(GresCounts(tres.gpus, tres.gpus_by_type))
@@ -0,0 +1,494 @@
+"""
+Columnar tables for the nodes and jobs data
+
+the tables are built directly from the parsed records (list of dict) that the LSF/Slurm
+modules produce, the numerical data are stored in numpy arrays so that the cluster
+summary can be done with vectorized reductions. The Node/Job objects are only built
+from the table when they are really needed (see to_nodes and to_jobs)
+"""
+import copy
+from datetime import datetime
+import numpy as np
+from emgoat.util import JOB_STATUS_PD, JOB_STATUS_RUN, JOB_STATUS_DONE, NOT_AVAILABLE
+from emgoat.util import NodeGroup, node_group_column, datetime_to_epoch, expand_hostlist
+from emgoat.util import ACCOUNTS, HOSTS, STATES, GPU_TYPES, PARTITIONS
+
+#
+# the general job state is stored as a small integer code in the table, it's the
+# code in the STATES string table
+#
+JOB_STATE_PD_CODE = STATES.encode(JOB_STATUS_PD)
+JOB_STATE_RUN_CODE = STATES.encode(JOB_STATUS_RUN)
+JOB_STATE_DONE_CODE = STATES.encode(JOB_STATUS_DONE)
+JOB_GENERAL_STATES = [JOB_STATUS_PD, JOB_STATUS_RUN, JOB_STATUS_DONE]
+JOB_GENERAL_STATE_CODES = {s: STATES.encode(s) for s in JOB_GENERAL_STATES}
+
+#
+# the missing epoch time (job is not started yet) in the int64 time columns
+#
+MISSING_TIME = -1
+
+#
+# the partitions of a node/job are stored as bitmask in int64 column, the bit is the code
+# in the PARTITIONS string table
+#
+MAX_PARTITIONS = 63
+
+
+def _int_column(values):
+    """make the int64 numpy column from the input values"""
+    return np.fromiter(values, dtype=np.int64)
+
+
+def _code_column(table, strings):
+    """encode the strings with the string table into the int32 numpy column"""
+    return np.fromiter((table.encode(x) for x in strings), dtype=np.int32)
+
+
+def _partition_column(partitions, n):
+    """
+    make the int64 bitmask column for the partitions, partitions is the list of partition
+    names for each row (None for no partition data)
+    """
+    if partitions is None:
+        return np.zeros(n, dtype=np.int64)
+    bits = np.zeros(n, dtype=np.int64)
+    for i, names in enumerate(partitions):
+        for x in names:
+            code = PARTITIONS.encode(x)
+            if code >= MAX_PARTITIONS:
+                raise RuntimeError("Too many partitions, at most {0} partitions are supported: {1}".format(
+                    MAX_PARTITIONS, x))
+            bits[i] |= 1 << code
+    return bits
+
+
+def _partition_names(bits):
+    """return the partition names (in the order of the codes) in the bitmask column"""
+    present = int(np.bitwise_or.reduce(bits)) if len(bits) > 0 else 0
+    return [PARTITIONS.decode(x) for x in range(len(PARTITIONS)) if present >> x & 1]
+
+
+def _partition_mask(bits, partition):
+    """return the boolean array that marks the rows in the given partition"""
+    return (bits & (1 << PARTITIONS.encode(partition))) != 0
+
+
+def _take_rows(table, rows):
+    """
+    return the new table with the given rows (positions or boolean mask), the numpy columns
+    and the list columns are selected and the other data are kept
+    """
+    rows = np.asarray(rows)
+    if rows.dtype == bool:
+        rows = np.flatnonzero(rows)
+    result = copy.copy(table)
+    for name, value in vars(table).items():
+        if isinstance(value, np.ndarray):
+            setattr(result, name, value[rows])
+        elif isinstance(value, list):
+            setattr(result, name, [value[i] for i in rows])
+    return result
+
+
+def _split_nodes(compute_nodes):
+    """
+    the compute nodes in the job record is a list, or a space separated string in old data files;
+    the string could also be the slurm host list expression like gpu[01-04]
+    """
+    if isinstance(compute_nodes, str):
+        return list(expand_hostlist(compute_nodes))
+    return compute_nodes
+
+
+def _time_to_epoch(value):
+    """
+    convert the time data from the parsed job record into epoch seconds
+
+    the value could be the iso format string, the epoch seconds, a datetime
+    object or the NOT_AVAILABLE/None for the missing time
+    """
+    if value is None or value == NOT_AVAILABLE:
+        return MISSING_TIME
+    if isinstance(value, str):
+        return datetime_to_epoch(datetime.fromisoformat(value))
+    return datetime_to_epoch(value)
+
+
+class NodeTable:
+    """
+    columnar storage for the nodes, every column has one entry per node
+
+    the string columns (name, gpu_type, status) are int32 arrays of codes in the shared string
+    tables (HOSTS, GPU_TYPES and STATES), and the resources columns (ngpus, ncpus, mem, gpus_used,
+    cpus_used, mem_used, njobs) are numpy int64 arrays. The memory is in unit of GB as in the Node class
+
+    partition_bits is the bitmask of the partitions for each node (see PARTITIONS), slurm puts one
+    node in several partitions, the node is still one row in the table
+    """
+
+    def __init__(self, names, gpu_types, statuses, ngpus, ncpus, mem,
+                 gpus_used=None, cpus_used=None, mem_used=None, njobs=None, partitions=None):
+        """
+        all of the resources data should be >= 0, the negative values (which is the default
+        value for missing data) are set to 0 as what the Node class does
+        """
+        self.name_codes = _code_column(HOSTS, names)
+        self.gpu_type_codes = _code_column(GPU_TYPES, gpu_types)
+        self.status_codes = _code_column(STATES, statuses)
+        n = len(self.name_codes)
+        self.ngpus = np.maximum(np.asarray(ngpus, dtype=np.int64), 0)
+        self.ncpus = np.maximum(np.asarray(ncpus, dtype=np.int64), 0)
+        self.mem = np.maximum(np.asarray(mem, dtype=np.int64), 0)
+        self.gpus_used = self._usage_column(gpus_used, n)
+        self.cpus_used = self._usage_column(cpus_used, n)
+        self.mem_used = self._usage_column(mem_used, n)
+        self.njobs = self._usage_column(njobs, n)
+        self.partition_bits = _partition_column(partitions, n)
+        self._index = None
+
+    @staticmethod
+    def _usage_column(values, n):
+        if values is None:
+            return np.zeros(n, dtype=np.int64)
+        return np.maximum(np.asarray(values, dtype=np.int64), 0)
+
+    @classmethod
+    def from_records(cls, records, with_usage_data=False, njobs=None):
+        """
+        build the table from the node records, each record is a dict like what the
+        lsf_hosts.get_nodes_info or slurm_hosts.get_nodes_info returns
+
+        if with_usage_data is true, the usage data (n_used_gpus etc.) in the records are used;
+        otherwise the usage data are 0 and will be updated later with the jobs data
+        """
+        names = [x['name'] for x in records]
+        gpu_types = [x['gpu_type'] for x in records]
+        statuses = [x['status'] for x in records]
+        ngpus = _int_column(x['ngpus'] for x in records)
+        ncpus = _int_column(x['ncpus'] for x in records)
+        mem = _int_column(x['mem_in_gb'] for x in records)
+        partitions = [x.get('partitions', ()) for x in records]
+        if not with_usage_data:
+            return cls(names, gpu_types, statuses, ngpus, ncpus, mem, partitions=partitions)
+        gpus_used = _int_column(x['n_used_gpus'] for x in records)
+        cpus_used = _int_column(x['n_used_cpus'] for x in records)
+        mem_used = _int_column(x['used_mem_in_gb'] for x in records)
+        return cls(names, gpu_types, statuses, ngpus, ncpus, mem, gpus_used, cpus_used, mem_used, njobs,
+                   partitions)
+
+    @classmethod
+    def from_nodes(cls, nodes):
+        """build the table from the list of Cluster.Node objects"""
+        return cls([x.name for x in nodes], [x.gpu_type for x in nodes], [x.status for x in nodes],
+                   _int_column(x.ngpus for x in nodes), _int_column(x.ncpus for x in nodes),
+                   _int_column(x.total_mem_in_gb for x in nodes), _int_column(x.gpus_in_use for x in nodes),
+                   _int_column(x.cores_in_use for x in nodes), _int_column(x.memory_in_use for x in nodes),
+                   _int_column(x.njobs for x in nodes))
+
+    @classmethod
+    def coerce(cls, nodes):
+        """return the input as a NodeTable, the input is either a table or a list of Node"""
+        if isinstance(nodes, cls):
+            return nodes
+        return cls.from_nodes(nodes)
+
+    def __len__(self):
+        return len(self.name_codes)
+
+    @property
+    def names(self):
+        return HOSTS.decode_many(self.name_codes)
+
+    def partition_names(self):
+        """return the names of the partitions that have any node"""
+        return _partition_names(self.partition_bits)
+
+    def partition_mask(self, partition):
+        """return the boolean array that marks the nodes in the given partition"""
+        return _partition_mask(self.partition_bits, partition)
+
+    def take(self, rows):
+        """return the new table for the given rows (positions or boolean mask)"""
+        table = _take_rows(self, rows)
+        table._index = None
+        return table
+
+    @property
+    def gpu_types(self):
+        return GPU_TYPES.decode_many(self.gpu_type_codes)
+
+    @property
+    def statuses(self):
+        return STATES.decode_many(self.status_codes)
+
+    def host_rows(self):
+        """
+        return the array that maps the code in HOSTS to the row position of the node, -1 is for
+        the hosts not in this table. If the same node appears on several rows, the first row is used
+        """
+        rows = np.full(len(HOSTS), -1, dtype=np.int64)
+        rows[self.name_codes[::-1]] = np.arange(len(self) - 1, -1, -1)
+        return rows
+
+    def index(self):
+        """
+        return the dict that maps the node name (in lower case) to the row position
+
+        if the same node appears on several rows, the first row is used
+        """
+        if self._index is None:
+            index = {}
+            for i, name in enumerate(self.names):
+                index.setdefault(name.lower(), i)
+            self._index = index
+        return self._index
+
+    def _spread_to_rows(self, values):
+        """
+        the input values are accumulated on the first row of each node name (see index),
+        here we copy them to all of rows with the same node name (the nodes are in the last axis)
+        """
+        index = self.index()
+        if len(index) == len(self):
+            return values
+        first_rows = np.fromiter((index[name.lower()] for name in self.names), dtype=np.int64, count=len(self))
+        return values[..., first_rows]
+
+    def free_gpus(self):
+        return self.ngpus - self.gpus_used
+
+    def free_cpus(self):
+        return self.ncpus - self.cpus_used
+
+    def free_mem(self):
+        return self.mem - self.mem_used
+
+    def node_groups(self):
+        """
+        return the NodeGroup value of each node (see states.py), the status is only classified
+        once for each distinct status
+        """
+        return node_group_column(self.status_codes)
+
+    def off_mask(self):
+        """
+        return the boolean array that marks the off nodes
+        """
+        return self.node_groups() == NodeGroup.OFF.value
+
+    def drained_mask(self):
+        """
+        return the boolean array that marks the drained nodes
+        """
+        return self.node_groups() == NodeGroup.DRAINED.value
+
+    def good_for_newjobs_mask(self):
+        """
+        return the boolean array that marks the nodes which accept new jobs
+        """
+        return self.node_groups() == NodeGroup.GOOD.value
+
+    def add_job_usage(self, job_table):
+        """
+        update the node usage data with the running jobs in the job table
+
+        for each running job the gpus/cpus are evenly distributed over its compute nodes, and
+        each node on the job gets one more job in njobs
+        """
+        host_rows = self.host_rows()
+        rows = []
+        gpus = []
+        cpus = []
+        running = job_table.general_state != JOB_STATE_PD_CODE
+        for pos in np.flatnonzero(running):
+            nodes = job_table.node_codes[pos]
+            nnodes = len(nodes)
+            if nnodes == 0:
+                continue
+            ngpus_per_node = int(job_table.gpu[pos] / nnodes)
+            ncpus_per_node = int(job_table.cpu[pos] / nnodes)
+            for code in dict.fromkeys(nodes):
+                row = host_rows[code] if code < len(host_rows) else -1
+                if row >= 0:
+                    rows.append(row)
+                    gpus.append(ngpus_per_node)
+                    cpus.append(ncpus_per_node)
+
+        # now accumulate the data, the same node could appear on many jobs
+        rows = np.asarray(rows, dtype=np.int64)
+        n = len(self)
+        self.njobs += self._spread_to_rows(np.bincount(rows, minlength=n))
+        self.gpus_used += self._spread_to_rows(np.bincount(rows, weights=gpus, minlength=n).astype(np.int64))
+        self.cpus_used += self._spread_to_rows(np.bincount(rows, weights=cpus, minlength=n).astype(np.int64))
+
+    def count_jobs(self, job_table):
+        """
+        set the njobs column by counting the jobs (in any state) landing on each node
+        """
+        host_rows = self.host_rows()
+        codes = np.fromiter((x for nodes in job_table.node_codes for x in dict.fromkeys(nodes)), dtype=np.int64)
+        rows = host_rows[codes[codes < len(host_rows)]]
+        counts = np.bincount(rows[rows >= 0], minlength=len(self)).astype(np.int64)
+        self.njobs = self._spread_to_rows(counts)
+
+    def to_nodes(self, node_class):
+        """
+        build the list of Node objects from the table
+        """
+        names = self.names
+        gpu_types = self.gpu_types
+        statuses = self.statuses
+        return [node_class(names[i], gpu_types[i], statuses[i], int(self.ngpus[i]),
+                           int(self.gpus_used[i]), int(self.ncpus[i]), int(self.cpus_used[i]), int(self.mem[i]),
+                           int(self.mem_used[i]), int(self.njobs[i]), True)
+                for i in range(len(self))]
+
+
+class JobTable:
+    """
+    columnar storage for the jobs, every column has one entry per job
+
+    the general state, state and account are stored as int32 codes of the STATES/ACCOUNTS string
+    tables, and the compute nodes of each job is a tuple of codes in HOSTS. The cpu/gpu/mem request
+    and the submit/start time (epoch seconds, MISSING_TIME if not available) are numpy int64 arrays.
+    The other data are kept in python lists as they are, so that the Job objects built from the
+    table are same with the ones built from the records
+
+    partition_bits is the bitmask of the partitions the job is submitted to (see PARTITIONS), and
+    gpu_type_codes is the requested gpu type in GPU_TYPES ("none" if the job takes any type, or the
+    type is not known like for the LSF jobs)
+
+    array_counts is the number of jobs in each row, it's more than 1 for the grouped pending
+    array elements (see util/jobarrays.py), and array_indices is their index ranges (None for
+    the other jobs); the job counts are the sum of array_counts, not the number of rows
+
+    reference_ts is the epoch seconds when the job records were parsed (the pending/used/remaining
+    times are counted from it), None if it's not known; the records in the data file could be
+    older than the refresh
+    """
+
+    def __init__(self, jobids, job_names, states, general_states, accounts, cpu, gpu, mem,
+                 submit_ts, start_ts, pending_time, job_remaining_time, used_time, compute_nodes,
+                 partitions=None, array_counts=None, array_indices=None, reference_ts=None, gpu_types=None):
+        self.jobids = list(jobids)
+        self.job_names = list(job_names)
+        self.state_codes = _code_column(STATES, states)
+        self.general_state = np.asarray(general_states, dtype=np.int32)
+        self.account_codes = _code_column(ACCOUNTS, accounts)
+        self.cpu = np.asarray(cpu, dtype=np.int64)
+        self.gpu = np.asarray(gpu, dtype=np.int64)
+        self.mem = np.asarray(mem, dtype=np.int64)
+        self.submit_ts = np.asarray(submit_ts, dtype=np.int64)
+        self.start_ts = np.asarray(start_ts, dtype=np.int64)
+        self.pending_time = list(pending_time)
+        self.job_remaining_time = list(job_remaining_time)
+        self.used_time = list(used_time)
+        self.node_codes = [HOSTS.encode_many(nodes) for nodes in compute_nodes]
+        self.partition_bits = _partition_column(partitions, len(self.jobids))
+        if array_counts is None:
+            self.array_counts = np.ones(len(self.jobids), dtype=np.int64)
+        else:
+            self.array_counts = np.asarray(array_counts, dtype=np.int64)
+        self.array_indices = [None] * len(self.jobids) if array_indices is None else list(array_indices)
+        self.reference_ts = reference_ts
+        self.gpu_type_codes = _code_column(GPU_TYPES, ["none"] * len(self.jobids) if gpu_types is None else gpu_types)
+
+    @classmethod
+    def from_records(cls, records):
+        """
+        build the table from the job records, each record is a dict like what the
+        lsf_jobs.set_job_info or slurm_jobs.set_job_info returns
+        """
+        return cls([x['jobid'] for x in records],
+                   [x['job_name'] for x in records],
+                   [x['state'] for x in records],
+                   [JOB_GENERAL_STATE_CODES[x['general_state']] for x in records],
+                   [x['account_name'] for x in records],
+                   _int_column(x['cpu_used'] for x in records),
+                   _int_column(x['gpu_used'] for x in records),
+                   _int_column(x['memory_used'] for x in records),
+                   _int_column(_time_to_epoch(x['submit_time']) for x in records),
+                   _int_column(_time_to_epoch(x['start_time']) for x in records),
+                   [x['pending_time'] for x in records],
+                   [x['job_remaining_time'] for x in records],
+                   [x['used_time'] for x in records],
+                   [_split_nodes(x['compute_nodes']) for x in records],
+                   [x.get('partitions', ()) for x in records],
+                   _int_column(x.get('array_count', 1) for x in records),
+                   [x.get('array_indices') for x in records],
+                   records[0].get('reference_time') if records else None,
+                   [x.get('gpu_type', "none") for x in records])
+
+    @classmethod
+    def from_jobs(cls, jobs):
+        """build the table from the list of Cluster.Job objects"""
+        return cls([x.jobid for x in jobs], [x.job_name for x in jobs], [x.state for x in jobs],
+                   [JOB_GENERAL_STATE_CODES[x.general_state] for x in jobs], [x.account_name for x in jobs],
+                   _int_column(x.cpu_used for x in jobs), _int_column(x.gpu_used for x in jobs),
+                   _int_column(x.memory_used for x in jobs), _int_column(_time_to_epoch(x.submit_timestamp) for x in jobs),
+                   _int_column(_time_to_epoch(x.start_timestamp) for x in jobs),
+                   [x.pending_time for x in jobs], [x.job_remaining_time for x in jobs],
+                   [x.used_time for x in jobs], [x.compute_nodes for x in jobs], None,
+                   _int_column(x.array_count for x in jobs), [x.array_indices for x in jobs])
+
+    @classmethod
+    def coerce(cls, jobs):
+        """return the input as a JobTable, the input is either a table or a list of Job"""
+        if isinstance(jobs, cls):
+            return jobs
+        return cls.from_jobs(jobs)
+
+    def __len__(self):
+        return len(self.jobids)
+
+    @property
+    def states(self):
+        return STATES.decode_many(self.state_codes)
+
+    def partition_mask(self, partition):
+        """return the boolean array that marks the jobs submitted to the given partition"""
+        return _partition_mask(self.partition_bits, partition)
+
+    def take(self, rows):
+        """return the new table for the given rows (positions or boolean mask)"""
+        return _take_rows(self, rows)
+
+    @property
+    def accounts(self):
+        return ACCOUNTS.decode_many(self.account_codes)
+
+    @property
+    def gpu_types(self):
+        return GPU_TYPES.decode_many(self.gpu_type_codes)
+
+    @property
+    def compute_nodes(self):
+        return [tuple(HOSTS.decode_many(x)) for x in self.node_codes]
+
+    def job_count(self, rows=None):
+        """the number of jobs (counting each element of the grouped arrays) in the rows, all by default"""
+        counts = self.array_counts if rows is None else self.array_counts[rows]
+        return int(counts.sum())
+
+    def general_state_str(self, pos):
+        """return the general state string (JOB_STATUS_PD etc.) for the given row"""
+        return STATES.decode(self.general_state[pos])
+
+    def to_jobs(self, job_class):
+        """
+        build the list of Job objects from the table
+        """
+        result = []
+        states = self.states
+        accounts = self.accounts
+        compute_nodes = self.compute_nodes
+        for i in range(len(self)):
+            start = int(self.start_ts[i])
+            result.append(job_class(self.jobids[i], self.job_names[i], int(self.submit_ts[i]), states[i],
+                                    self.general_state_str(i), self.pending_time[i],
+                                    self.job_remaining_time[i], None if start == MISSING_TIME else start,
+                                    self.used_time[i], int(self.cpu[i]), int(self.gpu[i]), int(self.mem[i]),
+                                    compute_nodes[i], accounts[i], int(self.array_counts[i]),
+                                    self.array_indices[i]))
+        return result
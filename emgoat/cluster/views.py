@@ -0,0 +1,116 @@
+"""
+Small precomputed views published next to the json result
+
+the web page mostly asks the same few questions (how many A100 are free, what is my lab using,
+which nodes are drained), with the views it does not need to download and scan the whole node
+and job lists. Each view is a small json file next to the result, for example
+emgoat_slurm_results_view_gpu_types.json:
+
+gpu_types      - for each gpu type the nodes, total/used gpus (nodes not off), the free gpus and the
+                 free slots for 1, 2, 4, 6, 8 gpus on the nodes which accept new jobs
+accounts       - for each account with jobs the running/pending jobs, used gpus/cpus and nodes
+node_groups    - the good/drained/off nodes (see states.py)
+pending_jobs   - the top-N longest pending jobs
+
+the views are computed from the same tables as the result, they are written when json_views is
+true in the lsf/slurm section of the config; view_top_pending_jobs is the N for pending_jobs
+"""
+import os
+import numpy as np
+from emgoat.util import NodeGroup, write_json_stream
+from .tables import NodeTable, JobTable, JOB_STATE_PD_CODE
+
+#
+# the view names
+#
+VIEW_NAMES = ("gpu_types", "accounts", "node_groups", "pending_jobs")
+
+#
+# the default number of jobs in the pending_jobs view
+#
+DEFAULT_TOP_PENDING_JOBS = 20
+
+#
+# the gpu numbers for counting the free slots, same as the gpus overview in the summary
+#
+GPU_SLOT_SIZES = (1, 2, 4, 6, 8)
+
+
+def view_file_name(json_result, name):
+    """the view file name for the json result, like /data/results_view_gpu_types.json"""
+    return os.path.splitext(json_result)[0] + "_view_" + name + ".json"
+
+
+def gpu_types_view(nodes):
+    """the gpu capacity and free slots for each gpu type, the input is NodeTable or list of Node"""
+    nodes = NodeTable.coerce(nodes)
+    has_gpus = nodes.ngpus > 0
+    on = ~nodes.off_mask()
+    free = np.where(nodes.good_for_newjobs_mask() & has_gpus, np.maximum(nodes.free_gpus(), 0), 0)
+    result = {}
+    for code in np.unique(nodes.gpu_type_codes[has_gpus]).tolist():
+        rows = (nodes.gpu_type_codes == code) & has_gpus
+        free_rows = free[rows]
+        result[nodes.gpu_types[int(np.argmax(rows))]] = {
+            "n_nodes": int(np.count_nonzero(rows)),
+            "total_gpus": int(nodes.ngpus[rows & on].sum()),
+            "used_gpus": int(nodes.gpus_used[rows & on].sum()),
+            "free_gpus": int(free_rows.sum()),
+            "free_slots": {str(n): int((free_rows // n).sum()) for n in GPU_SLOT_SIZES},
+        }
+    return result
+
+
+def accounts_view(accounts):
+    """the usage for each account with jobs"""
+    return {x.account_name: {"n_running_jobs": x.n_running_jobs, "n_pending_jobs": x.n_pending_jobs,
+                             "n_gpus_used": x.ngpus, "n_cpus_used": x.ncpus, "compute_nodes": x.nodes_list}
+            for x in accounts if x.has_any_jobs()}
+
+
+def node_groups_view(nodes):
+    """the nodes in each group of good, drained and off"""
+    nodes = NodeTable.coerce(nodes)
+    groups = nodes.node_groups()
+    names = nodes.names
+    result = {}
+    for group in NodeGroup:
+        rows = np.flatnonzero(groups == group.value).tolist()
+        result[group.name.lower()] = {"n_nodes": len(rows), "nodes": [names[i] for i in rows]}
+    return result
+
+
+def pending_jobs_view(jobs, job_class, top_n=DEFAULT_TOP_PENDING_JOBS):
+    """
+    the top_n longest pending jobs, the input is JobTable or list of Job; job_class is the
+    Cluster.Job for transforming the rows into the job records
+    """
+    jobs = JobTable.coerce(jobs)
+    rows = np.flatnonzero(jobs.general_state == JOB_STATE_PD_CODE)
+    pending_time = np.array([float(jobs.pending_time[i]) for i in rows.tolist()], dtype=np.float64)
+    top = rows[np.argsort(-pending_time, kind="stable")[:top_n]]
+    return {"n_pending_jobs": jobs.job_count(rows), "jobs": [x.to_dict() for x in jobs.take(top).to_jobs(job_class)]}
+
+
+def compute_views(nodes, jobs, accounts, job_class, top_pending=DEFAULT_TOP_PENDING_JOBS):
+    """
+    compute all of views, return the dict of view name to the view data
+    """
+    return {"gpu_types": gpu_types_view(nodes),
+            "accounts": accounts_view(accounts),
+            "node_groups": node_groups_view(nodes),
+            "pending_jobs": pending_jobs_view(jobs, job_class, top_pending)}
+
+
+def write_views(json_result, views):
+    """
+    write each view into its file next to the json result (see view_file_name)
+
+    :return: the list of written file names
+    """
+    files = []
+    for name, view in views.items():
+        file_name = view_file_name(json_result, name)
+        write_json_stream(file_name, list(view.items()))
+        files.append(file_name)
+    return files
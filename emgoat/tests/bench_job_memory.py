@@ -0,0 +1,84 @@
+#
+# memory benchmark for the Cluster.Job record, it compares the bytes per job of the
+# slotted record with the plain class (per-instance dict and datetime data members)
+# that we used before
+#
+# run it like: python -m emgoat.tests.bench_job_memory --njobs 50000
+#
+import argparse
+import gc
+import tracemalloc
+from datetime import datetime, timedelta
+
+from emgoat.util import JOB_STATUS_PD, JOB_STATUS_RUN
+from emgoat.cluster import Cluster
+
+
+class PlainJob:
+    """
+    the job record before the slotted one, it only stores the data members
+    """
+
+    def __init__(self, jobid, job_name, submit_time, state, general_state, pending_time,
+                 job_remaining_time, start_time, used_time, cpu_used, gpu_used, memory_used,
+                 compute_nodes, account_name):
+        self.jobid = jobid
+        self.job_name = job_name
+        self.submit_time = submit_time
+        self.state = state
+        self.general_state = general_state
+        self.pending_time = pending_time
+        self.job_remaining_time = job_remaining_time
+        self.start_time = start_time
+        self.used_time = used_time
+        self.cpu_used = cpu_used
+        self.gpu_used = gpu_used
+        self.memory_used = memory_used
+        self.compute_nodes = compute_nodes
+        self.account_name = account_name
+
+
+def make_jobs(job_class, njobs):
+    """
+    make the job list like what we get from the scheduler: most of jobs are pending array
+    elements, the strings are rebuilt for every record as the json parser does
+    """
+    now = datetime.now().replace(microsecond=0)
+    jobs = []
+    for i in range(njobs):
+        running = i % 10 == 0
+        submit = now - timedelta(minutes=i % 600)
+        start = now if running else None
+        nodes = ["nodegpu" + str(i % 200)] if running else []
+        state = "RUN" if running else "PEND"
+        general_state = JOB_STATUS_RUN if running else JOB_STATUS_PD
+        jobs.append(job_class(str(100000 + i), "cryosparc_P1_J" + str(i % 50), submit, "".join(state),
+                              "".join(general_state), i % 600, 120, start, 0, 8, 1, 64, nodes,
+                              "account" + str(i % 300)))
+    return jobs
+
+
+def bytes_per_job(job_class, njobs):
+    """
+    return the traced memory per job for the given job class
+    """
+    gc.collect()
+    tracemalloc.start()
+    jobs = make_jobs(job_class, njobs)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del jobs
+    return size / njobs
+
+
+if __name__ == '__main__':
+    p = argparse.ArgumentParser()
+    p.add_argument('--njobs', type=int, default=50000)
+    args = p.parse_args()
+
+    before = bytes_per_job(PlainJob, args.njobs)
+    after = bytes_per_job(Cluster.Job, args.njobs)
+    print("number of jobs: {}".format(args.njobs))
+    print("plain job record: {:.1f} bytes per job".format(before))
+    print("slotted job record: {:.1f} bytes per job".format(after))
+    print("ratio: {:.2f}".format(after / before))
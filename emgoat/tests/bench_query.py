@@ -0,0 +1,80 @@
+#
+# benchmark for the indexed job queries
+#
+# the old way filters get_jobs_info() with a list comprehension on every call, the new way is
+# Cluster.query_jobs on the indexes built once for the snapshot
+#
+# run it like: python -m emgoat.tests.bench_query --njobs 200000 --nqueries 1000
+#
+import argparse
+import random
+import time
+
+from emgoat.util import JOB_STATUS_PD, JOB_STATUS_RUN
+from emgoat.cluster import Cluster
+from emgoat.cluster.tables import JobTable, NodeTable
+
+
+class _BenchCluster(Cluster):
+    _name = "bench"
+
+    def __init__(self, job_table):
+        self.job_table = job_table
+        self.jobs = job_table.to_jobs(self.Job)
+
+    def get_nodes_info(self):
+        return []
+
+    def get_jobs_info(self):
+        return self.jobs
+
+    def get_accounts_info(self):
+        return []
+
+    def get_cluster_summary_info(self):
+        return None
+
+    def query_tables(self):
+        return NodeTable.coerce([]), self.job_table
+
+
+def make_jobs(njobs, naccounts=200, nnodes=500):
+    random.seed(0)
+    records = []
+    for i in range(njobs):
+        running = random.random() < 0.5
+        records.append({"jobid": str(i), "job_name": "job" + str(i), "submit_time": 1750000000 + i,
+                        "state": "RUN" if running else "PEND",
+                        "general_state": JOB_STATUS_RUN if running else JOB_STATUS_PD,
+                        "pending_time": 1, "job_remaining_time": 10, "start_time": None, "used_time": 0,
+                        "cpu_used": 8, "gpu_used": random.randint(0, 8), "memory_used": 64,
+                        "compute_nodes": "node{}".format(random.randrange(nnodes)) if running else " ",
+                        "account_name": "lab{}".format(random.randrange(naccounts))})
+    return JobTable.from_records(records)
+
+
+if __name__ == '__main__':
+    p = argparse.ArgumentParser()
+    p.add_argument('--njobs', type=int, default=200000)
+    p.add_argument('--nqueries', type=int, default=1000)
+    args = p.parse_args()
+
+    cluster = _BenchCluster(make_jobs(args.njobs))
+    accounts = ["lab{}".format(random.randrange(200)) for _ in range(args.nqueries)]
+
+    t0 = time.perf_counter()
+    for account in accounts:
+        [x for x in cluster.get_jobs_info() if x.account_name == account and x.gpu_used >= 4]
+    t1 = time.perf_counter()
+    print("list comprehension: {0:.1f} us per query".format((t1 - t0) / args.nqueries * 1e6))
+
+    t0 = time.perf_counter()
+    cluster.query_jobs()
+    t1 = time.perf_counter()
+    print("building the indexes: {0:.3f} seconds".format(t1 - t0))
+
+    t0 = time.perf_counter()
+    for account in accounts:
+        cluster.query_jobs(account=account, min_gpus=4)
+    t1 = time.perf_counter()
+    print("indexed query: {0:.1f} us per query".format((t1 - t0) / args.nqueries * 1e6))
@@ -0,0 +1,104 @@
+#
+# benchmark for the gres/tres/memory string parsing
+#
+# the old way parses the gres field of each sinfo line three times (gpu number, used gpu number
+# and gpu type) by splitting the string, the tres of each job with re.sub per field, and the
+# memory with regex plus find calls. The new way uses the precompiled parsers in
+# emgoat.util.resources, the result for each distinct string is memoized
+#
+# run it like: python -m emgoat.tests.bench_resource_parsing --nrecords 100000
+#
+import argparse
+import random
+import re
+import time
+
+from emgoat.util import parse_gres, gres_gpu_type, parse_tres, memory_in_mb
+
+
+def old_gpu_number(input):
+    if input.find("null") >= 0:
+        return 0
+    s0 = input.split("(")[0] if input.find("(") >= 0 else input
+    return int(s0.strip().split(":")[-1])
+
+
+def old_gpu_type(input):
+    if input.find("null") >= 0:
+        return "none"
+    s0 = input.split("(")[0] if input.find("(") >= 0 else input
+    return s0.strip().split(":")[-2]
+
+
+def old_tres(data):
+    gpus = ncpus = nnodes = mem = 0
+    for x in data.strip().lower().split(','):
+        value = x.split("=")[-1]
+        if x.find("gres") >= 0:
+            gpus = int(value)
+        elif x.find("cpu") >= 0:
+            ncpus = int(value)
+        elif x.find("node") >= 0:
+            nnodes = int(value)
+        elif x.find("mem") >= 0:
+            s = value.lower()
+            if s.find("g") >= 0:
+                mem = int(re.sub(r'\D', '', value))
+            elif s.find("m") >= 0:
+                mem = int(int(re.sub(r'\D', '', value))/1024)
+            elif s.find("t") >= 0:
+                mem = int(re.sub(r'\D', '', value))*1024
+    return nnodes, ncpus, mem, gpus
+
+
+def old_memory(data):
+    val = float(re.search(r'\d+(\.\d+)?', data).group())
+    if data.find("g") >= 0 or data.find("G") >= 0:
+        return int(val*1024)
+    elif data.find("M") >= 0 or data.find("m") >= 0:
+        return int(val)
+    return int(val * 1024 * 1024)
+
+
+def make_records(nrecords):
+    """
+    make the gres/gres used/tres/memory strings, the values repeat as on the real cluster
+    """
+    random.seed(0)
+    records = []
+    for i in range(nrecords):
+        gpu_type = random.choice(["a100", "h100", "rtxa6000"])
+        ngpus = random.choice([4, 8])
+        gres = "gpu:{0}:{1}(S:0-1)".format(gpu_type, ngpus)
+        used = "gpu:{0}:{1}(IDX:0-{1})".format(gpu_type, random.randint(0, ngpus))
+        tres = "cpu={0},mem={1}G,node=1,billing={0},gres/gpu={2}".format(
+            random.choice([4, 8, 16, 32]), random.choice([16, 32, 64, 128]), random.randint(0, 4))
+        mem = "{0}G".format(random.randint(100, 1000))
+        records.append((gres, used, tres, mem))
+    return records
+
+
+def old_parse(records):
+    return [(old_gpu_number(gres), old_gpu_number(used), old_gpu_type(gres), old_tres(tres), old_memory(mem))
+            for gres, used, tres, mem in records]
+
+
+def new_parse(records):
+    result = []
+    for gres, used, tres, mem in records:
+        g = parse_gres(gres)
+        result.append((g.gpus, parse_gres(used).gpus, gres_gpu_type(g), parse_tres(tres), memory_in_mb(mem)))
+    return result
+
+
+if __name__ == '__main__':
+    p = argparse.ArgumentParser()
+    p.add_argument('--nrecords', type=int, default=100000)
+    args = p.parse_args()
+
+    records = make_records(args.nrecords)
+    for name, func in [("per record parsing", old_parse), ("memoized parsing", new_parse)]:
+        t0 = time.perf_counter()
+        func(records)
+        t1 = time.perf_counter()
+        print("{0}: {1:.3f} seconds for {2} records".format(name, t1 - t0, args.nrecords))
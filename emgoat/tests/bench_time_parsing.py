@@ -0,0 +1,82 @@
+#
+# benchmark for the batch time parsing of the LSF job records
+#
+# the old way is the parsing before the TimeParser (copied below as baseline_lsf_time): the month
+# table is built and datetime.now() is called for every time string, the result is written as iso
+# string into the record and parsed again when forming the Job. The new way uses one TimeParser
+# for the whole refresh and carries the epoch seconds
+#
+# run it like: python -m emgoat.tests.bench_time_parsing --nrecords 100000
+#
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from emgoat.util import TimeParser
+
+
+def make_records(nrecords):
+    """
+    make the bjobs like time strings, jobs are submitted within the last two days in minutes
+    """
+    now = datetime.now()
+    random.seed(0)
+    records = []
+    for i in range(nrecords):
+        submit = now - timedelta(minutes=random.randint(0, 2880))
+        start = submit + timedelta(minutes=random.randint(0, 60))
+        start_str = start.strftime("%b %d %H:%M") if i % 3 == 0 else ""
+        records.append((submit.strftime("%b %d %H:%M"), start_str))
+    return records
+
+
+def baseline_lsf_time(data):
+    """the lsf time parsing before the TimeParser, kept here for the comparison"""
+    m = {'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6,
+         'jul': 7, 'aug': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12}
+    if not data.strip():
+        return None
+    fields = data.split()
+    if len(fields) != 3:
+        raise RuntimeError("Invalid input data for parsing, it should be exactly in the "
+                           "format like Jul 29 11:30, no year")
+    ori_month, ori_day, ori_time = fields
+    day = int(ori_day)
+    month = m[ori_month.lower()]
+    x = ori_time.split(":")
+    hour = int(x[0])
+    minute = int(x[1])
+    if datetime.now().month >= month:
+        return datetime(year=datetime.now().year, month=month, day=day, hour=hour, minute=minute)
+    return datetime(year=datetime.now().year - 1, month=month, day=day, hour=hour, minute=minute)
+
+
+def old_parse(records):
+    result = []
+    for submit_str, start_str in records:
+        submit = baseline_lsf_time(submit_str).isoformat()
+        start = baseline_lsf_time(start_str)
+        start = start.isoformat() if start is not None else None
+        submit_t = datetime.fromisoformat(submit)
+        start_t = datetime.fromisoformat(start) if start is not None else None
+        result.append((submit_t, start_t))
+    return result
+
+
+def new_parse(records):
+    parser = TimeParser()
+    return [(parser.lsf_epoch(submit_str), parser.lsf_epoch(start_str)) for submit_str, start_str in records]
+
+
+if __name__ == '__main__':
+    p = argparse.ArgumentParser()
+    p.add_argument('--nrecords', type=int, default=100000)
+    args = p.parse_args()
+
+    records = make_records(args.nrecords)
+    for name, func in [("per record parsing", old_parse), ("batch parsing", new_parse)]:
+        t0 = time.perf_counter()
+        func(records)
+        t1 = time.perf_counter()
+        print("{0}: {1:.3f} seconds for {2} records".format(name, t1 - t0, args.nrecords))
@@ -0,0 +1,116 @@
+#
+# the shared test data: the node/job records, the columnar tables built from them, the cluster object
+# over the tables and the history snapshots. Each fixture builds the data again for each test, so the
+# tests could change them freely; the make_* fixtures are for the tests which need more than one copy
+#
+import pytest
+from emgoat.util import JOB_STATUS_PD, JOB_STATUS_RUN, NOT_AVAILABLE
+from emgoat.cluster import Cluster
+from emgoat.cluster.tables import NodeTable, JobTable
+
+
+def _node_records():
+    return [
+        {"name": "gpu01", "gpu_type": "A100_80G", "status": "ok", "ngpus": 4, "ncpus": 64, "mem_in_gb": 512},
+        {"name": "gpu02", "gpu_type": "V100_32G", "status": "ok", "ngpus": 8, "ncpus": 32, "mem_in_gb": 256},
+        {"name": "gpu03", "gpu_type": "V100_16G", "status": "unavail", "ngpus": 2, "ncpus": 16, "mem_in_gb": -1},
+        {"name": "cpu01", "gpu_type": "none", "status": "closed", "ngpus": -1, "ncpus": 128, "mem_in_gb": 1024},
+    ]
+
+
+def _job_records():
+    return [
+        {"jobid": "1", "job_name": "a", "submit_time": "2025-07-29T11:30:00", "state": "RUN",
+         "general_state": JOB_STATUS_RUN, "pending_time": 2, "job_remaining_time": 30,
+         "start_time": "2025-07-29T11:32:00", "used_time": 10, "cpu_used": 16, "gpu_used": 2,
+         "memory_used": 64, "compute_nodes": "gpu01", "account_name": "labA"},
+        {"jobid": "2", "job_name": "b", "submit_time": "2025-07-29T11:30:00", "state": "RUN",
+         "general_state": JOB_STATUS_RUN, "pending_time": 2, "job_remaining_time": 30,
+         "start_time": "2025-07-29T11:32:00", "used_time": 10, "cpu_used": 16, "gpu_used": 4,
+         "memory_used": 64, "compute_nodes": "gpu01 gpu02", "account_name": "labB"},
+        {"jobid": "3", "job_name": "c", "submit_time": "2025-07-29T11:30:00", "state": "PEND",
+         "general_state": JOB_STATUS_PD, "pending_time": 20, "job_remaining_time": 1000000000,
+         "start_time": NOT_AVAILABLE, "used_time": 0, "cpu_used": 8, "gpu_used": 1,
+         "memory_used": 32, "compute_nodes": " ", "account_name": "labA"},
+    ]
+
+
+def _tables():
+    nodes = NodeTable.from_records(_node_records())
+    jobs = JobTable.from_records(_job_records())
+    nodes.add_job_usage(jobs)
+    return nodes, jobs
+
+
+class _TableCluster(Cluster):
+    """the cluster built from the test tables"""
+    _name = "test"
+
+    def __init__(self, config=None):
+        self.node_table, self.job_table = _tables()
+        self.nodes = self.node_table.to_nodes(self.Node)
+        self.jobs = self.job_table.to_jobs(self.Job)
+        if config is not None:
+            self._config = config
+
+    def get_nodes_info(self):
+        return self.nodes
+
+    def get_jobs_info(self):
+        return self.jobs
+
+    def get_accounts_info(self):
+        return []
+
+    def get_cluster_summary_info(self):
+        return None
+
+
+def _snapshot(t, ngpus_used=2):
+    from emgoat.cluster.history import HistorySnapshot
+    nodes, jobs = _tables()
+    account = Cluster.Account("labA")
+    account.update_values(16, ngpus_used, "running", "gpu01")
+    summary = Cluster.Summary(nodes, jobs).to_dict()
+    return HistorySnapshot(t, "lsf", "cryoem", summary, nodes, jobs, [account, Cluster.Account("labC")])
+
+
+@pytest.fixture
+def node_records():
+    """the records of gpu01 (A100), gpu02 (V100_32G), gpu03 (unavail) and cpu01 (closed)"""
+    return _node_records()
+
+
+@pytest.fixture
+def job_records():
+    """job 1 runs on gpu01, job 2 on gpu01 and gpu02, job 3 is pending"""
+    return _job_records()
+
+
+@pytest.fixture
+def tables():
+    """the (NodeTable, JobTable) with the usage of the jobs added to the nodes"""
+    return _tables()
+
+
+@pytest.fixture
+def make_tables():
+    return _tables
+
+
+@pytest.fixture
+def table_cluster():
+    """the Cluster object over the test tables, it has no accounts and no summary"""
+    return _TableCluster()
+
+
+@pytest.fixture
+def make_table_cluster():
+    """make_table_cluster(config=None) gives a new cluster over the test tables"""
+    return _TableCluster
+
+
+@pytest.fixture
+def make_snapshot():
+    """make_snapshot(t, ngpus_used=2) gives the HistorySnapshot at time t, labA uses ngpus_used gpus"""
+    return _snapshot
@@ -0,0 +1,47 @@
+#
+# this is to test the availability index and the quick check
+#
+import json
+from emgoat.check import lookup_availability, read_availability_index, main
+from emgoat.cluster.availability import compute_availability_index, write_availability_index
+from emgoat.cluster.slots import SlotShape, compute_slots
+
+
+def test_availability_index(tables):
+    nodes, jobs = tables
+    index = compute_availability_index(nodes, jobs)
+    assert index["gpus"][-1] == int(nodes.ngpus.max())
+    assert index["cpus"][-1] >= int(nodes.ncpus.max())
+
+    # the lookup on the bucket is same as the slots of the bucket shape
+    for gpus, cpus, mem in [(1, 8, 32), (2, 16, 64), (0, 4, 16)]:
+        slots = compute_slots(nodes, [SlotShape(gpus, cpus, mem, None)])
+        assert lookup_availability(index, gpus, cpus, mem)["available_slots"] == int(slots.totals[0])
+        for gpu_type, values in slots.by_gpu_type.items():
+            if gpu_type != "none":
+                result = lookup_availability(index, gpus, cpus, mem, gpu_type.lower())
+                assert result["available_slots"] == int(values[0])
+
+    # the request is rounded up to the bucket, the too big request has no slots
+    assert lookup_availability(index, 1, 5, 20)["cpus_bucket"] == 8
+    assert lookup_availability(index, 1, 5, 20)["mem_in_gb_bucket"] == 32
+    assert lookup_availability(index, 100, 1, 1)["available_slots"] == 0
+    assert lookup_availability(index, 1, 8, 32, "no_such_gpu")["available_slots"] == 0
+
+    # the pending job is counted in the bucket of its request
+    pending = sum(lookup_availability(index, int(jobs.gpu[i]), int(jobs.cpu[i]), int(jobs.mem[i]))["pending_jobs"]
+                  for i in range(len(jobs)) if jobs.general_state_str(i) == "pending/suspending")
+    assert pending == 1
+
+
+def test_check_command(tmp_path, capsys, tables):
+    nodes, jobs = tables
+    file_name = write_availability_index(str(tmp_path / "results.json"), nodes, jobs)
+    assert file_name.endswith("results_availability.json")
+    assert read_availability_index(file_name)["version"] == 1
+
+    code = main(["--gpus", "1", "--cpus", "8", "--mem", "32", "--index", file_name, "--json"])
+    result = json.loads(capsys.readouterr().out)
+    assert code == (0 if result["available_slots"] > 0 else 1)
+    assert main(["--gpus", "100", "--index", file_name]) == 1
+    assert main(["--index", str(tmp_path / "missing.json")]) == 2
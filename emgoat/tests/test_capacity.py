@@ -0,0 +1,211 @@
+#
+# this is to test the future capacity timeline
+#
+import configparser
+import numpy as np
+import pytest
+from emgoat.util import JOB_STATUS_PD, JOB_STATUS_RUN, NOT_AVAILABLE, VERY_BIG_NUMBER
+from emgoat.cluster.tables import NodeTable, JobTable
+from emgoat.cluster.slots import SlotShape
+from emgoat.cluster import Cluster
+from emgoat.cluster.capacity import SnapshotWindows, DEFAULT_SNAPSHOT_WINDOWS, load_snapshot_windows, \
+    compute_capacity_timeline, count_competing_jobs, estimate_start
+
+NOW = 1750000000 // 60 * 60
+
+
+def _job(jobid, state, remaining, gpus, cpus, mem, nodes):
+    return {"jobid": jobid, "job_name": jobid, "submit_time": NOT_AVAILABLE, "state": "RUN",
+            "general_state": state, "pending_time": 0, "job_remaining_time": remaining,
+            "start_time": NOT_AVAILABLE, "used_time": 0, "cpu_used": cpus, "gpu_used": gpus,
+            "memory_used": mem, "compute_nodes": nodes, "account_name": "labA"}
+
+
+def _reference(nodes, jobs, windows):
+    """the windows done by rescanning all of jobs for each window, like the old snapshots"""
+    free = [nodes.free_gpus().copy(), nodes.free_cpus().copy(), nodes.free_mem().copy()]
+    result = []
+    for w in range(windows.count):
+        end = NOW + (w + 1) * windows.interval * 60
+        begin = NOW + w * windows.interval * 60
+        for pos in range(len(jobs)):
+            remaining = jobs.job_remaining_time[pos]
+            if jobs.general_state_str(pos) == JOB_STATUS_PD or remaining >= VERY_BIG_NUMBER:
+                continue
+            job_end = NOW + max(remaining, 0) * 60
+            if not (begin <= job_end < end or (w == 0 and job_end < begin)):
+                continue
+            names = jobs.compute_nodes[pos]
+            for name in names:
+                row = nodes.index()[name.lower()]
+                for i, v in enumerate((jobs.gpu[pos], jobs.cpu[pos], jobs.mem[pos])):
+                    free[i][row] += int(v / len(names))
+        result.append([np.minimum(free[0], nodes.ngpus), np.minimum(free[1], nodes.ncpus),
+                       np.minimum(free[2], nodes.mem)])
+    return result
+
+
+def test_load_snapshot_windows():
+    config = configparser.ConfigParser()
+    assert load_snapshot_windows(config) == DEFAULT_SNAPSHOT_WINDOWS
+    config.read_string("[snapshots]\njob_snapshots_time_interval = 15\nnumber_job_snapshots = 8\n")
+    assert load_snapshot_windows(config) == SnapshotWindows(15, 8)
+    config.read_string("[snapshots]\nnumber_job_snapshots = 0\n")
+    with pytest.raises(RuntimeError):
+        load_snapshot_windows(config)
+
+
+def test_timeline_releases_running_jobs(tables):
+    nodes, jobs = tables
+    nodes.mem_used[:] = [200, 100, 0, 0]
+    timeline = compute_capacity_timeline(nodes, jobs, SnapshotWindows(15, 4), NOW)
+    assert len(timeline) == 4
+    assert list(timeline.starts) == [NOW + x * 900 for x in range(4)]
+
+    # both running jobs end in 30 minutes, so in the window 2; the pending job is not counted
+    assert [list(x) for x in timeline.free_gpus[:, :2]] == [[0, 6], [0, 6], [4, 8], [4, 8]]
+    assert [list(x) for x in timeline.free_cpus[:, :2]] == [[40, 24], [40, 24], [64, 32], [64, 32]]
+    assert list(timeline.free_mem[3][:2]) == [312 + 96, 156 + 32]
+    assert list(timeline.njobs[3]) == [0, 0, 0, 0]
+
+    # the window table has the projected usage
+    window = timeline.window_nodes(2)
+    assert list(window.gpus_used[:2]) == [0, 0]
+    assert list(nodes.gpus_used[:2]) == [4, 2]
+    slots = timeline.slots([SlotShape(4, 16, 64, None)])
+    assert list(slots[:, 0]) == [1, 1, 3, 3]
+    assert timeline.to_dict()[0]["start_time"] == NOW
+
+
+def test_timeline_same_as_rescan():
+    rng = np.random.default_rng(7)
+    names = ["n{:02d}".format(i) for i in range(20)]
+    nodes = NodeTable(names, ["A100"] * 20, ["ok"] * 20, ngpus=[8] * 20, ncpus=[64] * 20, mem=[512] * 20,
+                      gpus_used=[0] * 20, cpus_used=[0] * 20, mem_used=[0] * 20)
+    records = []
+    for i in range(200):
+        hosts = list(rng.choice(names, size=int(rng.integers(1, 3)), replace=False))
+        remaining = VERY_BIG_NUMBER if i % 17 == 0 else int(rng.integers(-30, 700))
+        state = JOB_STATUS_PD if i % 11 == 0 else JOB_STATUS_RUN
+        records.append(_job(str(i), state, remaining, 2 * len(hosts), 4 * len(hosts), 16 * len(hosts),
+                            hosts if state == JOB_STATUS_RUN else []))
+    jobs = JobTable.from_records(records)
+    nodes.add_job_usage(jobs)
+    nodes.mem_used[:] = nodes.mem // 2
+
+    windows = SnapshotWindows(30, 12)
+    timeline = compute_capacity_timeline(nodes, jobs, windows, NOW)
+    for w, (gpus, cpus, mem) in enumerate(_reference(nodes, jobs, windows)):
+        assert list(timeline.free_gpus[w]) == list(gpus)
+        assert list(timeline.free_cpus[w]) == list(cpus)
+        assert list(timeline.free_mem[w]) == list(mem)
+
+
+def test_timeline_from_reference_time():
+    # the records were parsed an hour ago, the job with 30 minutes left is already over
+    nodes = NodeTable(["n01"], ["A100"], ["ok"], ngpus=[8], ncpus=[64], mem=[512],
+                      gpus_used=[0], cpus_used=[0], mem_used=[0])
+    records = [dict(_job("1", JOB_STATUS_RUN, 30, 8, 8, 64, ["n01"]), reference_time=NOW - 3600)]
+    jobs = JobTable.from_records(records)
+    assert jobs.reference_ts == NOW - 3600
+    nodes.add_job_usage(jobs)
+    timeline = compute_capacity_timeline(nodes, jobs, SnapshotWindows(15, 4))
+    assert timeline.starts[0] == NOW - 3600
+    assert list(timeline.free_gpus[:, 0]) == [0, 0, 8, 8]
+    assert JobTable.from_records([]).reference_ts is None
+
+
+def test_timeline_open_jobs(tables):
+    # the job with 100 hours left ends after the timeline, but it has a time limit
+    nodes, jobs = tables
+    jobs.job_remaining_time[0] = 6000
+    timeline = compute_capacity_timeline(nodes, jobs, SnapshotWindows(15, 4), NOW)
+    assert timeline.n_open_jobs == 0
+    jobs.job_remaining_time[0] = VERY_BIG_NUMBER
+    assert compute_capacity_timeline(nodes, jobs, SnapshotWindows(15, 4), NOW).n_open_jobs == 1
+
+
+def test_cluster_timeline_cached_by_generation(table_cluster):
+    cluster = table_cluster
+    timeline = cluster.capacity_timeline()
+    assert cluster.capacity_timeline() is timeline
+    assert len(timeline) == DEFAULT_SNAPSHOT_WINDOWS.count
+    cluster.generation += 1
+    assert cluster.capacity_timeline() is not timeline
+    assert cluster.capacity_timeline(now=NOW).starts[0] == NOW
+
+
+def test_estimate_start(tables):
+    nodes, jobs = tables
+    timeline = compute_capacity_timeline(nodes, jobs, SnapshotWindows(15, 4), NOW)
+
+    # three 1-gpu slots are free on gpu02 (limited by the cpus), the pending 1-gpu job is ahead
+    shape = SlotShape(1, 8, 32, None)
+    assert count_competing_jobs(jobs, shape) == 1
+    assert count_competing_jobs(jobs, SlotShape(0, 8, 32, None)) == 0
+    assert count_competing_jobs(jobs, SlotShape(8, 4, 32, None)) == 0
+    estimate = estimate_start(timeline, jobs, shape)
+    assert (estimate.window, estimate.available_slots, estimate.competing_jobs) == (0, 3, 1)
+    assert estimate.confidence == "medium"
+
+    # the 8-gpu job has to wait for the running jobs on gpu02
+    estimate = estimate_start(timeline, jobs, SlotShape(8, 4, 32, None))
+    assert (estimate.window, estimate.start_time, estimate.available_slots) == (2, NOW + 1800, 1)
+    assert estimate.confidence == "medium"
+    assert estimate.to_dict()["window"] == 2
+
+    # with the pending job it's one slot for two jobs
+    estimate = estimate_start(timeline, jobs, SlotShape(8, 8, 32, None))
+    assert (estimate.window, estimate.available_slots, estimate.competing_jobs) == (None, 1, 1)
+    assert estimate.confidence == "low"
+
+    # no node has 16 gpus, and the A100 node never has 8 gpus
+    assert estimate_start(timeline, jobs, SlotShape(16, 8, 32, None)).confidence == "none"
+    estimate = estimate_start(timeline, jobs, SlotShape(8, 8, 32, "A100_80G"))
+    assert (estimate.window, estimate.start_time, estimate.confidence) == (None, None, "none")
+
+    # two gpus on gpu01 are taken by a job without time limit
+    jobs.job_remaining_time[0] = VERY_BIG_NUMBER
+    timeline = compute_capacity_timeline(nodes, jobs, SnapshotWindows(15, 4), NOW)
+    assert timeline.n_open_jobs == 1
+    estimate = estimate_start(timeline, jobs, SlotShape(4, 8, 32, "A100_80G"))
+    assert (estimate.window, estimate.confidence) == (None, "low")
+    estimate = estimate_start(timeline, jobs, SlotShape(8, 4, 32, None))
+    assert (estimate.window, estimate.confidence) == (2, "low")
+    assert "no time limit" in str(estimate)
+
+
+def test_competing_jobs_unconstrained_and_gpu_type(tables, table_cluster, job_records):
+    _, jobs = tables
+
+    # no cpus/memory in the shape means they are not limiting
+    assert count_competing_jobs(jobs, SlotShape(1, 0, 0, None)) == 1
+    assert count_competing_jobs(jobs, SlotShape(1, 8, 0, None)) == 1
+    assert count_competing_jobs(jobs, SlotShape(1, 0, 16, None)) == 0
+
+    # the pending job takes any gpu type, so it competes with all of the typed requests
+    assert count_competing_jobs(jobs, SlotShape(1, 8, 32, "A100_80G")) == 1
+    records = [dict(x, gpu_type="V100_32G") for x in job_records]
+    jobs = JobTable.from_records(records)
+    assert jobs.gpu_types[2] == "V100_32G"
+    assert count_competing_jobs(jobs, SlotShape(1, 8, 32, "A100_80G")) == 0
+    assert count_competing_jobs(jobs, SlotShape(1, 8, 32, "v100_32g")) == 1
+    assert count_competing_jobs(jobs, SlotShape(1, 8, 32, None)) == 1
+    assert count_competing_jobs(jobs.take([2]), SlotShape(1, 8, 32, "V100_32G")) == 1
+
+    # the requirements without memory
+    cluster = table_cluster
+    estimate = cluster.estimate_start(Cluster.JobRequirements(ngpus=1, ncpus=8))
+    assert estimate.competing_jobs == 1
+
+
+def test_cluster_estimate_start_cached(table_cluster):
+    cluster = table_cluster
+    requirements = Cluster.JobRequirements(ngpus=8, ncpus=4, total_memory=32)
+    estimate = cluster.estimate_start(requirements)
+
+    # the running jobs end in the first window of 60 minutes
+    assert (estimate.window, estimate.confidence) == (0, "high")
+    assert cluster.estimate_start(Cluster.JobRequirements(ngpus=8, ncpus=4, total_memory=32)) is estimate
+    cluster.generation += 1
+    assert cluster.estimate_start(requirements) is not estimate
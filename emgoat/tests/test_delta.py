@@ -0,0 +1,45 @@
+#
+# this is to test the delta of the json result against the previous snapshot
+#
+from emgoat.cluster.delta import DeltaTracker
+
+
+def _result(sequence, jobs, n_pending_jobs):
+    return {"sequence": sequence, "summary": {"n_pending_jobs": n_pending_jobs, "total_gpus_number": 8},
+            "nodes": [], "accounts": [], "jobs": jobs}
+
+
+def _job(jobid, state, pending_time=0):
+    return {"jobID": jobid, "state": state, "pending_time_in_minutes": pending_time}
+
+
+def test_delta():
+    previous = _result(3, [_job("1", "PEND"), _job("2", "RUN"), _job("3", "PEND")], 2)
+    tracker = DeltaTracker(previous, full_snapshot_every=10)
+    assert tracker.sequence == 4 and not tracker.full
+
+    # the records are passed through while writing the result
+    jobs = [_job("1", "RUN"), _job("3", "PEND", 5), _job("4", "PEND")]
+    assert list(tracker.track("jobs", iter(jobs))) == jobs
+    tracker.track_summary({"n_pending_jobs": 2, "total_gpus_number": 8})
+
+    delta = dict(tracker.delta_fields())
+    assert delta["base_sequence"] == 3
+    assert delta["summary"] == {}
+    assert delta["jobs"]["added"] == [_job("4", "PEND")]
+    assert delta["jobs"]["removed"] == ["2"]
+
+    # only the pending time is changed for job 3, it's not counted as change
+    assert delta["jobs"]["changed"] == [_job("1", "RUN")]
+
+
+def test_full_delta():
+    # no previous snapshot, or the full snapshot cadence
+    assert DeltaTracker(None).full
+    tracker = DeltaTracker(_result(9, [_job("1", "PEND")], 1), full_snapshot_every=10)
+    assert tracker.full
+    list(tracker.track("jobs", iter([_job("1", "PEND")])))
+    tracker.track_summary({"n_pending_jobs": 1})
+    delta = dict(tracker.delta_fields())
+    assert delta["jobs"]["added"] == [_job("1", "PEND")]
+    assert delta["summary"] == {"n_pending_jobs": 1}
@@ -0,0 +1,63 @@
+#
+# this is to test the columnar exports of the node/job/account tables
+#
+import csv
+import os
+import sys
+import pytest
+from emgoat.cluster import Cluster
+from emgoat.cluster.export import export_tables, job_columns
+
+
+def test_job_columns(tables):
+    nodes, jobs = tables
+    columns = {c.name: c for c in job_columns(jobs)}
+
+    # the pending job has no start time and no remaining time, they are null
+    assert columns["start_time"].mask.tolist() == [False, False, True]
+    assert columns["job_remaining_time_in_minutes"].mask.tolist() == [False, False, True]
+    assert columns["cpu_used"].values.tolist() == [16, 16, 8]
+
+    # the grouped pending array is one row with the number of its elements
+    jobs.array_counts[2] = 100
+    jobs.array_indices[2] = "1-100"
+    columns = {c.name: c for c in job_columns(jobs)}
+    assert columns["array_count"].values.tolist() == [1, 1, 100]
+    assert columns["array_indices"].mask.tolist() == [True, True, False]
+
+
+def test_export_csv(tmp_path, tables):
+    nodes, jobs = tables
+    accounts = [Cluster.Account("labA")]
+    accounts[0].update_values(16, 2, "running", "gpu01")
+    files = export_tables(str(tmp_path / "results"), "csv", nodes, jobs, accounts)
+    assert [x.rsplit("_", 1)[1] for x in files] == ["nodes.csv", "jobs.csv", "accounts.csv"]
+
+    with open(files[1]) as f:
+        rows = list(csv.DictReader(f))
+    assert rows[2]["start_time"] == ""
+    assert rows[0]["compute_nodes_list"] == "gpu01"
+    assert (rows[0]["array_count"], rows[0]["array_indices"]) == ("1", "")
+
+    with pytest.raises(RuntimeError):
+        export_tables(str(tmp_path / "results"), "xlsx", nodes, jobs, accounts)
+    assert sorted(os.listdir(tmp_path)) == ["results_accounts.csv", "results_jobs.csv", "results_nodes.csv"]
+
+
+def test_export_without_pyarrow(tmp_path, monkeypatch, tables):
+    # the missing pyarrow gives the error message, and no file is left
+    monkeypatch.setitem(sys.modules, "pyarrow", None)
+    monkeypatch.setitem(sys.modules, "pyarrow.parquet", None)
+    nodes, jobs = tables
+    for export_format in ("parquet", "arrow"):
+        with pytest.raises(RuntimeError, match="pyarrow is needed"):
+            export_tables(str(tmp_path / "results"), export_format, nodes, jobs, [])
+    assert os.listdir(tmp_path) == []
+
+
+def test_export_parquet(tmp_path, tables):
+    pq = pytest.importorskip("pyarrow.parquet")
+    nodes, jobs = tables
+    files = export_tables(str(tmp_path / "results"), "parquet", nodes, jobs, [])
+    table = pq.read_table(files[1])
+    assert table.column("start_time").null_count == 1
@@ -0,0 +1,74 @@
+#
+# this is to test the snapshot history database
+#
+import os
+import threading
+import pytest
+from emgoat.cluster import Cluster
+from emgoat.cluster.history import HistoryStore, HistoryWriter
+from emgoat.util import Config
+
+
+def test_history_store(tmp_path, make_snapshot):
+    store = HistoryStore(str(tmp_path / "history.db"))
+    store.add_snapshot(make_snapshot(1000, 2))
+    store.add_snapshot(make_snapshot(2000, 4))
+
+    assert [x[1] for x in store.snapshots()] == [1000, 2000]
+    assert "n_pending_jobs" in store.summary_fields()
+    assert store.summary_series("n_pending_jobs") == [(1000, 1.0), (2000, 1.0)]
+    assert store.summary_series("n_pending_jobs", cluster="slurm") == []
+    assert store.account_series("labA", start=1500) == [(2000, 4)]
+    assert store.account_series("labC") == []
+    assert [x[0] for x in store.node_series("gpu01", "njobs", scope="cryoem")] == [1000, 2000]
+    assert [x[1] for x in store.job_history("1")] == ["RUN", "RUN"]
+    with pytest.raises(RuntimeError):
+        store.account_series("labA", "jobid")
+    store.close()
+
+
+def test_history_writer(tmp_path, make_snapshot):
+    path = str(tmp_path / "history.db")
+    writer = HistoryWriter(path)
+    for t in range(5):
+        writer.submit(make_snapshot(t))
+    writer.flush()
+    assert writer.errors == 0
+    assert len(HistoryStore(path).snapshots()) == 5
+    writer.close()
+
+
+def test_history_writer_bad_path(tmp_path, make_snapshot):
+    path = str(tmp_path / "missing" / "history.db")
+    writer = HistoryWriter(path)
+    writer.submit(make_snapshot(1))
+    writer.submit(make_snapshot(2))
+
+    # the failed opening is counted, and flush does not wait for the dropped snapshots
+    flush = threading.Thread(target=writer.flush, daemon=True)
+    flush.start()
+    flush.join(10)
+    assert not flush.is_alive()
+    assert writer.errors == 1
+
+    # the next submit tries again
+    os.mkdir(str(tmp_path / "missing"))
+    writer.submit(make_snapshot(3))
+    writer.flush()
+    writer.close()
+    assert writer.errors == 1
+    assert [x[1] for x in HistoryStore(path).snapshots()] == [3]
+
+
+def test_record_history(tmp_path, table_cluster):
+    from emgoat.cluster.history import history_writer
+    path = str(tmp_path / "history.db")
+    cluster = table_cluster
+    cluster._config = Config({"history_db": path})
+    assert cluster.record_history("", Cluster.Summary(cluster.node_table, cluster.job_table), cluster.node_table,
+                                  cluster.job_table, [])
+    history_writer(path).close()
+    assert [x[2] for x in HistoryStore(path).snapshots()] == ["test"]
+
+    cluster._config = Config({})
+    assert not cluster.record_history("", None, None, None, [])
@@ -0,0 +1,47 @@
+#
+# this is to test the host list codec
+#
+import pytest
+from emgoat.util import expand_hostlist, compress_hostlist
+from emgoat.cluster.slurm.slurm_util import parse_slurm_host_names
+from emgoat.cluster.tables import JobTable
+
+
+def test_expand_hostlist():
+    assert expand_hostlist("gpu[01-03,07],cpu1") == ("gpu01", "gpu02", "gpu03", "gpu07", "cpu1")
+    assert expand_hostlist("x2,x-gpu05") == ("x2", "x-gpu05")
+    assert expand_hostlist("rack[1-2]-n[8-9]") == ("rack1-n8", "rack1-n9", "rack2-n8", "rack2-n9")
+    assert expand_hostlist("node[098-101] cpu1") == ("node098", "node099", "node100", "node101", "cpu1")
+    assert expand_hostlist("") == ()
+    with pytest.raises(RuntimeError):
+        expand_hostlist("gpu[05-01]")
+
+
+def test_compress_hostlist():
+    assert compress_hostlist([]) == ""
+    assert compress_hostlist(["gpu01", "gpu02", "gpu03", "gpu07", "cpu1", "gpu02"]) == "gpu[01-03,07],cpu1"
+    assert compress_hostlist(["login", "n9", "n10"]) == "login,n9,n10"
+
+    # the compressed expression expands back to the same hosts
+    hosts = expand_hostlist("gpu[01-16,20],x-gpu05,node[001-100]")
+    assert compress_hostlist(hosts) == "gpu[01-16,20],x-gpu05,node[001-100]"
+    assert expand_hostlist(compress_hostlist(hosts)) == hosts
+
+
+def test_slurm_host_names():
+    assert parse_slurm_host_names("gpu[01-02],x-gpu05") == "gpu01 gpu02 x-gpu05"
+    assert parse_slurm_host_names("gpu01") == "gpu01"
+
+
+def test_compressed_nodes_in_records():
+    """the job records with the host list expression, and the compressed job output"""
+    from emgoat.cluster import Cluster
+    record = {"jobid": "1", "job_name": "a", "submit_time": 1700000000, "state": "RUNNING",
+              "general_state": "running", "pending_time": 1, "job_remaining_time": 10, "start_time": 1700000060,
+              "used_time": 1, "cpu_used": 8, "gpu_used": 8, "memory_used": 64,
+              "compute_nodes": "gpu[01-04]", "account_name": "labA"}
+    jobs = JobTable.from_records([record])
+    assert list(jobs.compute_nodes[0]) == ["gpu01", "gpu02", "gpu03", "gpu04"]
+    job = jobs.to_jobs(Cluster.Job)[0]
+    assert job.to_dict()["compute_nodes_list"] == "gpu01 gpu02 gpu03 gpu04"
+    assert job.to_dict(compress_nodes=True)["compute_nodes_list"] == "gpu[01-04]"
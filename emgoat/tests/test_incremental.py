@@ -0,0 +1,56 @@
+#
+# this is to test the incremental regeneration of the json result
+#
+import json
+import os
+from emgoat.util import Config
+from emgoat.cluster import Cluster
+from emgoat.cluster.incremental import SectionState, node_table_digest, job_table_digest, state_file_name
+
+
+def _write(cluster, json_result):
+    summary = Cluster.Summary(cluster.node_table, cluster.job_table)
+    return cluster.write_json_results(json_result, cluster.nodes, cluster.jobs, [], summary,
+                                      tables=(cluster.node_table, cluster.job_table))
+
+
+def test_digests(make_tables):
+    nodes, jobs = make_tables()
+    nodes2, jobs2 = make_tables()
+    assert node_table_digest(nodes) == node_table_digest(nodes2)
+    assert job_table_digest(jobs) == job_table_digest(jobs2)
+    jobs2.gpu[0] += 1
+    assert job_table_digest(jobs) != job_table_digest(jobs2)
+
+
+def test_incremental_result(tmp_path, make_table_cluster):
+    json_result = str(tmp_path / "results.json")
+    config = Config({"json_incremental": "true"})
+    cluster = make_table_cluster(config)
+    assert _write(cluster, json_result)
+    with open(json_result) as f:
+        first = json.load(f)
+    mtime = os.stat(json_result).st_mtime_ns
+
+    # nothing is changed, the result is not written
+    assert not _write(make_table_cluster(config), json_result)
+    assert os.stat(json_result).st_mtime_ns == mtime
+
+    # the nodes are same, they are copied from the previous result
+    cluster = make_table_cluster(config)
+    cluster.job_table.gpu[0] += 1
+    cluster.jobs = cluster.job_table.to_jobs(Cluster.Job)
+    state = SectionState(json_result)
+    state.set_digest("nodes", node_table_digest(cluster.node_table))
+    assert state.previous_fragment("nodes") is not None
+    assert _write(cluster, json_result)
+    with open(json_result) as f:
+        second = json.load(f)
+    assert second["nodes"] == first["nodes"]
+    assert second["jobs"][0]["gpu_used"] == first["jobs"][0]["gpu_used"] + 1
+
+    # the result is changed by someone else, the state is not used
+    with open(json_result, "a") as f:
+        f.write(" ")
+    assert SectionState(json_result).previous == {}
+    assert os.path.exists(state_file_name(json_result))
@@ -0,0 +1,68 @@
+#
+# this is to test the grouping of the job array elements
+#
+import json
+from emgoat.util import group_array_jobs, expand_index_ranges, format_index_ranges, JOB_STATUS_PD
+from emgoat.cluster import Cluster
+from emgoat.cluster.tables import JobTable, NodeTable
+from emgoat.cluster.lsf.lsf_jobs import parse_bjobs_output_for_alljobs
+from emgoat.cluster.slurm.slurm_jobs import parse_squeue_output_for_alljobs
+
+TS = "Jan 10 10:00"
+
+
+def _bjobs_record(jobid, stat, job_name, host=""):
+    return dict(JOBID=jobid, STAT=stat, USER="labA", JOB_NAME=job_name, SUBMIT_TIME=TS,
+                START_TIME=TS if stat == "RUN" else "", PEND_TIME="600", RUN_TIME="0 second(s)",
+                TIME_LEFT="", NREQ_SLOT="4", MEMLIMIT="32 G", GPU_NUM="1", EXEC_HOST=host,
+                NEXEC_HOST="1" if host else "")
+
+
+def test_index_ranges():
+    assert expand_index_ranges("1-3,7") == [1, 2, 3, 7]
+    assert expand_index_ranges("1-9:4%2") == [1, 5, 9]
+    assert format_index_ranges([7, 3, 2, 1, 2]) == "1-3,7"
+
+
+def test_group_lsf_array(table_cluster):
+    records = [_bjobs_record("500", "RUN", "relion[1]", "4*gpu01")]
+    records += [_bjobs_record("500", "PEND", "relion[{}]".format(i)) for i in range(2, 101)]
+    records += [_bjobs_record("501", "PEND", "b"), _bjobs_record("502[3]", "PEND", "c[3]")]
+    jobs = parse_bjobs_output_for_alljobs(json.dumps({"RECORDS": records}))
+    assert jobs[0]["array_id"] == "500" and jobs[0]["array_index"] == 1
+
+    grouped = group_array_jobs(jobs)
+    assert [x["jobid"] for x in grouped] == ["500", "500[2-100]", "501", "502[3]"]
+    assert grouped[1]["array_count"] == 99
+    assert "array_count" not in grouped[0] and "array_count" not in grouped[2]
+
+    # the grouped array is counted as its elements
+    table = JobTable.from_records(grouped)
+    summary = Cluster.Summary(NodeTable.from_records([]), table)
+    assert summary.n_total_jobs == 102
+    assert summary.n_pending_jobs == 101
+    assert summary.n_running_jobs == 1
+    job = table.to_jobs(Cluster.Job)[1]
+    assert job.to_dict()["array_count"] == 99 and job.to_dict()["array_indices"] == "2-100"
+    assert JobTable.from_jobs(table.to_jobs(Cluster.Job)).job_count() == 102
+
+    # the account counts each pending element once, though they have no compute nodes
+    accounts = table_cluster.form_accounts_infor(table)
+    assert [(x.account_name, x.n_pending_jobs, x.n_running_jobs) for x in accounts] == [("labA", 101, 1)]
+
+
+def test_group_slurm_array():
+    base = dict(account="labA", user_name="u1", name="arr", submit_time=1700000000, time_limit=60,
+                tres_req_str="cpu=8,mem=64G,node=1,gres/gpu=1", job_resources={}, start_time=0, partition="gpu")
+    records = [
+        dict(base, job_state=["PENDING"], job_id=700, array_job_id={"set": True, "number": 700},
+             array_task_id={"set": False, "number": 0}, array_task_string="5-20%4"),
+        dict(base, job_state=["PENDING"], job_id=704, array_job_id={"set": True, "number": 700},
+             array_task_id={"set": True, "number": 4}),
+        dict(base, job_state=["PENDING"], job_id=800, array_job_id=0, array_task_id=4294967294),
+    ]
+    jobs = group_array_jobs(parse_squeue_output_for_alljobs(json.dumps({"jobs": records})))
+    assert len(jobs) == 2
+    assert jobs[0]["jobid"] == "700[4-20]" and jobs[0]["array_count"] == 17
+    assert jobs[0]["general_state"] == JOB_STATUS_PD
+    assert "array_id" not in jobs[1]
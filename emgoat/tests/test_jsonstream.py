@@ -0,0 +1,61 @@
+#
+# this is to test the streaming json writer
+#
+import json
+import os
+import pytest
+from emgoat.util import write_json_stream, write_ndjson, ndjson_file_name, RawJson
+
+
+def test_write_json_stream(tmp_path):
+    summary = {"total_jobs_number": 2, "name": "café"}
+    nodes = [{"node_name": "gpu01", "total_gpus": 4}, {"node_name": "gpu02", "total_gpus": 8}]
+    jobs = [{"jobid": "1"}, {"jobid": "2"}]
+    result = {"summary": summary, "nodes": nodes, "accounts": [], "jobs": jobs}
+
+    # the records are given as generators
+    fname = str(tmp_path / "results.json")
+    write_json_stream(fname, [("summary", summary), ("nodes", (x for x in nodes)),
+                              ("accounts", iter([])), ("jobs", (x for x in jobs))])
+    with open(fname) as f:
+        assert f.read() == json.dumps(result, separators=(",", ":"))
+
+
+def test_offsets_and_raw_json(tmp_path):
+    fname = str(tmp_path / "results.json")
+    offsets = {}
+    write_json_stream(fname, [("summary", {"a": 1}), ("nodes", iter([{"b": 2}]))], offsets)
+    with open(fname) as f:
+        text = f.read()
+    assert text[offsets["nodes"][0]:offsets["nodes"][1]] == '[{"b":2}]'
+
+    # the encoded text is written as it is
+    write_json_stream(fname, [("nodes", RawJson('[{"b":2}]')), ("name", "x")])
+    with open(fname) as f:
+        assert json.load(f) == {"nodes": [{"b": 2}], "name": "x"}
+    write_json_stream(fname, [])
+    with open(fname) as f:
+        assert f.read() == "{}"
+
+
+def test_write_ndjson(tmp_path):
+    jobs = [{"jobid": "1"}, {"jobid": "2"}]
+    fname = ndjson_file_name(str(tmp_path / "results.json"), "jobs")
+    assert fname.endswith("results_jobs.ndjson")
+    write_ndjson(fname, iter(jobs))
+    with open(fname) as f:
+        assert [json.loads(x) for x in f] == jobs
+
+
+def test_no_temporary_file_left(tmp_path):
+    fname = str(tmp_path / "results.json")
+
+    def broken_records():
+        yield {"jobid": "1"}
+        raise OSError("no space left on device")
+
+    with pytest.raises(OSError):
+        write_json_stream(fname, [("jobs", broken_records())])
+    with pytest.raises(RuntimeError):
+        write_ndjson(fname, [{"jobid": object()}])
+    assert os.listdir(str(tmp_path)) == []
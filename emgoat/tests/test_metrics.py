@@ -0,0 +1,58 @@
+#
+# this is to test the OpenMetrics exporter
+#
+from emgoat.cluster import Cluster
+from emgoat.cluster.metrics import iter_metrics
+from emgoat.cluster.slots import parse_slot_shapes
+from emgoat.util import Timings, TIMING_COMMAND
+
+
+def _samples(text):
+    """the samples of the metrics text, as dict of name with labels to value"""
+    result = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            result[name] = float(value)
+    return result
+
+
+def test_metrics(tables):
+    nodes, jobs = tables
+    summary = Cluster.Summary(nodes, jobs, parse_slot_shapes("1:8:64"))
+    account = Cluster.Account("labA")
+    account.update_values(16, 2, "running", "gpu01")
+    timings = Timings()
+    timings.record(TIMING_COMMAND, [("command", "squeue")], 0.5)
+    timings.record(TIMING_COMMAND, [("command", "squeue")], 1.5)
+
+    text = "".join(iter_metrics("test", [([("queue", "gpu")], summary, nodes, [account])], 3, timings))
+    assert text.endswith("# EOF\n")
+    samples = _samples(text)
+    assert samples['emgoat_snapshot_generation{cluster="test"}'] == 3
+    assert samples['emgoat_jobs{cluster="test",queue="gpu",state="pending"}'] == 1
+    assert samples['emgoat_gpu_slots{cluster="test",queue="gpu",gpus="1"}'] == summary.gpus_overview[1]
+    assert samples['emgoat_shape_slots{cluster="test",queue="gpu",ngpus="1",ncpus="8",mem_gb="64",'
+                   'gpu_type="any"}'] == summary.slots.totals[0]
+    assert samples['emgoat_account_gpus_used{cluster="test",queue="gpu",account="labA"}'] == 2
+    assert samples['emgoat_node_free_gpus{cluster="test",queue="gpu",node="gpu01",gpu_type="A100_80G"}'] == 0
+
+    # the status is only in its own family, the drained node keeps its resource series
+    assert samples['emgoat_node_status{cluster="test",queue="gpu",node="gpu03",status="unavail"}'] == 1
+    assert not [x for x in samples if "status=" in x and not x.startswith("emgoat_node_status{")]
+    assert samples['emgoat_command_duration_seconds_count{command="squeue"}'] == 2
+    assert samples['emgoat_command_duration_seconds_sum{command="squeue"}'] == 2.0
+    assert samples['emgoat_command_last_duration_seconds{command="squeue"}'] == 1.5
+
+    # each metric family is given once
+    families = [x.split()[2] for x in text.splitlines() if x.startswith("# TYPE")]
+    assert len(families) == len(set(families))
+
+
+def test_metrics_summary_only(tables):
+    nodes, jobs = tables
+    summary = Cluster.Summary(nodes, jobs)
+    text = "".join(iter_metrics("test", [([("partition", 'a"b')], summary, None, None)], timings=Timings()))
+    samples = _samples(text)
+    assert samples['emgoat_jobs{cluster="test",partition="a\\"b",state="running"}'] == 2
+    assert not any(x.startswith("emgoat_node_") for x in samples)
@@ -0,0 +1,45 @@
+#
+# this is to test the indexed queries on the cluster
+#
+from datetime import datetime
+
+
+def test_query_jobs(table_cluster):
+    cluster = table_cluster
+    assert [x.jobid for x in cluster.query_jobs(account="LABA")] == ["1", "3"]
+    assert [x.jobid for x in cluster.query_jobs(state="pending")] == ["3"]
+    assert [x.jobid for x in cluster.query_jobs(state="RUN", node="gpu02")] == ["2"]
+    assert [x.jobid for x in cluster.query_jobs(min_gpus=2)] == ["1", "2"]
+    assert len(cluster.query_jobs(account="labA", min_gpus=4)) == 0
+    assert len(cluster.query_jobs(account="nobody")) == 0
+    assert len(cluster.query_jobs()) == 3
+    assert len(cluster.query_jobs(submitted_after=datetime.fromisoformat("2025-07-29T11:00:00"))) == 3
+    assert len(cluster.query_jobs(submitted_after="2025-07-29T11:30:00")) == 0
+
+    # the gpu type of the compute nodes, and any of the values in the list
+    assert [x.jobid for x in cluster.query_jobs(gpu_type="A100_80G")] == ["1", "2"]
+    assert [x.jobid for x in cluster.query_jobs(gpu_type="v100_32g", account="labA")] == []
+    assert [x.jobid for x in cluster.query_jobs(account=["labB", "nobody"])] == ["2"]
+    assert [x.jobid for x in cluster.query_jobs(state=["PEND", "RUN"], node=["gpu02"])] == ["2"]
+
+    # the result is lazy, it supports the index and slice
+    result = cluster.query_jobs(account="labA")
+    assert result[1] is cluster.jobs[2]
+    assert [x.jobid for x in result[:1]] == ["1"]
+
+
+def test_query_nodes(table_cluster):
+    cluster = table_cluster
+    assert [x.name for x in cluster.query_nodes(gpu_type="v100_32g")] == ["gpu02"]
+    assert [x.name for x in cluster.query_nodes(status="off")] == ["gpu03"]
+    assert [x.name for x in cluster.query_nodes(status="ok", min_free_gpus=1)] == ["gpu02"]
+    assert [x.name for x in cluster.query_nodes(min_free_mem=1000)] == ["cpu01"]
+    assert [x.name for x in cluster.query_nodes(name=["GPU03", "cpu01"])] == ["gpu03", "cpu01"]
+
+
+def test_query_indexes_per_generation(table_cluster):
+    cluster = table_cluster
+    indexes = cluster._query_indexes()
+    assert cluster._query_indexes() is not None and cluster._query_indexes()[1] is indexes[1]
+    cluster.generation += 1
+    assert cluster._query_indexes()[1] is not indexes[1]
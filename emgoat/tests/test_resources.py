@@ -0,0 +1,47 @@
+#
+# this is to test the parsers for the gres/tres/memory strings
+#
+import pytest
+from emgoat.util import parse_gres, gres_gpu_type, parse_tres, memory_in_mb, memory_in_gb
+from emgoat.util import get_lsf_job_mem_infor_in_mb
+from emgoat.cluster.slurm.slurm_util import get_gpu_number_from_sinfo_output, get_gpu_type_from_sinfo_output
+from emgoat.cluster.slurm.slurm_util import parse_tres_data_from_json, get_gpu_type_from_tres
+
+
+def test_parse_gres():
+    assert parse_gres("(null)").gpus == 0
+    assert gres_gpu_type(parse_gres("(null)")) == "none"
+    assert get_gpu_number_from_sinfo_output("gpu:a100:4(S:0-1)") == 4
+    assert get_gpu_type_from_sinfo_output("gpu:a100:4(S:0-1)") == "a100"
+    assert get_gpu_number_from_sinfo_output("gpu:2(IDX:0,1") == 2
+
+    # several gres entries, the typed counts are kept
+    gres = parse_gres("gpu:a100:4(S:0),gpu:h100:2(S:1),shard:a100:16")
+    assert gres.gpus == 6
+    assert gres.by_type == (("a100", 4), ("h100", 2))
+    assert gres_gpu_type(gres) == "a100"
+
+    with pytest.raises(RuntimeError):
+        parse_gres("gpu")
+
+
+def test_parse_tres():
+    assert parse_tres_data_from_json("cpu=8,mem=64G,node=1,billing=8,gres/gpu=2") == (1, 8, 64, 2)
+    tres = parse_tres("cpu=16,mem=1.5T,node=2,gres/gpu:a100=2,gres/gpu:h100=1")
+    assert tres.mem_in_gb == 1536
+    assert tres.gpus == 3
+    assert tres.gpus_by_type == (("a100", 2), ("h100", 1))
+    assert get_gpu_type_from_tres("cpu=16,mem=1.5T,node=2,gres/gpu:a100=2,gres/gpu:h100=1") == "a100"
+    assert get_gpu_type_from_tres("cpu=8,mem=64G,node=1,billing=8,gres/gpu=2") == "none"
+
+    with pytest.raises(RuntimeError):
+        parse_tres("cpu=8,node=1")
+
+
+def test_memory():
+    assert memory_in_mb("2.9T") == int(2.9 * 1024 * 1024)
+    assert memory_in_mb("10 GB") == 10240
+    assert memory_in_gb("500M") == 0
+    assert get_lsf_job_mem_infor_in_mb(" ") == -1
+    with pytest.raises(RuntimeError):
+        memory_in_mb("100")
@@ -0,0 +1,67 @@
+#
+# this is to test the rollup tiers of the snapshot history
+#
+import pytest
+from emgoat.cluster.history import HistoryStore
+from emgoat.cluster.rollup import _ROLLUPS
+
+DAY = 86400
+BASE = 100 * DAY
+
+
+@pytest.fixture
+def store(tmp_path, make_snapshot):
+    """three days of snapshots every 30 minutes, labA uses i % 4 gpus"""
+    store = HistoryStore(str(tmp_path / "history.db"))
+    for i in range(144):
+        store.add_snapshot(make_snapshot(BASE + i * 1800, i % 4))
+    return store
+
+
+def test_compact(store):
+    raw = store.account_series("labA")
+    assert len(raw) == 144
+
+    assert store.compact(raw_days=1, hourly_days=2, now=BASE + 3 * DAY) == (96, 24)
+    assert len(store.snapshots()) == 48
+    assert store.account_series("labA", tier="daily") == [(BASE, 1.5)]
+    assert store.account_series("labA", tier="daily", agg="max") == [(BASE, 3.0)]
+    hourly = store.account_series("labA", tier="hourly")
+    assert len(hourly) == 24 and hourly[0] == (BASE + DAY, 0.5) and hourly[1] == (BASE + DAY + 3600, 2.5)
+
+    # the query takes each part of the range from its tier
+    series = store.account_series("labA")
+    assert len(series) == 1 + 24 + 48
+    assert [x[0] for x in series] == sorted(x[0] for x in series)
+    assert series[-48:] == raw[-48:]
+    assert store.account_series("labA", start=BASE + 2 * DAY - 3600) == hourly[-1:] + raw[-48:]
+    assert {x[1] for x in store.summary_series("n_pending_jobs")} == {1.0}
+    assert store.gpu_type_series("A100_80G", "ngpus", tier="hourly")[0] == (BASE + DAY, 4.0)
+    assert store.node_series("gpu01", "njobs", tier="daily", agg="max")[0][0] == BASE
+
+    # the next compaction only moves the snapshots and the hour aged out since then
+    assert store.compact(raw_days=1, hourly_days=2, now=BASE + 3 * DAY + 3600) == (2, 1)
+    assert store.account_series("labA", tier="hourly")[-1] == (BASE + 2 * DAY, 0.5)
+    assert store.account_series("labA", tier="daily") == [(BASE, 1.5), (BASE + DAY, 0.5)]
+    assert len(store.account_series("labA")) == 2 + 24 + 46
+
+    with pytest.raises(RuntimeError):
+        store.compact(raw_days=2, hourly_days=1)
+    with pytest.raises(RuntimeError):
+        store.account_series("labA", tier="weekly")
+    with pytest.raises(RuntimeError):
+        store.account_series("labA", agg="median", tier="hourly")
+
+
+def test_compact_uses_time_index(tmp_path):
+    # the old raw rows are found through the time index of each table, not by scanning it
+    store = HistoryStore(str(tmp_path / "history.db"))
+    plans = []
+    for name in ("summary", "nodes", "jobs", "accounts"):
+        plans += store.conn.execute("EXPLAIN QUERY PLAN DELETE FROM {} WHERE time < ?".format(name), (0,)).fetchall()
+    for name, (_, _, source) in _ROLLUPS.items():
+        plans += store.conn.execute("EXPLAIN QUERY PLAN " + source, {"cutoff": 0}).fetchall()
+    details = [x[3] for x in plans]
+    assert not [x for x in details if x.startswith("SCAN") and x != "SCAN g"]
+    assert len([x for x in details if "USING INDEX" in x]) == 8
+    store.close()
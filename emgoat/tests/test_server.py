@@ -0,0 +1,227 @@
+#
+# this is to test the HTTP query service on the cluster snapshot
+#
+import json
+import threading
+import time
+import urllib.request
+import urllib.error
+import pytest
+from emgoat.cluster import Cluster
+from emgoat.cluster import server as server_module
+from emgoat.cluster.server import SnapshotServer, query_cluster
+
+
+class _FakeCluster(Cluster):
+    """the cluster object built from the test tables, refresh only increases the generation"""
+    _name = "test"
+    generation = 0
+
+    def __init__(self, tables):
+        nodes, jobs = tables
+        self.nodes = nodes.to_nodes(Cluster.Node)
+        self.jobs = jobs.to_jobs(Cluster.Job)
+        account = Cluster.Account("labA")
+        account.update_values(16, 2, "running", "gpu01")
+        self.accounts = [account, Cluster.Account("labC")]
+        self.summary = Cluster.Summary(nodes, jobs)
+
+    def get_nodes_info(self):
+        return self.nodes
+
+    def get_jobs_info(self):
+        return self.jobs
+
+    def get_accounts_info(self):
+        return self.accounts
+
+    def get_cluster_summary_info(self):
+        return self.summary
+
+    def metric_groups(self):
+        return [([], self.summary, self.nodes, self.accounts)]
+
+    def refresh(self):
+        self.generation += 1
+
+
+def _get(url, etag=None):
+    request = urllib.request.Request(url)
+    if etag is not None:
+        request.add_header("If-None-Match", etag)
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, response.headers.get("ETag"), json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        body = e.read()
+        return e.code, e.headers.get("ETag"), json.loads(body) if body else None
+
+
+def test_query_filters(tables):
+    cluster = _FakeCluster(tables)
+    result = query_cluster(cluster, "jobs", {"account": ["LABA"]})
+    assert [x["jobID"] for x in result["items"]] == ["1", "3"]
+
+    # the state is either the scheduler state or the general state, node is any compute node
+    assert query_cluster(cluster, "jobs", {"state": ["pending"]})["total"] == 1
+    assert query_cluster(cluster, "jobs", {"state": ["RUN"], "node": ["gpu02"]})["total"] == 1
+
+    # the gpu type of the compute nodes, job 2 runs on both of gpu01 and gpu02
+    result = query_cluster(cluster, "jobs", {"gpu_type": ["a100_80g"]})
+    assert [x["jobID"] for x in result["items"]] == ["1", "2"]
+    result = query_cluster(cluster, "jobs", {"gpu_type": ["V100_32G"], "account": ["labB"]})
+    assert [x["jobID"] for x in result["items"]] == ["2"]
+    assert query_cluster(cluster, "jobs", {"gpu_type": ["none"]})["total"] == 0
+
+    result = query_cluster(cluster, "nodes", {"page": ["2"], "page_size": ["3"]})
+    assert result["total"] == 4
+    assert [x["node_name"] for x in result["items"]] == ["cpu01"]
+
+    # only the accounts with jobs are listed
+    assert query_cluster(cluster, "accounts", {})["total"] == 1
+
+    with pytest.raises(RuntimeError):
+        query_cluster(cluster, "nodes", {"account": ["labA"]})
+    with pytest.raises(RuntimeError):
+        query_cluster(cluster, "jobs", {"page": ["0"]})
+
+
+def test_server_conditional_get(tables):
+    cluster = _FakeCluster(tables)
+    server = SnapshotServer(cluster)
+    server.start()
+    try:
+        status, etag, data = _get(server.url + "/jobs?account=labA")
+        assert status == 200
+        assert data["total"] == 2 and data["generation"] == 0
+
+        # same generation, the client gets 304
+        status, etag2, data = _get(server.url + "/jobs?account=labA", etag)
+        assert status == 304 and etag2 == etag
+
+        # another query has another etag
+        status, etag3, data = _get(server.url + "/jobs?account=labB", etag)
+        assert status == 200 and etag3 != etag
+
+        # new generation after the refresh
+        server.refresh()
+        status, etag4, data = _get(server.url + "/jobs?account=labA", etag)
+        assert status == 200 and etag4 != etag and data["generation"] == 1
+
+        status, etag, data = _get(server.url + "/summary")
+        assert status == 200 and data["n_pending_jobs"] == 1
+
+        with urllib.request.urlopen(server.url + "/metrics") as response:
+            assert response.headers.get("Content-Type").startswith("application/openmetrics-text")
+            assert response.read().decode("utf-8").endswith("# EOF\n")
+
+        assert _get(server.url + "/queues")[0] == 404
+        assert _get(server.url + "/jobs?page_size=abc")[0] == 400
+        assert _get(server.url + "/jobs?gpu_type=A100_80G")[0] == 200
+    finally:
+        server.stop()
+
+
+def test_server_cache(monkeypatch, tables):
+    monkeypatch.setattr(server_module, "MAX_CACHED_RESPONSES", 2)
+    server = SnapshotServer(_FakeCluster(tables))
+    try:
+        # the order of the query parameters does not matter
+        first = server.response("/jobs", "account=labA&page=1")
+        assert server.response("/jobs", "page=1&account=labA") is first
+        assert len(server._cache) == 1
+
+        # the least recently used response is dropped
+        server.response("/jobs", "account=labB")
+        server.response("/jobs", "page=1&account=labA")
+        server.response("/nodes", "")
+        assert len(server._cache) == 2
+        assert server.response("/jobs", "account=labA&page=1") is first
+        assert server.response("/jobs", "account=labB") is not None
+        assert len(server._cache) == 2
+    finally:
+        server.httpd.server_close()
+
+
+class _SlowCluster(_FakeCluster):
+    """the loading of the jobs waits until it's released, like a slow bjobs"""
+    slow = False
+
+    def __init__(self, tables):
+        super().__init__(tables)
+        self.loading = threading.Event()
+        self.release = threading.Event()
+
+    def get_jobs_info(self):
+        if self.slow:
+            self.loading.set()
+            self.release.wait(10)
+        return self.jobs
+
+
+def test_server_cached_response_not_blocked(tables):
+    cluster = _SlowCluster(tables)
+    server = SnapshotServer(cluster)
+    server.start()
+    try:
+        status, etag, data = _get(server.url + "/jobs?account=labA")
+        assert status == 200
+
+        # one request waits for the slow loading, the cached one is still answered
+        cluster.slow = True
+        slow = threading.Thread(target=_get, args=(server.url + "/jobs?account=labB",))
+        slow.start()
+        assert cluster.loading.wait(10)
+        assert _get(server.url + "/jobs?account=labA", etag)[0] == 304
+        assert _get(server.url + "/jobs?account=labA")[2]["total"] == 2
+        cluster.release.set()
+        slow.join(10)
+        assert not slow.is_alive()
+    finally:
+        cluster.release.set()
+        server.stop()
+
+
+class _BrokenCluster(_FakeCluster):
+    """the data loading fails, like the scheduler commands time out"""
+    broken = False
+
+    def get_jobs_info(self):
+        if self.broken:
+            raise OSError("bjobs timed out")
+        return self.jobs
+
+    def refresh(self):
+        if self.broken:
+            raise OSError("squeue timed out")
+        self.generation += 1
+
+
+def test_server_restart_and_failures(tables):
+    # a restarted server has generation 0 again, but not the same etag
+    cluster = _BrokenCluster(tables)
+    etags = []
+    for _ in range(2):
+        server = SnapshotServer(cluster)
+        server.start()
+        try:
+            etags.append(_get(server.url + "/jobs")[1])
+        finally:
+            server.stop()
+    assert etags[0] != etags[1]
+
+    # the failed loading gets 503, the failed refresh keeps the refresh thread running
+    cluster.broken = True
+    server = SnapshotServer(cluster, refresh_interval=0.01)
+    server.start()
+    try:
+        status, etag, data = _get(server.url + "/jobs?account=labB")
+        assert status == 503 and etag is None and "timed out" in data["error"]
+        while server.refresh_errors < 2:
+            time.sleep(0.01)
+        cluster.broken = False
+        while cluster.generation == 0:
+            time.sleep(0.01)
+        assert _get(server.url + "/jobs?account=labB")[0] == 200
+    finally:
+        server.stop()
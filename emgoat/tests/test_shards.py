@@ -0,0 +1,58 @@
+#
+# this is to test the sharded job files
+#
+import hashlib
+import json
+import os
+import pytest
+from emgoat.cluster import Cluster
+from emgoat.cluster.shards import write_shards, shards_dir_name, shard_file_name
+
+
+@pytest.fixture
+def jobs(tables):
+    return tables[1].to_jobs(Cluster.Job)
+
+
+def test_shard_file_name():
+    assert shard_file_name("by_account", "labA") == "jobs/by_account/labA.json"
+    assert shard_file_name("by_node", "../x/y") == "jobs/by_node/_x_y-{}.json".format(
+        hashlib.sha1(b"../x/y").hexdigest()[:8])
+
+    # the names made same by the sanitization are still in different files
+    names = ["lab A", "lab_A", "lab/A"]
+    assert len({shard_file_name("by_account", x) for x in names}) == 3
+    assert shard_file_name("by_account", "lab_A") == "jobs/by_account/lab_A.json"
+
+
+def test_write_shards(tmp_path, jobs):
+    json_result = str(tmp_path / "results.json")
+    root = shards_dir_name(json_result)
+    written = write_shards(json_result, jobs)
+    assert len(written) == 4
+
+    with open(os.path.join(root, "manifest.json")) as f:
+        manifest = json.load(f)
+    assert manifest["by_account"]["labA"]["njobs"] == 2
+    assert set(manifest["by_node"]) == {"gpu01", "gpu02"}
+    with open(os.path.join(root, manifest["by_node"]["gpu01"]["file"])) as f:
+        assert [x["jobID"] for x in json.load(f)] == ["1", "2"]
+
+    # nothing is changed, nothing is written
+    assert write_shards(json_result, jobs) == []
+
+    # labB is gone, only the changed shards are written and the gone shards are removed
+    jobs = [x for x in jobs if x.account_name != "labB"]
+    written = write_shards(json_result, jobs)
+    assert sorted(os.path.basename(x) for x in written) == ["gpu01.json"]
+    assert not os.path.exists(os.path.join(root, "jobs/by_account/labB.json"))
+    assert not os.path.exists(os.path.join(root, "jobs/by_node/gpu02.json"))
+
+
+def test_write_shards_compressed(tmp_path, jobs):
+    # the compute nodes are written like in the json result with json_compress_hostlists
+    json_result = str(tmp_path / "results.json")
+    write_shards(json_result, jobs, compress_nodes=True)
+    with open(os.path.join(shards_dir_name(json_result), shard_file_name("by_account", "labB"))) as f:
+        assert json.load(f) == [jobs[1].to_dict(True)]
+    assert jobs[1].to_dict(True) != jobs[1].to_dict()
@@ -0,0 +1,36 @@
+#
+# this is to test the multi-resource slot calculator
+#
+import pytest
+from emgoat.cluster.tables import NodeTable
+from emgoat.cluster.slots import SlotShape, parse_slot_shapes, compute_slots
+
+
+def _nodes():
+    # gpu01 has 4 free gpus but only 100 GB free memory
+    return NodeTable(["gpu01", "gpu02", "gpu03", "cpu01"],
+                     ["A100_80G", "V100_32G", "A100_80G", "none"],
+                     ["ok", "ok", "closed", "ok"],
+                     ngpus=[4, 8, 4, 0], ncpus=[64, 32, 64, 128], mem=[512, 256, 512, 1024],
+                     gpus_used=[0, 2, 0, 0], cpus_used=[0, 8, 0, 64], mem_used=[412, 0, 0, 0])
+
+
+def test_parse_slot_shapes():
+    shapes = parse_slot_shapes("1:8:64 4:32:256:A100_80G 0:16:64:any")
+    assert shapes == [SlotShape(1, 8, 64, None), SlotShape(4, 32, 256, "A100_80G"), SlotShape(0, 16, 64, None)]
+    with pytest.raises(RuntimeError):
+        parse_slot_shapes("0:0:0")
+    with pytest.raises(RuntimeError):
+        parse_slot_shapes("1:8")
+
+
+def test_slots_consider_all_resources():
+    shapes = parse_slot_shapes("1:8:64 4:16:128 4:16:128:A100_80G 2:0:0 0:16:64")
+    result = compute_slots(_nodes(), shapes)
+
+    # gpu01 is limited by the memory: one 1-gpu slot, no 4-gpu slot
+    # gpu02 has 6 free gpus, 24 free cpus and 256 GB memory; gpu03 is closed
+    assert list(result.totals) == [1 + 3, 0 + 1, 0, 2 + 3 + 0, 1 + 1 + 4]
+    assert int(result.by_gpu_type["A100_80G"][0]) == 1
+    assert int(result.by_gpu_type["V100_32G"][1]) == 1
+    assert result.to_dict()[2]["available_slots"] == 0
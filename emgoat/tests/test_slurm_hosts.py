@@ -0,0 +1,27 @@
+#
+# this is to test the slurm_hosts.py
+#
+from emgoat.cluster.slurm.slurm_hosts import parse_sinfo_data
+from emgoat.cluster.tables import NodeTable
+
+SINFO_OUTPUT = """NODELIST NODES PARTITION STATE CPUS MEMORY ALLOCMEM CPUS(A/I/O/T) GRES GRES_USED
+gpu01 1 gpu* mixed 64 512000 102400 16/48/0/64 gpu:a100:4(S:0-1) gpu:a100:2(IDX:0-1)
+gpu01 1 all mixed 64 512000 102400 16/48/0/64 gpu:a100:4(S:0-1) gpu:a100:2(IDX:0-1)
+gpu02 1 gpu idle 64 512000 0 0/64/0/64 gpu:h100:8(S:0-1) gpu:h100:0(IDX:N/A)
+cpu01 1 all allocated 128 1024000 1024000 128/0/0/128 (null) (null)
+"""
+
+
+def test_sinfo_multi_partition_nodes():
+    """
+    the node in several partitions is parsed only once
+    """
+    nodes = parse_sinfo_data(SINFO_OUTPUT)
+    assert [x['name'] for x in nodes] == ["gpu01", "gpu02", "cpu01"]
+    assert nodes[0]['partitions'] == ["gpu", "all"]
+
+    table = NodeTable.from_records(nodes, with_usage_data=True)
+    assert table.partition_names() == ["gpu", "all"]
+    assert table.partition_mask("gpu").tolist() == [True, True, False]
+    assert int(table.take(table.partition_mask("all")).ncpus.sum()) == 192
+    assert int(table.ngpus.sum()) == 12
@@ -0,0 +1,46 @@
+#
+# this is to test the normalization of the job/node state strings
+#
+import numpy as np
+from emgoat.util import JOB_STATUS_PD, JOB_STATUS_RUN, JOB_STATUS_DONE, STATES
+from emgoat.util import JobState, NodeGroup, job_state, node_state, node_group_column
+from emgoat.util import get_job_general_status, whether_node_is_off, whether_node_is_good_for_newjobs
+
+
+def test_job_state():
+    assert job_state("PEND") is JobState.PENDING
+    assert job_state("PSUSP") is JobState.SUSPENDED
+    assert job_state("REQUEUE_HOLD") is JobState.HELD
+    assert job_state("RUNNING") is JobState.RUNNING
+    assert job_state("COMPLETED") is JobState.FINISHED
+    assert get_job_general_status("PD") == JOB_STATUS_PD
+    assert get_job_general_status("R") == JOB_STATUS_RUN
+    assert get_job_general_status("CANCELLED") == JOB_STATUS_DONE
+
+
+def test_node_state():
+    # the plain states
+    assert node_state("ok").group is NodeGroup.GOOD
+    assert node_state("mixed").group is NodeGroup.GOOD
+    assert node_state("closed").group is NodeGroup.DRAINED
+    assert node_state("drained").group is NodeGroup.DRAINED
+    assert node_state("unavail").group is NodeGroup.OFF
+    assert node_state("down").group is NodeGroup.OFF
+
+    # the compound states and the state symbols
+    state = node_state("MIXED+DRAIN")
+    assert state.base == "mixed" and state.flags == {"drain"}
+    assert state.group is NodeGroup.DRAINED
+    assert node_state("IDLE+CLOUD").group is NodeGroup.GOOD
+    assert node_state("idle~").group is NodeGroup.GOOD
+    assert node_state("mixed*").group is NodeGroup.OFF
+    assert node_state("down+drain").group is NodeGroup.OFF
+    assert not whether_node_is_good_for_newjobs("mixed+drain")
+    assert whether_node_is_off("idle*")
+
+
+def test_node_group_column():
+    codes = STATES.encode_many(["idle", "mixed+drain", "down*", "idle", "allocated"])
+    groups = node_group_column(np.array(codes))
+    assert groups.tolist() == [NodeGroup.GOOD.value, NodeGroup.DRAINED.value, NodeGroup.OFF.value,
+                               NodeGroup.GOOD.value, NodeGroup.GOOD.value]
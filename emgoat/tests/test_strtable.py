@@ -0,0 +1,38 @@
+#
+# this is to test the string tables for the repeated strings in the job/node records
+#
+from emgoat.util import StringTable, STATES, JOB_STATUS_PD, JOB_STATUS_RUN, JOB_STATUS_DONE
+from emgoat.util import encode_records, decode_records, JOB_RECORD_STRING_FIELDS
+from emgoat.cluster.tables import JOB_STATE_PD_CODE, JOB_STATE_RUN_CODE, JOB_STATE_DONE_CODE
+
+
+def test_string_table():
+    table = StringTable("test")
+    codes = table.encode_many(["labA", "labB", "labA"])
+    assert codes == (0, 1, 0)
+    assert table.decode_many(codes) == ["labA", "labB", "labA"]
+    assert len(table) == 2
+
+    # the general job states have the fixed codes
+    assert STATES.decode(JOB_STATE_PD_CODE) == JOB_STATUS_PD
+    assert STATES.decode(JOB_STATE_RUN_CODE) == JOB_STATUS_RUN
+    assert STATES.decode(JOB_STATE_DONE_CODE) == JOB_STATUS_DONE
+
+
+def test_encode_records():
+    records = [
+        {"jobid": "1", "state": "RUN", "general_state": JOB_STATUS_RUN, "account_name": "labA",
+         "compute_nodes": ["gpu01", "gpu02"]},
+        {"jobid": "2", "state": "PEND", "general_state": JOB_STATUS_PD, "account_name": "labA",
+         "compute_nodes": []},
+    ]
+    data = encode_records(records, JOB_RECORD_STRING_FIELDS)
+    assert data["string_tables"]["account_name"] == ["labA"]
+    assert data["records"][0]["compute_nodes"] == (0, 1)
+
+    # the decoded records are same with the input, the json data file gives lists
+    data["records"] = [dict(x, compute_nodes=list(x["compute_nodes"])) for x in data["records"]]
+    assert decode_records(data) == records
+
+    # old data files are just the list of records
+    assert decode_records(records) is records
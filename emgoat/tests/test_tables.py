@@ -0,0 +1,36 @@
+#
+# this is to test the columnar node/job tables and the summary computed from them
+#
+import pytest
+from emgoat.cluster import Cluster
+from emgoat.cluster.tables import JobTable
+
+
+def test_node_usage_from_jobs(tables):
+    nodes, jobs = tables
+    assert list(nodes.gpus_used) == [4, 2, 0, 0]
+    assert list(nodes.cpus_used) == [24, 8, 0, 0]
+    assert list(nodes.njobs) == [2, 1, 0, 0]
+    assert list(nodes.mem) == [512, 256, 0, 1024]
+
+
+def test_summary_same_for_tables_and_objects(tables):
+    nodes, jobs = tables
+    from_tables = Cluster.Summary(nodes, jobs).to_dict()
+    from_objects = Cluster.Summary(nodes.to_nodes(Cluster.Node), jobs.to_jobs(Cluster.Job)).to_dict()
+    assert from_tables == from_objects
+    assert from_tables["n_pending_jobs"] == 1
+    assert from_tables["n_running_jobs"] == 2
+    assert from_tables["total_gpus_number"] == 12
+    assert from_tables["proposed_gpu_num_1"] == 8
+    assert from_tables["proposed_gpu_num_4"] == 1
+
+
+def test_job_view_round_trip(tables):
+    _, jobs = tables
+    job_list = jobs.to_jobs(Cluster.Job)
+    assert job_list[1].compute_nodes == ("gpu01", "gpu02")
+    assert job_list[2].start_time is None
+    assert job_list[0].to_dict()["start_time"] == "2025-07-29T11:32:00"
+    again = JobTable.from_jobs(job_list)
+    assert list(again.submit_ts) == list(jobs.submit_ts)
@@ -0,0 +1,43 @@
+#
+# this is to test the precomputed views published next to the json result
+#
+import json
+from emgoat.cluster import Cluster
+from emgoat.cluster.views import compute_views, write_views, view_file_name, pending_jobs_view
+from emgoat.cluster.tables import JobTable
+
+
+def test_views(tables):
+    nodes, jobs = tables
+    account = Cluster.Account("labA")
+    account.update_values(16, 2, "running", "gpu01")
+    views = compute_views(nodes, jobs, [account, Cluster.Account("labC")], Cluster.Job)
+
+    # gpu03 is unavail so it's off, the cpu node has no gpu type entry
+    assert set(views["gpu_types"]) == {"A100_80G", "V100_32G", "V100_16G"}
+    assert views["gpu_types"]["A100_80G"]["free_gpus"] == 0
+    assert views["gpu_types"]["V100_32G"]["free_slots"]["2"] == views["gpu_types"]["V100_32G"]["free_gpus"] // 2
+    assert views["gpu_types"]["V100_16G"]["total_gpus"] == 0
+
+    assert list(views["accounts"]) == ["labA"]
+    assert views["node_groups"]["off"]["nodes"] == ["gpu03"]
+    assert views["pending_jobs"]["n_pending_jobs"] == 1
+    assert views["pending_jobs"]["jobs"][0]["jobID"] == "3"
+
+
+def test_pending_jobs_order(job_records):
+    records = job_records
+    for i, t in zip(range(3), [5, 50, 20]):
+        records[i] = dict(records[2], jobid=str(i), pending_time=t)
+    view = pending_jobs_view(JobTable.from_records(records), Cluster.Job, top_n=2)
+    assert view["n_pending_jobs"] == 3
+    assert [x["jobID"] for x in view["jobs"]] == ["1", "2"]
+
+
+def test_write_views(tmp_path, tables):
+    nodes, jobs = tables
+    result = str(tmp_path / "results.json")
+    files = write_views(result, compute_views(nodes, jobs, [], Cluster.Job))
+    assert files[0] == view_file_name(result, "gpu_types") == str(tmp_path / "results_view_gpu_types.json")
+    with open(view_file_name(result, "node_groups")) as f:
+        assert json.load(f)["good"]["n_nodes"] == 2
@@ -1,2 +1,10 @@
 from .macros import *
+from .timing import *
 from .util import *
+from .times import *
+from .strtable import *
+from .states import *
+from .resources import *
+from .hostlist import *
+from .jobarrays import *
+from .jsonstream import *
@@ -0,0 +1,134 @@
+"""
+This file stores the codec for the slurm host list expressions
+
+slurm writes the node list of a job in the range syntax, like "gpu[01-16,20],x-gpu05"; the
+ranges could also be in the middle of the name or several in one name, like "rack[1-2]-n[1-4]".
+Here the expression is expanded into the host names, and a list of host names is compressed
+back into the range syntax for writing the wide multi-node jobs in a short form:
+
+expand_hostlist("gpu[01-03,07],cpu1")   -> ("gpu01", "gpu02", "gpu03", "gpu07", "cpu1")
+compress_hostlist(["gpu01", "gpu02", "gpu03", "gpu07", "cpu1"]) -> "gpu[01-03,07],cpu1"
+
+the numbers keep their zero padding. As for the other parsers the result for each distinct
+expression is memoized, the same node lists repeat over the jobs and the refreshes
+"""
+import re
+from functools import lru_cache
+from itertools import product
+from .resources import PARSE_CACHE_SIZE
+
+#
+# the range part of the expression, like [01-16,20]
+#
+_RANGE = re.compile(r'\[([^\[\]]*)\]')
+
+#
+# the host name ending with the number, like gpu01 -> ("gpu", "01")
+#
+_NUMBERED_HOST = re.compile(r'^(.*?)(\d+)$')
+
+
+def _split_expression(data: str):
+    """split the host list expression on the commas which are not inside the []"""
+    items = []
+    depth = 0
+    start = 0
+    for i, c in enumerate(data):
+        if c == "[":
+            depth += 1
+        elif c == "]":
+            depth -= 1
+        elif c == "," and depth == 0:
+            items.append(data[start:i])
+            start = i + 1
+    items.append(data[start:])
+    return [x.strip() for x in items if x.strip()]
+
+
+def _expand_range(data: str):
+    """expand the inside of [], like 01-03,07 -> ["01", "02", "03", "07"]"""
+    result = []
+    for part in data.split(","):
+        part = part.strip()
+        if "-" not in part:
+            result.append(part)
+            continue
+        first, last = part.split("-", 1)
+        width = len(first)
+        begin, end = int(first), int(last)
+        if end < begin:
+            raise RuntimeError("the range {} in the host list is not valid".format(part))
+        result.extend(str(x).zfill(width) for x in range(begin, end + 1))
+    return result
+
+
+def _expand_host(item: str):
+    """expand one host name with ranges, like rack[1-2]-n[1-2]"""
+    pieces = _RANGE.split(item)
+    if len(pieces) == 1:
+        return [item]
+    # the even pieces are the text between the ranges, the odd pieces are the ranges
+    choices = [[x] if i % 2 == 0 else _expand_range(x) for i, x in enumerate(pieces)]
+    return ["".join(x) for x in product(*choices)]
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def expand_hostlist(data: str):
+    """
+    expand the host list expression into the tuple of host names, the expression is like
+    gpu[01-16,20],x-gpu05; the host names could also be separated by spaces
+
+    :raises RuntimeError: if a range is not valid, like [05-01]
+    """
+    hosts = []
+    for word in data.split():
+        for item in _split_expression(word):
+            if "[" in item:
+                try:
+                    hosts.extend(_expand_host(item))
+                except ValueError:
+                    raise RuntimeError("the host list {} is not valid".format(data))
+            else:
+                hosts.append(item)
+    return tuple(hosts)
+
+
+def _format_numbers(numbers):
+    """format the sorted (value, text) pairs into the ranges like 01-03,07"""
+    parts = []
+    i = 0
+    while i < len(numbers):
+        j = i
+        while j + 1 < len(numbers) and numbers[j + 1][0] == numbers[j][0] + 1:
+            j += 1
+        parts.append(numbers[i][1] if i == j else numbers[i][1] + "-" + numbers[j][1])
+        i = j + 1
+    return ",".join(parts)
+
+
+def compress_hostlist(hosts):
+    """
+    compress the host names into the host list expression, the hosts ending with a number and
+    with the same prefix and the same number width are put into one range; the groups are in
+    the order they are first seen in the input, the duplicated names are written once
+
+    :param hosts: the list of host names
+    :return: the expression string, like gpu[01-03,07],cpu1; empty string for no hosts
+    """
+    groups = {}
+    for host in dict.fromkeys(hosts):
+        m = _NUMBERED_HOST.match(host)
+        if m is None:
+            groups[(host, None)] = None
+            continue
+        prefix, digits = m.groups()
+        groups.setdefault((prefix, len(digits)), []).append((int(digits), digits))
+    items = []
+    for (prefix, width), numbers in groups.items():
+        if numbers is None:
+            items.append(prefix)
+        elif len(numbers) == 1:
+            items.append(prefix + numbers[0][1])
+        else:
+            items.append(prefix + "[" + _format_numbers(sorted(numbers)) + "]")
+    return ",".join(items)
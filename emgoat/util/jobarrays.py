@@ -0,0 +1,130 @@
+"""
+Grouping of the job array elements in the job records
+
+cryoSPARC and RELION submit job arrays with hundreds of pending elements, each element is a job
+record from bjobs/squeue though they are all the same. The parsers mark the array elements in
+the job records with:
+
+array_id      - the id of the array, like "1234"
+array_index   - the index of the element in the array
+
+and group_array_jobs collapses the pending elements of the same array, state, account and
+resources into one record with:
+
+array_count   - the number of elements in the record
+array_indices - the element indices as ranges, like "1-100,105"
+
+the grouped record takes the jobid of the array with the indices (like 1234[1-100,105]) and the
+other fields from its first element. The running elements stay as individual records, they are
+on different nodes with their own times. squeue already gives the pending elements of an array
+as one record with the task ranges (like 3-100%10), such record is marked with array_count and
+array_indices directly by the parser (see index_ranges_count)
+"""
+import re
+from .macros import JOB_STATUS_PD
+
+#
+# the job name or job id with the array index, like cryosparc_P1_J5[12]
+#
+_ARRAY_ELEMENT = re.compile(r'^(.*)\[(\d+)\]$')
+
+#
+# the fields which must be same for the grouped elements, besides the array id
+#
+_GROUP_FIELDS = ("state", "general_state", "account_name", "cpu_used", "gpu_used", "memory_used")
+
+
+def split_array_element(name):
+    """
+    split the job id or job name of an array element, like 1234[5] -> ("1234", 5); return
+    None if it's not an array element
+    """
+    m = _ARRAY_ELEMENT.match(name)
+    if m is None:
+        return None
+    return m.group(1), int(m.group(2))
+
+
+def format_index_ranges(indices):
+    """format the indices into the ranges, like [1, 2, 3, 7] -> 1-3,7"""
+    indices = sorted(set(indices))
+    parts = []
+    i = 0
+    while i < len(indices):
+        j = i
+        while j + 1 < len(indices) and indices[j + 1] == indices[j] + 1:
+            j += 1
+        parts.append(str(indices[i]) if i == j else "{}-{}".format(indices[i], indices[j]))
+        i = j + 1
+    return ",".join(parts)
+
+
+def expand_index_ranges(text):
+    """
+    expand the index ranges into the list of indices, like 1-3,7 -> [1, 2, 3, 7]; the slurm
+    task string could also have the step and the throttle, like 1-9:2%4
+    """
+    text = text.split("%")[0].strip()
+    indices = []
+    for part in text.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        step = 1
+        if ":" in part:
+            part, step = part.split(":", 1)
+            step = int(step)
+        if "-" in part:
+            first, last = part.split("-", 1)
+            indices.extend(range(int(first), int(last) + 1, step))
+        else:
+            indices.append(int(part))
+    return indices
+
+
+def index_ranges_count(text):
+    """the number of indices in the ranges, see expand_index_ranges"""
+    return len(expand_index_ranges(text))
+
+
+def _group_key(record):
+    return (record["array_id"],) + tuple(record[x] for x in _GROUP_FIELDS) + \
+        (tuple(record.get("partitions", ())),)
+
+
+def group_array_jobs(records):
+    """
+    collapse the pending array elements in the job records (see the file comments), the other
+    records are returned as they are; the group takes the position of its first element
+
+    :param records: the list of job record dict
+    :return: the new list of job records
+    """
+    result = []
+    groups = {}
+    for record in records:
+        if "array_id" not in record or record["general_state"] != JOB_STATUS_PD:
+            result.append(record)
+            continue
+        key = _group_key(record)
+        group = groups.get(key)
+        if group is None:
+            groups[key] = (len(result), [record])
+            result.append(None)
+        else:
+            group[1].append(record)
+
+    for pos, members in groups.values():
+        indices = []
+        for x in members:
+            if "array_indices" in x:
+                indices.extend(expand_index_ranges(x["array_indices"]))
+            elif "array_index" in x:
+                indices.append(x["array_index"])
+        grouped = dict(members[0])
+        grouped.pop("array_index", None)
+        grouped["array_count"] = sum(x.get("array_count", 1) for x in members)
+        grouped["array_indices"] = format_index_ranges(indices)
+        grouped["jobid"] = "{}[{}]".format(grouped["array_id"], grouped["array_indices"])
+        result[pos] = grouped
+    return result
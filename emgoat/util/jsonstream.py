@@ -0,0 +1,118 @@
+"""
+This file stores the streaming json writer for the result files
+
+the result is written field by field, the records of a list field (nodes, accounts, jobs) are
+encoded one by one straight into the buffered file, so the whole result never exists as one big
+dict or string. The output is the same bytes as the compact encoding of the whole result:
+
+json.dumps(result, separators=(",", ":"))
+
+the file is written into a temporary file first and then moved to the final name, so the readers
+never see a half written file
+"""
+import json
+import os
+
+#
+# the buffer size for writing the result files
+#
+JSON_WRITE_BUFFER_SIZE = 1 << 20
+
+#
+# the compact json encoder
+#
+_ENCODER = json.JSONEncoder(separators=(",", ":"))
+
+
+class RawJson(str):
+    """the json text which is already encoded, it's written as it is (see iter_json_chunks)"""
+    __slots__ = ()
+
+
+def _is_json_value(value):
+    """whether the value is encoded as a whole, otherwise it's an iterable of records"""
+    return value is None or isinstance(value, (dict, list, tuple, str, int, float, bool))
+
+
+def _value_chunks(value, encode):
+    """yield the json text of the field value in chunks"""
+    if isinstance(value, RawJson):
+        yield value
+    elif _is_json_value(value):
+        yield encode(value)
+    else:
+        yield "["
+        for j, record in enumerate(value):
+            if j > 0:
+                yield ","
+            yield encode(record)
+        yield "]"
+
+
+def iter_json_chunks(fields, offsets=None):
+    """
+    yield the json text of the object with the given fields in chunks
+
+    :param fields: list of (key, value), the value is either a json value which is encoded as a
+                   whole, an already encoded RawJson, or an iterable (like generator) of records
+                   which is encoded as json array
+    :param offsets: if it's given (dict), the (start, end) position of each value in the text
+                    is put into it by the key
+    """
+    encode = _ENCODER.encode
+    pos = 0
+    for i, (key, value) in enumerate(fields):
+        head = ("{" if i == 0 else ",") + encode(key) + ":"
+        yield head
+        pos += len(head)
+        start = pos
+        for chunk in _value_chunks(value, encode):
+            yield chunk
+            pos += len(chunk)
+        if offsets is not None:
+            offsets[key] = (start, pos)
+    yield "}" if fields else "{}"
+
+
+def write_text_chunks(file_name, chunks):
+    """
+    write the chunks into the file through the temporary file, the temporary file is removed
+    if anything fails (like the disk is full, or the chunks generator raises)
+    """
+    tmp_name = file_name + ".tmp"
+    try:
+        with open(tmp_name, 'w', buffering=JSON_WRITE_BUFFER_SIZE) as f:
+            for chunk in chunks:
+                f.write(chunk)
+    except BaseException as e:
+        if os.path.exists(tmp_name):
+            os.remove(tmp_name)
+        if not isinstance(e, (TypeError, ValueError, OverflowError)):
+            raise
+        raise RuntimeError("The input data can not be transformed into json format of data "
+                           "and save it into file: {}".format(file_name))
+    os.replace(tmp_name, file_name)
+
+
+def write_json_stream(file_name, fields, offsets=None):
+    """
+    write the json object with the given fields into the file, see iter_json_chunks for the fields
+    and offsets
+    """
+    write_text_chunks(file_name, iter_json_chunks(fields, offsets))
+
+
+def write_ndjson(file_name, records):
+    """
+    write the records into the file as NDJSON, that is one compact json record per line
+    """
+    encode = _ENCODER.encode
+    write_text_chunks(file_name, (encode(x) + "\n" for x in records))
+
+
+def ndjson_file_name(file_name, name):
+    """
+    the NDJSON file name for the given part (like jobs) of the json result file, for example
+    the jobs of /data/results.json are written into /data/results_jobs.ndjson
+    """
+    return os.path.splitext(file_name)[0] + "_" + name + ".ndjson"
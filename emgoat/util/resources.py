@@ -0,0 +1,153 @@
+"""
+This file stores the parsers for the resource strings from the schedulers
+
+- GRES string from sinfo, like "gpu:a100:4(S:0-1),gpu:h100:2(S:2)" or "(null)"
+- TRES string from squeue, like "cpu=8,mem=64G,node=1,billing=8,gres/gpu=2,gres/gpu:a100=2"
+- memory with unit, like "2.9T", "904G" or "10 GB"
+
+the regular expressions are compiled once, and the result for each distinct input string is
+memoized (the same few strings repeat over all of nodes and jobs). The results are tuples so
+that the cached values can not be changed by the caller
+"""
+import re
+from collections import namedtuple
+from functools import lru_cache
+from math import floor
+
+#
+# how many distinct strings are kept for each parser
+#
+PARSE_CACHE_SIZE = 4096
+
+#
+# memory value with the unit, the unit could be like g, gb, gib etc.
+#
+_MEMORY = re.compile(r'^\s*(\d+(?:\.\d*)?|\.\d+)\s*([kmgtp])?(?:i?b)?\s*$', re.IGNORECASE)
+_MEMORY_UNIT_IN_MB = {"k": 1.0/1024, "m": 1.0, "g": 1024.0, "t": 1024.0**2, "p": 1024.0**3}
+
+#
+# the data inside the braket in gres string, like (S:0-1) or (IDX:0,2); sometimes
+# the ) is missing at the end of the string
+#
+_GRES_BRAKET = re.compile(r'\([^)]*\)?')
+
+#
+# gpus is the total number of gpus, by_type is the tuple of (gpu_type, count) in the
+# order of the gres entries
+#
+GresCounts = namedtuple("GresCounts", ["gpus", "by_type"])
+
+#
+# the resources parsed from the tres string, the memory is in GB
+#
+TresCounts = namedtuple("TresCounts", ["nnodes", "ncpus", "mem_in_gb", "gpus", "gpus_by_type"])
+
+
+def _memory_value(data: str):
+    """return the value and the unit (lower case) of the memory string"""
+    m = _MEMORY.match(data)
+    if m is None or m.group(2) is None:
+        raise RuntimeError("Invalid memory value, it should be a number with unit like 10G: {}".format(data))
+    return float(m.group(1)), m.group(2).lower()
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def memory_in_mb(data: str):
+    """
+    convert the memory string with unit into integer in MB, the empty string gives -1
+    """
+    if not data.strip():
+        return -1
+    val, unit = _memory_value(data)
+    return int(floor(val * _MEMORY_UNIT_IN_MB[unit]))
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def memory_in_gb(data: str):
+    """
+    convert the memory string with unit into integer in GB, the empty string gives -1
+    """
+    if not data.strip():
+        return -1
+    val, unit = _memory_value(data)
+    return int(floor(val * _MEMORY_UNIT_IN_MB[unit] / 1024))
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_gres(data: str):
+    """
+    parse the gres string from sinfo (the Gres or GresUsed field) into GresCounts
+
+    each entry is like gpu:a100:4 or gpu:4 (no type, then the type is "gpu"), the data inside
+    the braket is dropped. Only the gpu entries are counted, the same type in several
+    entries is added together
+    """
+    s = data.strip()
+    if not s or s.find("null") >= 0:
+        return GresCounts(0, ())
+
+    by_type = {}
+    for entry in _GRES_BRAKET.sub("", s).split(","):
+        fields = entry.strip().split(":")
+        if fields == [""]:
+            continue
+        if len(fields) < 2:
+            raise RuntimeError("The input data does not have :, failed for parsing: {}".format(data))
+        if fields[0] != "gpu":
+            continue
+        try:
+            count = int(fields[-1])
+        except ValueError:
+            raise RuntimeError("The gpu number in the gres data is not integer: {}".format(data))
+        gpu_type = fields[1] if len(fields) >= 3 else fields[0]
+        by_type[gpu_type] = by_type.get(gpu_type, 0) + count
+    return GresCounts(sum(by_type.values()), tuple(by_type.items()))
+
+
+def gres_gpu_type(gres: GresCounts):
+    """
+    the gpu type for the node, if the node has several gpu types it's the one with most gpus.
+    "none" is returned if there's no gpu entry
+    """
+    if not gres.by_type:
+        return "none"
+    return max(gres.by_type, key=lambda x: x[1])[0]
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_tres(data: str):
+    """
+    parse the tres string of the job into TresCounts
+
+    the gpus are given as gres/gpu=3 and/or with type gres/gpu:a100=3; if the total is not given
+    the typed counts are added together
+    """
+    gpus = None
+    gpus_by_type = {}
+    ncpus = 0
+    nnodes = 0
+    mem = 0
+    for x in data.strip().lower().split(","):
+        key, sep, value = x.partition("=")
+        if not sep:
+            raise RuntimeError("The input data field does not have equal sign =, failed for parsing: {}".format(data))
+        key = key.strip()
+        if key == "cpu":
+            ncpus = int(value)
+        elif key == "node":
+            nnodes = int(value)
+        elif key == "mem":
+            mem = memory_in_gb(value)
+        elif key in ("gres/gpu", "gres/gpus"):
+            gpus = int(value)
+        elif key.startswith("gres/gpu:") or key.startswith("gres/gpus:"):
+            gpu_type = key.split(":", 1)[1]
+            gpus_by_type[gpu_type] = gpus_by_type.get(gpu_type, 0) + int(value)
+
+    # at least the memory/cpus/nnodes should be defined
+    if mem <= 0 or nnodes == 0 or ncpus == 0:
+        raise RuntimeError("The input data field should have at least memory/ncpus/n_nodes defined, "
+                           "now at least one of them is missing in the input data: {}".format(data))
+    if gpus is None:
+        gpus = sum(gpus_by_type.values())
+    return TresCounts(nnodes, ncpus, mem, gpus, tuple(gpus_by_type.items()))
@@ -0,0 +1,220 @@
+"""
+This file stores the normalization of the job/node state strings from the schedulers
+
+every state string is mapped once into the enum below and the result is memoized, so for one
+refresh we only do one dict lookup for each distinct state. The state column of the tables is
+made of codes in the STATES string table (see strtable.py), for the column we build the lookup
+array over the codes so that the classification is done with numpy indexing.
+
+job states are taken from the links below:
+
+https://slurm.schedmd.com/squeue.html
+https://www.ibm.com/docs/en/spectrum-lsf/10.1.0?topic=bjobs-description
+
+the node states from sinfo could be compound, like "MIXED+DRAIN" or "IDLE+CLOUD"; the long state
+format also appends a symbol to the state, like "idle~" (powered off) or "mixed*" (not responding).
+The first state is the base state and the others are the flags:
+
+https://slurm.schedmd.com/sinfo.html#SECTION_NODE-STATE-CODES
+"""
+from enum import Enum
+import numpy as np
+from .macros import JOB_STATUS_PD, JOB_STATUS_RUN, JOB_STATUS_DONE
+from .strtable import STATES
+
+
+class JobState(Enum):
+    """
+    the normalized job state, suspending/requeued/held jobs are counted into the pending state
+    """
+    PENDING = "pending"
+    CONFIGURING = "configuring"
+    SUSPENDED = "suspended"
+    REQUEUED = "requeued"
+    HELD = "held"
+    RUNNING = "running"
+    FINISHED = "finished"
+
+    @property
+    def general_state(self):
+        """the general state, one of JOB_STATUS_PD/JOB_STATUS_RUN/JOB_STATUS_DONE"""
+        if self is JobState.RUNNING:
+            return JOB_STATUS_RUN
+        if self is JobState.FINISHED:
+            return JOB_STATUS_DONE
+        return JOB_STATUS_PD
+
+    @property
+    def is_pending(self):
+        return self in (JobState.PENDING, JobState.CONFIGURING)
+
+    @property
+    def is_suspending(self):
+        return self in (JobState.SUSPENDED, JobState.REQUEUED, JobState.HELD)
+
+    @property
+    def is_running(self):
+        return self is JobState.RUNNING
+
+
+class NodeGroup(Enum):
+    """
+    the node status group: good for new jobs, drained (not accepting new jobs but still counted
+    into the cluster) or off (power, service is down, or other reasons)
+    """
+    GOOD = 0
+    DRAINED = 1
+    OFF = 2
+
+
+class NodeState:
+    """
+    the normalized node state, base is the base state in lower case and flags is the set of
+    flags (compound state and the state symbol) in lower case
+    """
+    __slots__ = ("base", "flags", "group")
+
+    def __init__(self, base, flags, group):
+        self.base = base
+        self.flags = flags
+        self.group = group
+
+    def __repr__(self):
+        return "NodeState({0}, {1}, {2})".format(self.base, sorted(self.flags), self.group.name)
+
+
+#
+# the job state strings (in lower case) for the job states other than running/finished
+#
+_JOB_STATES = {
+    "pend": JobState.PENDING,
+    "pending": JobState.PENDING,
+    "pd": JobState.PENDING,
+    "configuring": JobState.CONFIGURING,
+    "cf": JobState.CONFIGURING,
+    "psusp": JobState.SUSPENDED,
+    "ususp": JobState.SUSPENDED,
+    "ssusp": JobState.SUSPENDED,
+    "prov": JobState.SUSPENDED,
+    "wait": JobState.SUSPENDED,
+    "suspended": JobState.SUSPENDED,
+    "s": JobState.SUSPENDED,
+    "requeued": JobState.REQUEUED,
+    "rq": JobState.REQUEUED,
+    "requeue_fed": JobState.REQUEUED,
+    "rf": JobState.REQUEUED,
+    "requeue_hold": JobState.HELD,
+    "rh": JobState.HELD,
+    "resv_del_hold": JobState.HELD,
+    "rd": JobState.HELD,
+}
+
+#
+# the symbols appended to the node state by sinfo, and the flag name for each
+#
+_NODE_STATE_SYMBOLS = {
+    "*": "not_responding",
+    "~": "powered_down",
+    "#": "powering_up",
+    "!": "pending_power_down",
+    "%": "powering_down",
+    "$": "maint",
+    "@": "reboot_requested",
+    "^": "reboot_issued",
+    "-": "planned",
+}
+
+#
+# the node flags that stop new jobs on the node, and the flags for the node being off;
+# the other flags (cloud, powered_down, completing etc.) do not change the node group
+#
+_NODE_DRAINED_FLAGS = {"drain", "draining", "drained", "maint", "reserved", "reboot_requested",
+                       "reboot_issued", "fail", "failing"}
+_NODE_OFF_FLAGS = {"not_responding", "down", "powering_down"}
+
+#
+# memoized results for each distinct state string
+#
+_job_states = {}
+_node_states = {}
+
+
+def job_state(state: str):
+    """
+    return the JobState for the job state string from the scheduler
+    """
+    try:
+        return _job_states[state]
+    except KeyError:
+        s = state.lower()
+        result = _JOB_STATES.get(s)
+        if result is None:
+            result = JobState.RUNNING if s == "r" or s.find("run") >= 0 else JobState.FINISHED
+        _job_states[state] = result
+        return result
+
+
+def _base_node_group(base):
+    """the node group for the base state"""
+    if base == "ok" or base.find("idle") >= 0 or base.find("mix") >= 0 or base.find("alloc") >= 0:
+        return NodeGroup.GOOD
+    if base == "closed" or base.find("drain") >= 0 or base.find("reserved") >= 0:
+        return NodeGroup.DRAINED
+    return NodeGroup.OFF
+
+
+def node_state(status: str):
+    """
+    return the NodeState for the node status string from the scheduler
+    """
+    try:
+        return _node_states[status]
+    except KeyError:
+        pass
+
+    s = status.strip().lower()
+    flags = set()
+    while s and s[-1] in _NODE_STATE_SYMBOLS:
+        flags.add(_NODE_STATE_SYMBOLS[s[-1]])
+        s = s[:-1]
+    fields = s.split("+")
+    base = fields[0]
+    flags.update(x for x in fields[1:] if x)
+
+    # the base state being off is not changed by the flags
+    group = _base_node_group(base)
+    if group is not NodeGroup.OFF:
+        if flags & _NODE_OFF_FLAGS:
+            group = NodeGroup.OFF
+        elif flags & _NODE_DRAINED_FLAGS:
+            group = NodeGroup.DRAINED
+
+    result = _node_states[status] = NodeState(base, frozenset(flags), group)
+    return result
+
+
+def _state_codes_lookup(codes, func, dtype):
+    """
+    apply func on the strings for each distinct code in STATES, and return the results
+    for the input codes as numpy array
+    """
+    codes = np.asarray(codes)
+    distinct, inverse = np.unique(codes, return_inverse=True)
+    values = np.fromiter((func(STATES.decode(x)) for x in distinct), dtype=dtype, count=len(distinct))
+    return values[inverse.reshape(-1)]
+
+
+def node_group_column(status_codes):
+    """
+    return the NodeGroup value (int array) for each node, the input is the status codes
+    in the STATES string table
+    """
+    return _state_codes_lookup(status_codes, lambda x: node_state(x).group.value, np.int8)
+
+
+def job_general_state_column(state_codes):
+    """
+    return the general state (as the code in STATES) for each job, the input is the state
+    codes in the STATES string table
+    """
+    return _state_codes_lookup(state_codes, lambda x: STATES.encode(job_state(x).general_state), np.int32)
@@ -0,0 +1,118 @@
+"""
+Shared string tables for the repeated strings in the job/node records
+
+the job and node records repeat the same few hundred account names, host names and a handful
+of state strings. Each string table assigns a small integer code to every distinct string, the
+records keep the codes and the strings are only decoded when the data is printed or written out.
+
+the codes are only valid inside the running process, for the json data files the records are
+written with their own string tables (see encode_records and decode_records)
+"""
+from .macros import JOB_STATUS_PD, JOB_STATUS_RUN, JOB_STATUS_DONE, GPU_TYPE
+
+
+class StringTable:
+    """
+    assign the integer codes to the strings, the code is the position of the string in the table
+    """
+
+    def __init__(self, name, strings=()):
+        self.name = name
+        self._codes = {}
+        self._strings = []
+        for s in strings:
+            self.encode(s)
+
+    def __len__(self):
+        return len(self._strings)
+
+    def encode(self, s):
+        """return the code for the string, the string is added if it's not in the table yet"""
+        code = self._codes.get(s)
+        if code is None:
+            code = self._codes[s] = len(self._strings)
+            self._strings.append(s)
+        return code
+
+    def encode_many(self, strings):
+        """return the tuple of codes for the input strings"""
+        return tuple(self.encode(s) for s in strings)
+
+    def decode(self, code):
+        """return the string for the code"""
+        return self._strings[code]
+
+    def decode_many(self, codes):
+        """return the list of strings for the input codes"""
+        strings = self._strings
+        return [strings[x] for x in codes]
+
+    def strings(self):
+        """return the list of strings, the position is the code"""
+        return list(self._strings)
+
+
+#
+# the string tables shared by all of the records
+#
+# the general job states are always the first codes in the states table, so that
+# JOB_STATUS_PD/JOB_STATUS_RUN/JOB_STATUS_DONE are 0/1/2
+#
+ACCOUNTS = StringTable("accounts")
+HOSTS = StringTable("hosts")
+STATES = StringTable("states", [JOB_STATUS_PD, JOB_STATUS_RUN, JOB_STATUS_DONE])
+GPU_TYPES = StringTable("gpu_types", GPU_TYPE + ["none"])
+PARTITIONS = StringTable("partitions")
+
+#
+# the string fields of the job records (see the parse functions in lsf_jobs/slurm_jobs) that
+# are written with the string tables into the job data files
+#
+JOB_RECORD_STRING_FIELDS = ["state", "general_state", "account_name", "compute_nodes", "partitions", "gpu_type"]
+
+
+def encode_records(records, fields):
+    """
+    encode the string fields of the records (list of dict) for writing them into the json data file
+
+    :param records: the list of dict
+    :param fields: the field names to encode, the value of a field is either a string or a list of strings;
+                   the fields not in the record are skipped
+    :return: a dict with the string tables of the fields and the encoded records
+    """
+    tables = {x: StringTable(x) for x in fields}
+    encoded = []
+    for record in records:
+        r = dict(record)
+        for field, table in tables.items():
+            if field not in r:
+                continue
+            value = r[field]
+            if isinstance(value, (list, tuple)):
+                r[field] = table.encode_many(value)
+            else:
+                r[field] = table.encode(value)
+        encoded.append(r)
+    return {"string_tables": {x: t.strings() for x, t in tables.items()}, "records": encoded}
+
+
+def decode_records(data):
+    """
+    decode the data written by encode_records back into the list of dict
+
+    the data files written before the string tables are just the list of records, they are
+    returned as they are
+    """
+    if isinstance(data, list):
+        return data
+    tables = data["string_tables"]
+    for record in data["records"]:
+        for field, strings in tables.items():
+            if field not in record:
+                continue
+            value = record[field]
+            if isinstance(value, list):
+                record[field] = [strings[x] for x in value]
+            else:
+                record[field] = strings[value]
+    return data["records"]
@@ -0,0 +1,109 @@
+"""
+This file stores the time parsing functions for the job records
+
+all of the job times are carried as epoch seconds (integer). For one refresh of the job data
+we use one TimeParser, it captures the reference "now" once so that all of records are computed
+against the same time, and it memoizes the LSF time strings (many jobs share the same
+submit/start minute)
+"""
+from datetime import datetime
+from .util import datetime_to_epoch
+
+#
+# the month abbreviation used in LSF time output
+#
+MONTHS = {
+    'jan': 1,
+    'feb': 2,
+    'mar': 3,
+    'apr': 4,
+    'may': 5,
+    'jun': 6,
+    'jul': 7,
+    'aug': 8,
+    'sep': 9,
+    'oct': 10,
+    'nov': 11,
+    'dec': 12
+}
+
+
+def parse_lsf_time(data, now):
+    """
+    here input data should be in format of "Jul 29 11:30", this is a typical
+    time format used in LSF. LSF does not print the year, so the year is taken from now;
+    if the month is after the current month, it's for last year
+
+    if the input is empty string, or space; we return None
+
+    :param data: input time string
+    :param now: the reference current time (datetime)
+    :return: the given datetime object
+    """
+    # sometimes the input data is empty
+    # if so we just return a None value
+    if not data.strip():
+        return None
+
+    # split the input data into fields
+    fields = data.split()
+    if len(fields) != 3:
+        info = ("Invalid input data for parsing, it should be exactly in the "
+                "format like Jul 29 11:30, no year")
+        raise RuntimeError(info)
+    ori_month, ori_day, ori_time = fields
+
+    # day should be the integer
+    try:
+        day = int(ori_day)
+    except ValueError:
+        raise RuntimeError("Error to convert the day into integer: {}".format(ori_day))
+
+    # now let's month
+    month = MONTHS.get(ori_month.lower())
+    if month is None:
+        raise RuntimeError("The input month abbreviation is wrong: {}".format(ori_month))
+
+    # finally it's time
+    x = ori_time.split(":")
+    if len(x) != 2:
+        raise RuntimeError("Something wrong with the input time format: {}".format(ori_time))
+    if not x[0].isnumeric() or not x[1].isnumeric():
+        raise RuntimeError("Something wrong with the input time, not numerical data: {}".format(ori_time))
+    hour = int(x[0])
+    minute = int(x[1])
+
+    # in case the month is for last year
+    year = now.year if now.month >= month else now.year - 1
+    return datetime(year=year, month=month, day=day, hour=hour, minute=minute)
+
+
+class TimeParser:
+    """
+    time parser for one refresh of the job records
+    """
+
+    def __init__(self, now=None):
+        """
+        :param now: the reference current time (datetime), default is the current time
+        """
+        self.now = datetime.now() if now is None else now
+        self.now_ts = datetime_to_epoch(self.now)
+        self._lsf_times = {}
+
+    def lsf_epoch(self, data):
+        """
+        convert the LSF time string (like "Jul 29 11:30") into epoch seconds, None is returned
+        for the empty string. The result is memoized for each distinct string
+        """
+        try:
+            return self._lsf_times[data]
+        except KeyError:
+            t = self._lsf_times[data] = datetime_to_epoch(parse_lsf_time(data, self.now))
+            return t
+
+    def minutes_since(self, ts):
+        """
+        the minutes between the input epoch seconds and the reference now
+        """
+        return (self.now_ts - ts) / 60
@@ -0,0 +1,58 @@
+"""
+This file stores the timings of emgoat itself
+
+the duration of each scheduler command (see run_command) and of each data refresh are recorded
+here by name, so that they could be exported together with the cluster metrics (see
+emgoat/cluster/metrics.py). For each name we keep the number of calls, the total seconds and the
+seconds of the last call
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+#
+# the kinds of timings
+#
+TIMING_COMMAND = "command"
+TIMING_REFRESH = "refresh"
+
+
+class Timings:
+    """
+    the timings for each (kind, labels), labels is a tuple of (name, value) pairs
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = {}
+
+    def record(self, kind, labels, seconds):
+        key = (kind, tuple(labels))
+        with self._lock:
+            count, total, last = self._data.get(key, (0, 0.0, 0.0))
+            self._data[key] = (count + 1, total + seconds, seconds)
+
+    @contextmanager
+    def timed(self, kind, labels):
+        """record the time spent in the with block, it's recorded even if the block fails"""
+        begin = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(kind, labels, time.perf_counter() - begin)
+
+    def items(self, kind):
+        """the list of (labels, count, total seconds, last seconds) for the kind, sorted by labels"""
+        with self._lock:
+            data = [(k[1],) + v for k, v in self._data.items() if k[0] == kind]
+        return sorted(data)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+#
+# the timings of this process
+#
+TIMINGS = Timings()
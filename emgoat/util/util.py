@@ -3,7 +3,9 @@
 This file stores the utility functions 
 """
 import os
+import sys
 import subprocess
+import time
 import csv
 import json
 import re
@@ -15,6 +17,9 @@ from emtools.jobs import Args
 from datetime import datetime, timedelta
 from .macros import VERY_BIG_NUMBER, GPU_TYPE
 from .macros import JOB_STATUS_DONE, JOB_STATUS_PD, JOB_STATUS_RUN
+from .states import job_state, node_state, NodeGroup
+from .resources import memory_in_mb
+from .timing import TIMINGS, TIMING_COMMAND
 
 def run_command(arglist, user_name=None, timeout=60):
     """
@@ -44,6 +49,7 @@ def run_command(arglist, user_name=None, timeout=60):
 
     # all of output and error directed to the pipe
     # no standard input needed
+    begin = time.perf_counter()
     if user_name is not None:
         proc = subprocess.Popen(
             arglist,
@@ -60,8 +66,11 @@ def run_command(arglist, user_name=None, timeout=60):
             stdin=subprocess.DEVNULL
         )
 
-    # run the command, and return the output
-    out, err = proc.communicate(timeout=timeout)
+    # run the command, and return the output; the time is recorded by the command name
+    try:
+        out, err = proc.communicate(timeout=timeout)
+    finally:
+        TIMINGS.record(TIMING_COMMAND, [("command", os.path.basename(arglist[0]))], time.perf_counter() - begin)
     if proc.returncode != 0:
         info = 'Error running command {0}: {1}'.format(arglist, err)
         raise IOError(info)
@@ -71,13 +80,8 @@ def run_command(arglist, user_name=None, timeout=60):
 
 
 def get_job_general_status(status):
-    # get the general status
-    if whether_job_is_pending(status) or whether_job_is_suspending(status):
-        return JOB_STATUS_PD
-    elif whether_job_is_running(status):
-        return JOB_STATUS_RUN
-    else:
-        return JOB_STATUS_DONE
+    # get the general status, see states.py for the state mapping
+    return job_state(status).general_state
 
 
 def whether_job_is_pending(state):
@@ -92,8 +96,7 @@ def whether_job_is_pending(state):
     :param state: string that representing a job state
     :return: true if a job state is not in finished state
     """
-    status = ["pend", "pending", "pd", "configuring", "cf"]
-    return state.lower() in status
+    return job_state(state).is_pending
 
 
 def whether_job_is_suspending(state):
@@ -110,9 +113,7 @@ def whether_job_is_suspending(state):
     :param state: string that representing a job state
     :return: true if a job state is not in finished state
     """
-    status = ["psusp", "ususp", "ssusp", "prov", "wait", "suspended", "s", "requeued", "rq",
-              "requeue_hold", "rh", "resv_del_hold", "rd", "requeue_fed", "rf"]
-    return state.lower() in status
+    return job_state(state).is_suspending
 
 
 def whether_job_is_running(state):
@@ -129,8 +130,7 @@ def whether_job_is_running(state):
     :param state: string that representing a job state
     :return: true if a job state is not in finished state
     """
-    status = state.lower()
-    return status == "r" or status.find("run") >= 0
+    return job_state(state).is_running
 
 
 def whether_job_is_finished(state):
@@ -141,34 +141,28 @@ def whether_job_is_finished(state):
     :param state: string that representing a job state
     :return: true if a job state is not in finished state
     """
-    return not (whether_job_is_running(state) or
-                whether_job_is_pending(state) or
-                whether_job_is_suspending(state))
+    return job_state(state).general_state == JOB_STATUS_DONE
 
 def whether_node_is_good_for_newjobs(status: str):
     """
     whether the input status shows the node is good for new jobs
+
+    for the slurm compound state the flags are considered, for example "mixed+drain" is drained
     """
-    s = status.lower()
-    if s == "ok" or s.find("idle") >= 0 or s.find("mix") >=0 or s.find("alloc") >=0:
-        return True
-    return False
+    return node_state(status).group is NodeGroup.GOOD
 
 def whether_node_is_drained(status: str):
     """
     whether the node is not available for jobs, being drained in slurm
     """
-    s = status.lower()
-    if s == "closed" or s.find("drain") >= 0 or s.find("reserved") >=0:
-        return True
-    return False
+    return node_state(status).group is NodeGroup.DRAINED
 
 def whether_node_is_off(status: str):
     """
     whether the node is off, if the node is neither good for new jobs; nor is drained;
     we consider the node is off (power, service is down, or other reasons)
     """
-    return not (whether_node_is_good_for_newjobs(status) or whether_node_is_drained(status))
+    return node_state(status).group is NodeGroup.OFF
 
 def convert_percentage_to_decimal(input):
     """
@@ -208,6 +202,37 @@ def convert_str_to_integer(input):
         raise RuntimeError(info)
     return num
 
+def intern_str(s):
+    """
+    intern the input string so that the repeated strings (account names, host names, states etc.)
+    share the same object in memory; anything else than a string is returned as it is
+    """
+    if isinstance(s, str):
+        return sys.intern(s)
+    return s
+
+def datetime_to_epoch(t):
+    """
+    convert the input time into epoch seconds (integer)
+    :param t: datetime object, epoch seconds (int) or None
+    :return: the epoch seconds, or None if the input is None
+    """
+    if t is None:
+        return None
+    if isinstance(t, datetime):
+        return int(t.timestamp())
+    return int(t)
+
+def epoch_to_datetime(t):
+    """
+    convert the input epoch seconds back into the datetime object, in local time
+    :param t: epoch seconds, could be None
+    :return: the datetime object, or None if the input is None
+    """
+    if t is None:
+        return None
+    return datetime.fromtimestamp(t)
+
 def is_str_float(s):
     """
     testing whether the string is floating number
@@ -318,73 +343,15 @@ def need_newer_data_file(fname, time):
 def get_lsf_job_mem_infor_in_mb(ori_mem_request: str):
     """
     this is to get the memory information from the input memory value
-    from the LSF job
+    from the LSF job, like "10 GB", "2.9T" or "500M"
 
     the value returned will be an integer in mb unit
-    """
-    #
-    # sometimes we may see the string as empty
-    # this means the value here is un-determined
-    # usually the job will use system default value, we will determine
-    # the memory in other places
-    #
-    if not ori_mem_request.lower().strip():
-        mem = -1
-    else:
-        s = ori_mem_request.lower().split()
-
-        # memory always have unit information
-        # however we check the length here
-        # here the unit could be attached together with the number
-        if len(s) == 1:
-            val = float(re.search(r'\d+(\.\d+)?', ori_mem_request).group())
-            if ori_mem_request.find("g") >=0 or ori_mem_request.find("G") >=0:
-                mem = val*1024
-            elif ori_mem_request.find("M") >=0 or ori_mem_request.find("m") >=0:
-                mem = val
-            elif ori_mem_request.find("T") >=0 or ori_mem_request.find("t") >=0:
-                mem = val * 1024 * 1024
-            else:
-                raise RuntimeError("Invalid memory requested passed in LSF job: {}".format(ori_mem_request))
-        else:
 
-            # sometimes the value is not an integer, if could be float number
-            # for float number we will convert it into integer at last
-            if is_str_float(s[0]):
-                val = float(s[0])
-            elif is_str_integer(s[0]):
-                val = convert_str_to_integer(s[0])
-            else:
-                raise RuntimeError("We can not process the value in the input data of "
-                               "get_lsf_job_mem_infor_in_mb, neither integer nor float: {}".format(ori_mem_request))
-            unit = s[1]
-
-            # sometimes the unit is a single character
-            if len(unit) == 1:
-                if unit == "g":
-                    mem = val * 1024
-                elif unit == "t":
-                    mem = val * 1024 * 1024
-                elif unit == "m":
-                    mem = val
-                else:
-                    raise RuntimeError("Invalid memory requested passed in LSF job: {}".format(ori_mem_request))
-            else:
-                if unit.find("gb") >= 0:
-                    mem = val * 1024
-                elif unit.find("tb") >= 0:
-                    mem = val * 1024 * 1024
-                elif unit.find("mb") >= 0:
-                    mem = val
-                else:
-                    raise RuntimeError("Invalid memory requested passed in LSF job: {}".format(ori_mem_request))
-
-    # check whether mem is in float type
-    if isinstance(mem, float):
-        return convert_float_to_integer(str(mem))
-
-    # final return
-    return mem
+    sometimes we may see the string as empty, this means the value here is un-determined;
+    usually the job will use system default value, we will determine the memory in other
+    places. For this case -1 is returned
+    """
+    return memory_in_mb(ori_mem_request)
 
 
 class Config:
@@ -395,14 +362,19 @@ class Config:
     def __getitem__(self, key):
         return self._config[key]
 
-    def get_bool(self, key):
+    def get(self, key, default=None):
+        return self._config.get(key, default)
+
+    def get_bool(self, key, default=None):
+        if default is not None and key not in self._config:
+            return default
         val = self._config[key].lower()
         if val in ['1', 'true']:
             return True
         elif val in ['0', 'false']:
             return False
         else:
-            raise RuntimeError(f"Invalid bool value for option {key} = {self._config['key']}")
+            raise RuntimeError(f"Invalid bool value for option {key} = {self._config[key]}")
 
     def get_list(self, key):
         return self._config[key].split()